@@ -0,0 +1,74 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.password_utils import BCRYPT_ROUNDS, hash_password, hash_passwords, verify_password
+
+"""Подбор стоимости bcrypt под целевое время проверки пароля на этой машине.
+
+Рекомендуется максимальная стоимость, при которой медиана проверки не превышает цели:
+выше стоимость - дороже перебор украденных хэшей, но дольше вход.
+"""
+
+MIN_ROUNDS = 8
+MAX_ROUNDS = 16
+
+
+def time_verify(rounds: int, samples: int) -> float:
+    """Медиана времени проверки пароля (мс) для хэша с заданной стоимостью"""
+    hashed = hash_password('calibration-password', rounds)
+    timings = []
+    for _ in range(samples):
+        startTime = time.perf_counter()
+        verify_password('calibration-password', hashed)
+        timings.append((time.perf_counter() - startTime) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(targetMs: float, samples: int) -> tuple:
+    """Рекомендуемая стоимость и замеры по стоимостям; перебор останавливается после превышения цели"""
+    measurements = {}
+    chosen = MIN_ROUNDS
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        measurements[rounds] = time_verify(rounds, samples)
+        if measurements[rounds] > targetMs:
+            break
+        chosen = rounds
+    return chosen, measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--target-ms', type=float, default=250, help='целевое время проверки пароля при входе')
+    parser.add_argument('--samples', type=int, default=3)
+    parser.add_argument('--bulk', type=int, default=0, help='дополнительно замерить массовое хэширование N паролей')
+    args = parser.parse_args()
+
+    chosen, measurements = calibrate(args.target_ms, args.samples)
+    print(f'{"стоимость":>10} {"проверка, мс":>14}')
+    for rounds, ms in measurements.items():
+        mark = ' <- рекомендуется' if rounds == chosen else ''
+        current = ' (текущая)' if rounds == BCRYPT_ROUNDS else ''
+        print(f'{rounds:>10} {ms:>14.1f}{mark}{current}')
+    print(f'\nВ config_private.py: BCRYPT_ROUNDS = {chosen}')
+
+    if args.bulk:
+        passwords = [f'password-{i}' for i in range(args.bulk)]
+        startTime = time.perf_counter()
+        for password in passwords:
+            hash_password(password, chosen)
+        sequential = time.perf_counter() - startTime
+        startTime = time.perf_counter()
+        hash_passwords(passwords, chosen)
+        pooled = time.perf_counter() - startTime
+        print(f'Хэширование {args.bulk} паролей: последовательно {sequential:.2f} с, '
+              f'в пуле процессов ({os.cpu_count()} ядер) {pooled:.2f} с')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import QSortFilterProxyModel, Qt
+from PyQt6.QtWidgets import QApplication
+
+from ui.main_windows.inventory_window import MultiFilterProxyModelInventory
+from ui.ui_elements.table_model import TableModel
+
+"""Замер стоимости фильтрации таблицы хранилища при посимвольном вводе названия товара"""
+
+
+class LegacyInventoryProxy(QSortFilterProxyModel):
+    """Прежняя фильтрация: чтение и приведение к нижнему регистру ячеек каждой строки при каждом вводе"""
+    def __init__(self):
+        super().__init__()
+        self.productNameFilter = ''
+        self.warehouseFilter = None
+
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        model = self.sourceModel()
+        productName = model.data(model.index(sourceRow, 0), Qt.ItemDataRole.DisplayRole).lower()
+        if self.productNameFilter and self.productNameFilter.lower() not in productName:
+            return False
+        warehouse = model.data(model.index(sourceRow, 1), Qt.ItemDataRole.DisplayRole).lower()
+        if self.warehouseFilter and self.warehouseFilter != "Все склады":
+            if warehouse.lower() != self.warehouseFilter.lower():
+                return False
+        return True
+
+
+def generate_rows(count: int, seed: int):
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return [(f'Товар {rnd.randrange(count)} {rnd.choice(("болт", "гайка", "шайба", "винт"))}',
+             f'Склад {rnd.randrange(20)}', rnd.randrange(10000), start + timedelta(minutes=i))
+            for i in range(count)]
+
+
+def measure(proxy, query: str, apply) -> tuple:
+    """Время применения фильтра (мс) и число отобранных строк после каждого введенного символа"""
+    timings = []
+    rowCounts = []
+    for length in range(1, len(query) + 1):
+        proxy.productNameFilter = query[:length]
+        startTime = time.perf_counter()
+        apply()
+        rowCounts.append(proxy.rowCount())
+        timings.append((time.perf_counter() - startTime) * 1000)
+    return timings, rowCounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--query', default='товар 12')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    rows = generate_rows(args.rows, args.seed)
+    headers = ['Название', 'Склад', 'Кол-во', 'Изменено']
+
+    legacy = LegacyInventoryProxy()
+    legacy.setSourceModel(TableModel(rows, headers))
+    indexed = MultiFilterProxyModelInventory()
+    indexed.setSourceModel(TableModel(rows, headers))
+
+    legacyTimings, legacyCounts = measure(legacy, args.query, legacy.invalidateFilter)
+    indexedTimings, indexedCounts = measure(indexed, args.query, indexed.apply_filters)
+
+    print(f'Строк: {args.rows}, ввод: "{args.query}"')
+    print(f'{"символ":>8} {"прежний, мс":>14} {"индекс, мс":>12} {"строк":>8}')
+    for length, (legacyMs, indexedMs, rowCount) in enumerate(zip(legacyTimings, indexedTimings, indexedCounts),
+                                                             start=1):
+        print(f'{length:>8} {legacyMs:>14.1f} {indexedMs:>12.1f} {rowCount:>8}')
+    print(f'{"итого":>8} {sum(legacyTimings):>14.1f} {sum(indexedTimings):>12.1f} {indexed.rowCount():>8}')
+    if legacyCounts != indexedCounts:
+        print('Результаты фильтрации различаются')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from PyQt6.QtCore import QCoreApplication, QEvent, QThreadPool
+from PyQt6.QtWidgets import QApplication, QMessageBox
+
+from benchmarks.services_benchmark import prepare_database
+from benchmarks.synthetic_data import SCALES, DEFAULT_PASSWORD
+from db import db_session
+from main import ResizableWindowManager
+from services.auth_service import authorize_user
+from utils.app_state import AppState
+
+"""Проверка утечек памяти при повторных входах: N циклов вход - обход страниц - выход без отображения окон.
+
+Бд создается во временном файле SQLite и заполняется генератором синтетических данных; вход выполняется
+под созданным им администратором user1, которому доступны все страницы. Код выхода 1 - обнаружена утечка.
+"""
+
+# Учетная запись администратора из синтетических данных
+LOGIN = 'user1'
+
+
+def process_events(app):
+    """Завершение фоновых запросов и удаление отложенных через deleteLater объектов"""
+    QThreadPool.globalInstance().waitForDone()
+    app.processEvents()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+    app.processEvents()
+    gc.collect()
+
+
+def login_cycle(app, manager, login, password):
+    result = authorize_user(login, password)
+    if not result['success']:
+        raise SystemExit(f'Не удалось войти: {result["message"]}')
+
+    manager.init_main_app(AppState.currentUser)
+    for name in manager.pageClasses:
+        manager.show_page(name)
+    process_events(app)
+
+    manager.logout()
+    process_events(app)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='small', choices=SCALES, help='масштаб синтетических данных')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cycles', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=10, help='циклы до снятия базового замера')
+    parser.add_argument('--max-growth-kb', type=float, default=512,
+                        help='допустимый рост памяти Python после прогрева (КБ)')
+    args = parser.parse_args()
+    if args.cycles <= args.warmup:
+        raise SystemExit('Количество циклов должно быть больше числа циклов прогрева')
+
+    # Пути к иконкам и стилям в окнах заданы относительно корня проекта
+    os.chdir(REPO_ROOT)
+    app = QApplication.instance() or QApplication(sys.argv)
+    # Сообщения не должны останавливать проверку модальными окнами
+    messages = []
+    QMessageBox.information = QMessageBox.warning = lambda parent, title, text, *args: messages.append(text)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Файл, а не память: окна обращаются к бд из потоков пула
+        prepare_database(os.path.join(directory, 'login_cycle.db'), args.scale, args.seed)
+        manager = ResizableWindowManager()
+
+        tracemalloc.start()
+        baseMemory = baseWidgets = None
+        for cycle in range(1, args.cycles + 1):
+            login_cycle(app, manager, LOGIN, DEFAULT_PASSWORD)
+            if cycle == args.warmup:
+                baseMemory = tracemalloc.get_traced_memory()[0]
+                baseWidgets = len(QApplication.allWidgets())
+
+        memory, peak = tracemalloc.get_traced_memory()
+        widgets = len(QApplication.allWidgets())
+        tracemalloc.stop()
+        db_session.engine.dispose()
+
+    growthKb = (memory - baseMemory) / 1024
+    print(f'Циклов: {args.cycles}')
+    print(f'Виджетов после прогрева: {baseWidgets}, в конце: {widgets}, страниц в стеке: {manager.count()}')
+    print(f'Рост памяти после прогрева: {growthKb:.1f} КБ, пик: {peak / 1024:.1f} КБ')
+
+    if messages:
+        print('Сообщения интерфейса во время проверки:')
+        for text in messages:
+            print(f'  {text}')
+
+    if widgets > baseWidgets or manager.count() or growthKb > args.max_growth_kb:
+        print('Обнаружена утечка')
+        return 1
+    return 1 if messages else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy
+from sqlalchemy import select
+
+from benchmarks.synthetic_data import SCALES, DEFAULT_PASSWORD, populate, scale_params, product_name, warehouse_name
+from db.db_session import configure_engine, get_db_session
+from db.engine_factory import create_schema
+from db.models import Inventory, Product
+from services import auth_service, control_user_service, info_from_db, inventory_service, shipments_service, \
+    transfers_service, inventory_history_service
+from services.name_cache import productCache, warehouseCache
+from services.reference_cache import referenceCache
+from utils.app_state import AppState
+
+"""Замер времени сервисных функций на локальной SQLite с синтетическими данными.
+
+Для каждого масштаба создается новая бд, заполняется генератором и каждая функция вызывается
+--repeat раз. Результаты сохраняются в JSON; --compare печатает отношение к прошлому прогону.
+"""
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+def prepare_database(database: str, scale: str, seed: int) -> dict:
+    """Новая бд выбранного масштаба; возвращает количество записей и время заполнения"""
+    if database == 'memory':
+        url = 'sqlite://'
+    else:
+        if os.path.exists(database):
+            os.remove(database)
+        url = f'sqlite:///{database}'
+    engine = configure_engine(url)
+    create_schema(engine)
+    productCache.clear()
+    warehouseCache.clear()
+    referenceCache.clear()
+
+    startTime = time.perf_counter()
+    counts = populate(scale, seed)
+    return {'rows': counts, 'populateSeconds': round(time.perf_counter() - startTime, 3)}
+
+
+def build_cases(params: dict) -> list:
+    """Сценарии (имя, функция от номера повтора); записывающие сценарии создают уникальные данные на каждом повторе"""
+    allWarehouses = list(range(1, params['warehouses'] + 1))
+    with get_db_session() as session:
+        stockedIds = session.scalars(select(Inventory.product_id).where(Inventory.warehouse_id == 1)
+                                     .order_by(Inventory.product_id)).all()
+        secondStock = set(session.scalars(select(Inventory.product_id).where(Inventory.warehouse_id == 2)))
+    transferIds = [productId for productId in stockedIds if productId in secondStock][:3]
+    stockedName = product_name(stockedIds[0])
+    middleShipment = params['shipments'] // 2
+    # Первый свободный id занимает товар с историей (см. ниже)
+    newProductBase = params['products'] + 1
+    newEmployeeBase = params['employees']
+    # Товар без остатков, но с движениями в журнале: удаление должно быть отклонено
+    historyProduct = 'Бенчмарк товар с историей'
+    inventory_service.add_product(historyProduct)
+    inventory_service.add_new_product_to_warehouse(historyProduct, warehouse_name(1))
+    inventory_service.add_count(historyProduct, warehouse_name(1), 5)
+    inventory_service.del_product_from_warehouse(historyProduct, warehouse_name(1))
+    with get_db_session() as session:
+        historyProductId = session.scalar(select(Product.id).where(Product.name == historyProduct))
+    # Начальный снимок остатков: синтетическая история записана без журнала движений
+    inventory_history_service.take_inventory_snapshot()
+    snapshotTime = datetime.now()
+
+    def new_product(n):
+        return f'Бенчмарк товар {n}'
+
+    return [
+        # Авторизация и справочники
+        ('auth.authorize_user', lambda n: auth_service.authorize_user('user1', DEFAULT_PASSWORD)),
+        ('info.get_users', lambda n: info_from_db.get_users()),
+        ('info.get_roles', lambda n: info_from_db.get_roles()),
+        ('info.get_posts', lambda n: info_from_db.get_posts()),
+        ('info.get_warehouses', lambda n: info_from_db.get_warehouses()),
+        ('users.get_user_by_login', lambda n: control_user_service.get_user_by_login('user2')),
+        ('users.get_employees', lambda n: control_user_service.get_employees()),
+        ('users.get_employee_by_id', lambda n: control_user_service.get_employee_by_id(2)),
+
+        # Хранилище
+        ('inventory.get_inventory', lambda n: inventory_service.get_inventory(allWarehouses)),
+        ('inventory.get_inventory_name_contains',
+         lambda n: inventory_service.get_inventory(allWarehouses, nameContains='болт')),
+        ('inventory.search_inventory', lambda n: inventory_service.search_inventory(allWarehouses, 'гайка', None)),
+        ('inventory.get_inventory_warehouse_names',
+         lambda n: inventory_service.get_inventory_warehouse_names(allWarehouses)),
+        ('inventory.count_inventory', lambda n: inventory_service.count_inventory(allWarehouses)),
+        ('inventory.get_all_products', lambda n: inventory_service.get_all_products()),
+        ('inventory.get_all_product_and_ids', lambda n: inventory_service.get_all_product_and_ids()),
+        ('inventory.add_count', lambda n: inventory_service.add_count(stockedName, warehouse_name(1), 1)),
+        ('inventory.substract_count', lambda n: inventory_service.substract_count(stockedName, warehouse_name(1), 1)),
+        ('inventory.add_product', lambda n: inventory_service.add_product(new_product(n))),
+        ('inventory.add_new_product_to_warehouse',
+         lambda n: inventory_service.add_new_product_to_warehouse(new_product(n), warehouse_name(1))),
+        ('inventory.del_product_from_warehouse',
+         lambda n: inventory_service.del_product_from_warehouse(new_product(n), warehouse_name(1))),
+        ('inventory.del_product', lambda n: inventory_service.del_product(newProductBase + n + 1)),
+        ('inventory.del_product_with_history',
+         lambda n: expect_refusal(inventory_service.del_product(historyProductId), 'история движений')),
+
+        # Остатки на дату: снимок и хвост журнала, накопленный записывающими сценариями выше
+        ('history.get_stock_as_of',
+         lambda n: inventory_history_service.get_stock_as_of(datetime.now(), allWarehouses)),
+        ('history.get_stock_as_of_snapshot',
+         lambda n: inventory_history_service.get_stock_as_of(snapshotTime, [1])),
+
+        # Поставки
+        ('shipments.get_shipments_data',
+         lambda n: shipments_service.get_shipments_data(allWarehouses, limit=200)),
+        ('shipments.get_shipments_data_page',
+         lambda n: shipments_service.get_shipments_data(allWarehouses, lastId=middleShipment, limit=200)),
+        ('shipments.iter_shipments', lambda n: sum(1 for _ in shipments_service.iter_shipments(allWarehouses))),
+        ('shipments.iter_shipment_lines',
+         lambda n: sum(1 for _ in shipments_service.iter_shipment_lines(allWarehouses))),
+        ('shipments.get_suppliers_name', lambda n: shipments_service.get_suppliers_name()),
+        ('shipments.get_suppliers_data', lambda n: shipments_service.get_suppliers_data()),
+        ('shipments.get_shipment_details', lambda n: shipments_service.get_shipment_details(middleShipment)),
+        ('shipments.get_users_warehouses', lambda n: shipments_service.get_users_warehouses()),
+        ('shipments.get_available_products', lambda n: shipments_service.get_available_products(1)),
+        ('shipments.add_new_shipment',
+         lambda n: shipments_service.add_new_shipment(1, 1, [(productId, 1) for productId in stockedIds[:5]])),
+        ('shipments.add_new_supplier',
+         lambda n: shipments_service.add_new_supplier(f'Бенчмарк поставщик {n}', f'+7000{n:07d}',
+                                                      f'bench{n}@example.com')),
+
+        # Перемещения
+        ('transfers.get_transfers_data', lambda n: transfers_service.get_transfers_data(allWarehouses, limit=200)),
+        ('transfers.iter_transfers', lambda n: sum(1 for _ in transfers_service.iter_transfers(allWarehouses))),
+        ('transfers.get_warehouses_data', lambda n: transfers_service.get_warehouses_data()),
+        ('transfers.get_transfer_details', lambda n: transfers_service.get_transfer_details(1)),
+        ('transfers.add_new_transfer',
+         lambda n: transfers_service.add_new_transfer(1, 2, [(productId, 1) for productId in transferIds])),
+        ('history.take_inventory_snapshot',
+         lambda n: inventory_history_service.take_inventory_snapshot(datetime.now() + timedelta(minutes=10 * (n + 1)))),
+        ('transfers.add_new_warehouse',
+         lambda n: transfers_service.add_new_warehouse(f'Бенчмарк склад {n}', f'ул. Тестовая, д. {n}', 100)),
+
+        # Сотрудники и учетные записи
+        ('users.add_employee',
+         lambda n: control_user_service.add_employee('Тест', 'Тестов', '9999', f'{n:06d}', f'+7999{n:07d}',
+                                                     'Грузчик', [1])),
+        ('users.create_invite_code',
+         lambda n: control_user_service.create_invite_code(f'BENCH-{n}', newEmployeeBase + n + 1, 'Кладовщик')),
+        ('users.update_employee',
+         lambda n: control_user_service.update_employee(newEmployeeBase + n + 1, 'Тест', 'Тестов', '9999',
+                                                        f'{n:06d}', f'+7999{n:07d}', 'Кладовщик', 1, [1, 2])),
+        ('users.update_user', lambda n: control_user_service.update_user('user2', 'Менеджер', True)),
+        ('auth.register_user',
+         lambda n: auth_service.register_user(f'BENCH-{n}', f'bench{n}', DEFAULT_PASSWORD)),
+    ]
+
+
+def expect_refusal(result, message: str):
+    """Проверка отказа сервиса: True, если он отклонил операцию с ожидаемым сообщением"""
+    if isinstance(result, Mapping) and result.get('success') is False and message in str(result.get('message')):
+        return True
+    return {'success': False, 'message': f'Ожидался отказ "{message}", получено: {result}'}
+
+
+def failure(result):
+    """Текст ошибки, если сервис вернул неуспешный результат"""
+    if isinstance(result, Mapping) and result.get('success') is False:
+        return str(result.get('message', result.get('data')))
+    if result is False:
+        return 'False'
+    return None
+
+
+def run_case(func, repeat: int) -> dict:
+    timings = []
+    errors = []
+    for n in range(repeat):
+        startTime = time.perf_counter()
+        try:
+            result = func(n)
+        except Exception as e:
+            result = {'success': False, 'message': repr(e)}
+        timings.append((time.perf_counter() - startTime) * 1000)
+        error = failure(result)
+        if error:
+            errors.append(error)
+    return {
+        'firstMs': round(timings[0], 3),
+        'minMs': round(min(timings), 3),
+        'medianMs': round(statistics.median(timings), 3),
+        'meanMs': round(statistics.fmean(timings), 3),
+        'maxMs': round(max(timings), 3),
+        'errors': errors[:3],
+    }
+
+
+def run_scale(database: str, scale: str, seed: int, repeat: int) -> dict:
+    result = prepare_database(database, scale, seed)
+    params = scale_params(scale)
+    result['params'] = params
+
+    authorized = auth_service.authorize_user('user1', DEFAULT_PASSWORD)
+    if not authorized['success']:
+        raise SystemExit(f'Не удалось войти: {authorized["message"]}')
+
+    result['cases'] = {}
+    for name, func in build_cases(params):
+        result['cases'][name] = stats = run_case(func, repeat)
+        status = f'ошибки: {stats["errors"][0]}' if stats['errors'] else ''
+        print(f'  {name:<45} {stats["medianMs"]:>10.2f} мс {status}')
+    AppState.currentUser = None
+    return result
+
+
+def print_comparison(current: dict, baseline: dict):
+    """Отношение медиан текущего прогона к прошлому по общим масштабам и сценариям"""
+    print(f'\nСравнение с {baseline["meta"].get("commit") or "прошлым прогоном"} (медиана, текущий / прошлый):')
+    for scale, scaleResult in current['scales'].items():
+        baselineCases = baseline['scales'].get(scale, {}).get('cases', {})
+        print(f'[{scale}]')
+        for name, stats in scaleResult['cases'].items():
+            old = baselineCases.get(name)
+            if not old or not old['medianMs']:
+                continue
+            ratio = stats['medianMs'] / old['medianMs']
+            print(f'  {name:<45} {old["medianMs"]:>10.2f} -> {stats["medianMs"]:>10.2f} мс  x{ratio:.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', default='small,medium', help=f'через запятую: {", ".join(SCALES)}')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default='memory', help='memory или путь к файлу SQLite (перезаписывается)')
+    parser.add_argument('--output', default='services_benchmark.json')
+    parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'database': args.database,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'scales': {},
+    }
+    for scale in args.scales.split(','):
+        print(f'[{scale}]')
+        results['scales'][scale] = run_scale(args.database, scale, args.seed, args.repeat)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+    print(f'Результаты сохранены в {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+    failed = any(stats['errors'] for scale in results['scales'].values() for stats in scale['cases'].values())
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
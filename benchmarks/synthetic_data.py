@@ -0,0 +1,173 @@
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+from db.db_session import get_db_session
+from db.models import Role, Post, Warehouse, Product, Supplier, Employee, UserAccount, InviteCode, Inventory, \
+    Shipment, ShipmentLine, Transfer, TransferLine, t_employee_warehouse
+from utils.password_utils import hash_password
+
+"""Детерминированный генератор тестовых данных для замеров на локальной бд.
+
+Одинаковые масштаб и seed всегда дают одинаковые данные, поэтому результаты замеров
+разных коммитов сравнимы между собой.
+"""
+
+# Масштабы данных: количество записей основных таблиц
+SCALES = {
+    'small': {'warehouses': 5, 'products': 500, 'employees': 20, 'suppliers': 20,
+              'shipments': 2000, 'transfers': 1000},
+    'medium': {'warehouses': 20, 'products': 5000, 'employees': 100, 'suppliers': 100,
+               'shipments': 20000, 'transfers': 10000},
+    'large': {'warehouses': 50, 'products': 50000, 'employees': 300, 'suppliers': 300,
+              'shipments': 100000, 'transfers': 50000},
+}
+
+ROLES = ['Администратор', 'Менеджер', 'Кладовщик', 'Наблюдатель']
+POSTS = [('Директор', 150000), ('Менеджер склада', 90000), ('Кладовщик', 60000), ('Грузчик', 45000)]
+
+PRODUCT_KINDS = ['Болт', 'Гайка', 'Шайба', 'Винт', 'Саморез', 'Дюбель', 'Анкер', 'Шуруп', 'Заклепка', 'Хомут']
+PRODUCT_GRADES = ['оцинкованный', 'нержавеющий', 'латунный', 'черный', 'усиленный']
+FIRST_NAMES = ['Иван', 'Петр', 'Анна', 'Мария', 'Олег', 'Елена', 'Сергей', 'Ольга', 'Дмитрий', 'Наталья']
+LAST_NAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков']
+
+# Пароль всех сгенерированных учетных записей (логины user1, user2, ...); user1 - администратор всех складов
+DEFAULT_PASSWORD = 'password'
+
+# Доля товаров каталога, хранящихся на каждом складе
+STOCKED_SHARE = 0.4
+
+# Начало истории поставок и перемещений
+HISTORY_START = datetime(2024, 1, 1)
+
+# Строк в одной пакетной вставке
+INSERT_CHUNK_SIZE = 5000
+
+
+def scale_params(scale) -> dict:
+    """Параметры масштаба по имени или словарю с количествами"""
+    if isinstance(scale, str):
+        return dict(SCALES[scale])
+    return dict(scale)
+
+
+def product_name(productId: int) -> str:
+    return f'{PRODUCT_KINDS[productId % len(PRODUCT_KINDS)]} ' \
+           f'{PRODUCT_GRADES[productId // len(PRODUCT_KINDS) % len(PRODUCT_GRADES)]} {productId}'
+
+
+def warehouse_name(warehouseId: int) -> str:
+    return f'Склад №{warehouseId}'
+
+
+def line_count(rnd: random.Random, maximum: int) -> int:
+    """Количество строк документа: чаще несколько позиций, реже - много"""
+    return min(maximum, max(1, int(rnd.expovariate(1 / 3)) + 1))
+
+
+def populate(scale='small', seed: int = 42, password: str = DEFAULT_PASSWORD) -> dict:
+    """Заполнение пустой бд (схема уже создана); возвращает количество записей по таблицам"""
+    params = scale_params(scale)
+    rnd = random.Random(seed)
+    counts = {}
+
+    warehouseIds = list(range(1, params['warehouses'] + 1))
+    productIds = list(range(1, params['products'] + 1))
+    employeeIds = list(range(1, params['employees'] + 1))
+    supplierIds = list(range(1, params['suppliers'] + 1))
+
+    with get_db_session() as session:
+        def insert_rows(model, rows):
+            chunk = []
+            total = 0
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= INSERT_CHUNK_SIZE:
+                    session.execute(insert(model), chunk)
+                    total += len(chunk)
+                    chunk = []
+            if chunk:
+                session.execute(insert(model), chunk)
+                total += len(chunk)
+            counts[model.name if hasattr(model, 'c') else model.__tablename__] = total
+
+        insert_rows(Role, ({'id': i, 'name': name} for i, name in enumerate(ROLES, start=1)))
+        insert_rows(Post, ({'id': i, 'name': name, 'salary': salary} for i, (name, salary) in enumerate(POSTS, start=1)))
+        insert_rows(Warehouse, ({'id': i, 'name': warehouse_name(i), 'address': f'ул. Складская, д. {i}',
+                                 'floor_space': rnd.randrange(500, 20000)} for i in warehouseIds))
+        insert_rows(Product, ({'id': i, 'name': product_name(i)} for i in productIds))
+        insert_rows(Supplier, ({'id': i, 'name': f'Поставщик {i}', 'phone_number': f'+7900{i:07d}',
+                                'email': f'supplier{i}@example.com'} for i in supplierIds))
+        insert_rows(Employee, ({'id': i, 'first_name': rnd.choice(FIRST_NAMES), 'last_name': rnd.choice(LAST_NAMES),
+                                'passport_series': f'{i // 1000000:04d}', 'passport_number': f'{i % 1000000:06d}',
+                                'phone_number': f'+7911{i:07d}', 'post_id': rnd.randrange(1, len(POSTS) + 1),
+                                'date_of_employment': date(2020, 1, 1) + timedelta(days=rnd.randrange(1500)),
+                                'is_active': 1} for i in employeeIds))
+
+        # Первый сотрудник работает на всех складах, остальные - на одном-трех
+        assignments = {1: warehouseIds}
+        for employeeId in employeeIds[1:]:
+            assignments[employeeId] = sorted(rnd.sample(warehouseIds, min(len(warehouseIds), rnd.randrange(1, 4))))
+        insert_rows(t_employee_warehouse, ({'employee_id': employeeId, 'warehouse_id': warehouseId}
+                                           for employeeId, warehouses in assignments.items()
+                                           for warehouseId in warehouses))
+
+        # Учетные записи у всех сотрудников, кроме последнего: для него создается пригласительный код.
+        # Хэш вычисляется один раз - bcrypt для каждой записи занял бы минуты
+        passwordHash = hash_password(password)
+        insert_rows(UserAccount, ({'id': i, 'login': f'user{i}', 'password': passwordHash, 'employee_id': i,
+                                   'role_id': 1 if i == 1 else rnd.randrange(2, len(ROLES) + 1), 'is_active': 1}
+                                  for i in employeeIds[:-1]))
+        insert_rows(InviteCode, [{'id': 1, 'code': 'INVITE-1', 'employee_id': employeeIds[-1], 'role_id': 3,
+                                  'is_active': 1}])
+
+        # Ассортимент складов
+        stock = {}
+        for warehouseId in warehouseIds:
+            stocked = sorted(rnd.sample(productIds, max(1, int(len(productIds) * STOCKED_SHARE))))
+            stock[warehouseId] = stocked
+        insert_rows(Inventory, ({'warehouse_id': warehouseId, 'product_id': productId,
+                                 'quantity': rnd.randrange(0, 5000),
+                                 'updated_at': HISTORY_START + timedelta(minutes=rnd.randrange(1051200))}
+                                for warehouseId, products in stock.items() for productId in products))
+
+        # История: документы идут по возрастанию даты вместе с id; строки вставляются после своих документов
+        historyDays = 730
+        documents = []
+        lines = []
+
+        def flush_documents(model, lineModel):
+            if documents:
+                session.execute(insert(model), documents)
+                session.execute(insert(lineModel), lines)
+                counts[model.__tablename__] = counts.get(model.__tablename__, 0) + len(documents)
+                counts[lineModel.__tablename__] = counts.get(lineModel.__tablename__, 0) + len(lines)
+                documents.clear()
+                lines.clear()
+
+        for shipmentId in range(1, params['shipments'] + 1):
+            warehouseId = rnd.choice(warehouseIds)
+            documents.append({'id': shipmentId, 'supplier_id': rnd.choice(supplierIds),
+                              'employee_id': rnd.choice(employeeIds), 'warehouse_id': warehouseId,
+                              'date': (HISTORY_START + timedelta(days=shipmentId * historyDays // params['shipments'])).date()})
+            for productId in rnd.sample(stock[warehouseId], line_count(rnd, min(20, len(stock[warehouseId])))):
+                lines.append({'shipment_id': shipmentId, 'product_id': productId, 'quantity': rnd.randrange(1, 500)})
+            if len(documents) >= INSERT_CHUNK_SIZE:
+                flush_documents(Shipment, ShipmentLine)
+        flush_documents(Shipment, ShipmentLine)
+
+        if len(warehouseIds) > 1:
+            for transferId in range(1, params['transfers'] + 1):
+                fromWarehouseId, toWarehouseId = rnd.sample(warehouseIds, 2)
+                common = sorted(set(stock[fromWarehouseId]) & set(stock[toWarehouseId])) or stock[fromWarehouseId]
+                documents.append({'id': transferId, 'from_warehouse_id': fromWarehouseId,
+                                  'to_warehouse_id': toWarehouseId, 'employee_id': rnd.choice(employeeIds),
+                                  'date': (HISTORY_START + timedelta(days=transferId * historyDays // params['transfers'])).date()})
+                for productId in rnd.sample(common, line_count(rnd, min(8, len(common)))):
+                    lines.append({'transfer_id': transferId, 'product_id': productId, 'quantity': rnd.randrange(1, 100)})
+                if len(documents) >= INSERT_CHUNK_SIZE:
+                    flush_documents(Transfer, TransferLine)
+            flush_documents(Transfer, TransferLine)
+
+    return counts
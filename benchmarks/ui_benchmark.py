@@ -0,0 +1,244 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from PyQt6.QtCore import QCoreApplication, QEvent, QThreadPool, qInstallMessageHandler
+from PyQt6.QtWidgets import QApplication, QMessageBox, QTableView
+
+from benchmarks.services_benchmark import git_commit, prepare_database
+from benchmarks.synthetic_data import SCALES, DEFAULT_PASSWORD
+from main import ResizableWindowManager
+from services.auth_service import authorize_user
+from ui.main_windows.inventory_window import InventoryWindow
+from ui.main_windows.shipments_window import ShipmentsWindow
+from ui.main_windows.transfers_window import TransfersWindow
+from ui.main_windows.user_controls_window import UserControlsWindow
+from utils import export_to_excel
+from utils.app_state import AppState
+from utils.task_runner import ServiceRunner
+
+"""Замеры интерфейса без дисплея (QT_QPA_PLATFORM=offscreen) на локальной SQLite с синтетическими данными.
+
+Для каждого масштаба: создание окон, refresh(), фильтрация по каждому введенному символу,
+прокрутка таблиц, переключение страниц и экспорт в Excel. Для каждого сценария
+выводятся время и пиковый прирост памяти Python (tracemalloc).
+"""
+
+
+class Recorder:
+    """Накопление результатов сценариев с замером времени и пика памяти"""
+    def __init__(self):
+        self.results = {}
+
+    def measure(self, name, func, *args):
+        gc.collect()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            baseMemory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        startTime = time.perf_counter()
+        result = func(*args)
+        elapsedMs = (time.perf_counter() - startTime) * 1000
+        peakKb = round((tracemalloc.get_traced_memory()[1] - baseMemory) / 1024, 1) if tracing else None
+        self.results[name] = {'ms': round(elapsedMs, 3), 'peakKb': peakKb}
+        if isinstance(result, dict):
+            self.results[name].update(result)
+        memory = f'{peakKb:>10.1f} КБ' if tracing else ''
+        print(f'  {name:<42} {elapsedMs:>10.1f} мс {memory}')
+        return result
+
+
+def process_events(app):
+    """Завершение фоновых задач и отложенных событий"""
+    QThreadPool.globalInstance().waitForDone()
+    app.processEvents()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+    app.processEvents()
+
+
+def find_table(window, model) -> QTableView:
+    """Таблица окна, отображающая модель (таблицы создаются в init_ui без ссылок на них)"""
+    for table in window.findChildren(QTableView):
+        if table.model() is model:
+            return table
+    raise LookupError('Таблица не найдена')
+
+
+def type_query(app, lineEdit, query: str, apply) -> dict:
+    """Посимвольный ввод с применением фильтра после каждого символа"""
+    timings = []
+    for length in range(1, len(query) + 1):
+        startTime = time.perf_counter()
+        lineEdit.setText(query[:length])
+        apply()
+        app.processEvents()
+        timings.append((time.perf_counter() - startTime) * 1000)
+    return {'perKeystrokeMs': [round(ms, 3) for ms in timings], 'maxKeystrokeMs': round(max(timings), 3)}
+
+
+def scroll_table(app, table, maxPages: int) -> dict:
+    """Прокрутка таблицы постранично с отрисовкой каждой страницы (равномерно по всей таблице, не больше maxPages)"""
+    scrollBar = table.verticalScrollBar()
+    step = max(scrollBar.pageStep(), scrollBar.maximum() // maxPages + 1)
+    pages = 0
+    value = 0
+    while True:
+        scrollBar.setValue(value)
+        table.viewport().repaint()
+        app.processEvents()
+        pages += 1
+        if value >= scrollBar.maximum():
+            break
+        value += step
+    return {'pages': pages, 'rows': table.model().rowCount()}
+
+
+def fetch_pages(app, table, pages: int) -> dict:
+    """Подгрузка страниц истории прокруткой до конца таблицы"""
+    model = table.model()
+    loaded = 0
+    while loaded < pages and model.canFetchMore():
+        model.fetchMore()
+        table.scrollToBottom()
+        table.viewport().repaint()
+        app.processEvents()
+        loaded += 1
+    return {'pages': loaded, 'rows': model.rowCount()}
+
+
+def export(app, start) -> dict:
+    """Экспорт в xlsx до завершения фоновой записи"""
+    with tempfile.TemporaryDirectory() as directory:
+        filePath = os.path.join(directory, 'report.xlsx')
+        export_to_excel.ask_export_path = lambda parent=None: filePath
+        start()
+        process_events(app)
+        return {'fileKb': round(os.path.getsize(filePath) / 1024, 1) if os.path.exists(filePath) else None}
+
+
+def run_scale(app, database: str, scale: str, seed: int, query: str, fetchPages: int, scrollPages: int) -> dict:
+    print(f'[{scale}]')
+    prepare_database(database, scale, seed)
+    if not authorize_user('user1', DEFAULT_PASSWORD)['success']:
+        raise SystemExit('Не удалось войти')
+    user = AppState.currentUser
+    recorder = Recorder()
+
+    # Окна
+    inventory = recorder.measure('inventory.construct', InventoryWindow, user)
+    shipments = recorder.measure('shipments.construct', ShipmentsWindow, user)
+    transfers = recorder.measure('transfers.construct', TransfersWindow, user)
+    userControls = recorder.measure('userControls.construct', UserControlsWindow, user)
+    windows = (inventory, shipments, transfers, userControls)
+    for window in windows:
+        window.resize(1280, 720)
+        window.show()
+    app.processEvents()
+
+    recorder.measure('inventory.refresh', inventory.refresh)
+    recorder.measure('shipments.refresh', shipments.refresh)
+    recorder.measure('transfers.refresh', transfers.refresh)
+    # У окна учетных записей нет refresh(): обновляются обе его таблицы
+    recorder.measure('userControls.update_tables',
+                     lambda: (userControls.update_users_table(), userControls.update_employees_table()))
+
+    # Фильтрация
+    recorder.measure('inventory.filter_typing', type_query, app, inventory.productNameFilter, query,
+                     inventory.update_inventory_filters)
+    inventory.productNameFilter.clear()
+    inventory.update_inventory_filters()
+    recorder.measure('userControls.filter_typing', type_query, app, userControls.loginFilter, 'user1',
+                     userControls.update_users_filters)
+
+    # Прокрутка
+    inventoryTable = find_table(inventory, inventory.inventoryFilterModel)
+    recorder.measure('inventory.scroll', scroll_table, app, inventoryTable, scrollPages)
+    shipmentsTable = find_table(shipments, shipments.shipmentsModel)
+    recorder.measure('shipments.fetch_pages', fetch_pages, app, shipmentsTable, fetchPages)
+
+    # Экспорт
+    recorder.measure('inventory.export', export, app,
+                     lambda: export_to_excel.exportToExcel(inventory.inventoryFilterModel.sourceModel(), inventory))
+    recorder.measure('shipments.export_history', export, app, shipments.export_shipments_report)
+
+    for window in windows:
+        window.close()
+        window.deleteLater()
+    process_events(app)
+
+    # Переключение страниц главного окна: первое открытие создает страницу, повторное - обновляет
+    manager = ResizableWindowManager()
+    manager.init_main_app(user)
+    for name in manager.pageClasses:
+        recorder.measure(f'switch.{name}.first', manager.show_page, name)
+    for name, switch in (('inventory', manager.switch_to_inventory), ('shipments', manager.switch_to_shipments),
+                         ('transfers', manager.switch_to_transfers), ('main', manager.switch_to_main)):
+        recorder.measure(f'switch.{name}.again', switch)
+    manager.end_session()
+    manager.deleteLater()
+    process_events(app)
+    return recorder.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', default='small,medium', help=f'через запятую: {", ".join(SCALES)}')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default='memory', help='memory или путь к файлу SQLite (перезаписывается)')
+    parser.add_argument('--query', default='болт оцинкованный', help='строка поиска для посимвольного ввода')
+    parser.add_argument('--fetch-pages', type=int, default=20, help='страниц истории поставок при прокрутке')
+    parser.add_argument('--scroll-pages', type=int, default=300, help='максимум отрисованных страниц при прокрутке')
+    parser.add_argument('--no-memory', action='store_true', help='без tracemalloc (время без накладных расходов)')
+    parser.add_argument('--output', help='файл JSON с результатами')
+    args = parser.parse_args()
+
+    # Пути к иконкам и стилям в окнах заданы относительно корня проекта
+    os.chdir(REPO_ROOT)
+    app = QApplication.instance() or QApplication(sys.argv)
+    # Загрузка данных выполняется в потоке замера, чтобы время включало запросы к бд
+    ServiceRunner.runSynchronously = True
+    # Сообщения не должны останавливать замер модальными окнами
+    messages = []
+    QMessageBox.information = QMessageBox.warning = lambda parent, title, text, *args: messages.append(text)
+
+    # Предупреждение offscreen-платформы при каждом показе окна не относится к замерам
+    qInstallMessageHandler(lambda mode, context, message: None if 'propagateSizeHints' in message
+                           else print(message, file=sys.stderr))
+
+    if not args.no_memory:
+        tracemalloc.start()
+    results = {
+        'meta': {'commit': git_commit(), 'timestamp': datetime.now().isoformat(timespec='seconds'),
+                 'database': args.database, 'seed': args.seed, 'query': args.query},
+        'scales': {},
+    }
+    for scale in args.scales.split(','):
+        results['scales'][scale] = run_scale(app, args.database, scale, args.seed, args.query,
+                                             args.fetch_pages, args.scroll_pages)
+    tracemalloc.stop()
+
+    warnings = [text for text in messages if not text.startswith('Сохранено строк')]
+    if warnings:
+        print('Сообщения интерфейса во время замеров:')
+        for text in warnings:
+            print(f'  {text}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f'Результаты сохранены в {args.output}')
+    return 1 if warnings else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
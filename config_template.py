@@ -5,5 +5,45 @@ DB_PORT = "your_db_port"
 DB_NAME = "your_db_name"
 
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Переменная окружения WAREHOUSE_DATABASE_URL переопределяет адрес (например, sqlite:///bench.db для замеров)
 
+# Настройки пула соединений
+DB_POOL_SIZE = 5            # Постоянные соединения клиента
+DB_POOL_MAX_OVERFLOW = 5    # Дополнительные соединения сверх пула
+DB_POOL_RECYCLE = 1800      # Пересоздание соединения (сек), меньше wait_timeout MySQL
+DB_POOL_PRE_PING = True     # Проверка соединения перед выдачей из пула
+DB_POOL_TIMEOUT = 30        # Ожидание свободного соединения (сек)
 
+# Журнал медленных запросов
+SLOW_QUERY_THRESHOLD_MS = 200                   # Порог медленного запроса (мс)
+SLOW_QUERY_LOG_PATH = "logs/slow_queries.log"   # Файл журнала (ротируется)
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024      # Размер файла до ротации
+SLOW_QUERY_LOG_BACKUP_COUNT = 5                 # Количество архивных файлов
+
+# Повтор транзакций при deadlock (1213) и lock wait timeout (1205)
+DB_RETRY_ATTEMPTS = 4       # Максимум попыток на один вызов
+DB_RETRY_BASE_DELAY = 0.05  # Базовая задержка (сек), растет экспоненциально
+DB_RETRY_MAX_DELAY = 1.0    # Верхняя граница задержки (сек)
+
+# Потоковое чтение больших выборок (отчеты, экспорт)
+DB_STREAM_BATCH_SIZE = 1000 # Строк в одном пакете с сервера
+
+# Кэш справочных данных (роли, должности, склады, поставщики, товары)
+REFERENCE_CACHE_TTL = 300   # Время жизни записи (сек)
+
+# Хранилище: число записей, выше которого поиск и фильтры выполняются в бд
+INVENTORY_SERVER_FILTER_THRESHOLD = 20000
+
+# Стоимость хэширования паролей bcrypt (2^N итераций). Подбирается под целевое время входа:
+# python benchmarks/bcrypt_calibration.py --target-ms 250
+# Хэши со старой стоимостью заменяются при следующем успешном входе пользователя
+BCRYPT_ROUNDS = 12
+
+# Массовое заведение сотрудников (python provision_users.py employees.csv)
+PROVISION_CHUNK_SIZE = 200  # Сотрудников в одной транзакции
+
+# Импорт поставок из csv/xlsx
+SHIPMENT_IMPORT_CHUNK_SIZE = 1000   # Строк файла в одной транзакции
+
+# Снимки остатков для запросов на дату (python inventory_snapshot.py по расписанию)
+INVENTORY_SNAPSHOT_SETTLE_SECONDS = 300 # Снимок учитывает движения старше этого возраста (сек)
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+"""Пул соединений с БД и его счетчики"""
+
+
+class PoolStats:
+    """Счетчики работы пула соединений"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.waitTotal = 0.0
+            self.waitMax = 0.0
+
+    def record_wait(self, seconds: float):
+        with self.lock:
+            self.waitTotal += seconds
+            if seconds > self.waitMax:
+                self.waitMax = seconds
+
+    def increment(self, counter: str):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+poolStats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool с замером времени ожидания свободного соединения"""
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            poolStats.increment('timeouts')
+            raise
+        finally:
+            poolStats.record_wait(time.perf_counter() - start)
+
+
+def attach_pool_listeners(engine):
+    """Подключение счетчиков к событиям пула"""
+    event.listen(engine, 'connect', lambda dbapiConn, record: poolStats.increment('connects'))
+    event.listen(engine, 'checkout', lambda dbapiConn, record, proxy: poolStats.increment('checkouts'))
+    event.listen(engine, 'checkin', lambda dbapiConn, record: poolStats.increment('checkins'))
+    event.listen(engine, 'invalidate', lambda dbapiConn, record, e: poolStats.increment('invalidations'))
+    event.listen(engine, 'soft_invalidate', lambda dbapiConn, record, e: poolStats.increment('invalidations'))
+
+
+def get_pool_status(engine) -> dict:
+    """Текущее состояние пула и накопленные счетчики"""
+    pool = engine.pool
+    # Пул с одним соединением (SQLite в памяти) размеров не имеет
+    queued = isinstance(pool, QueuePool)
+    with poolStats.lock:
+        checkouts = poolStats.checkouts
+        status = {
+            'size': pool.size() if queued else 1,
+            'checkedOut': pool.checkedout() if queued else 0,
+            'overflow': max(pool.overflow(), 0) if queued else 0,
+            'checkedIn': pool.checkedin() if queued else 0,
+            'connects': poolStats.connects,
+            'checkouts': checkouts,
+            'checkins': poolStats.checkins,
+            'invalidations': poolStats.invalidations,
+            'timeouts': poolStats.timeouts,
+            'waitTotalMs': round(poolStats.waitTotal * 1000, 3),
+            'waitMaxMs': round(poolStats.waitMax * 1000, 3),
+            'waitAvgMs': round(poolStats.waitTotal * 1000 / checkouts, 3) if checkouts else 0.0,
+        }
+    return status
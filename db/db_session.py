@@ -1,20 +1,69 @@
+import time
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine, exc
+from sqlalchemy import exc, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-from config_private import DATABASE_URL
+from db.connection_pool import attach_pool_listeners, get_pool_status
+from db.engine_factory import create_db_engine
+from db.query_stats import attach_query_listeners, dump_query_stats, find_service_function, tag_connection
+from db.retry import retryStats, retryable_error_code, backoff_delay
+from utils.settings import config_private, database_url
 
 """Точка доступа к бд"""
 
-engine = create_engine(DATABASE_URL, echo=False)
+# Настройки пула соединений (переопределяются в config_private)
+POOL_SIZE = getattr(config_private, 'DB_POOL_SIZE', 5)
+POOL_MAX_OVERFLOW = getattr(config_private, 'DB_POOL_MAX_OVERFLOW', 5)
+POOL_RECYCLE = getattr(config_private, 'DB_POOL_RECYCLE', 1800)
+POOL_PRE_PING = getattr(config_private, 'DB_POOL_PRE_PING', True)
+POOL_TIMEOUT = getattr(config_private, 'DB_POOL_TIMEOUT', 30)
+
+# Настройки журнала медленных запросов
+SLOW_QUERY_THRESHOLD_MS = getattr(config_private, 'SLOW_QUERY_THRESHOLD_MS', 200)
+SLOW_QUERY_LOG_PATH = getattr(config_private, 'SLOW_QUERY_LOG_PATH', 'logs/slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = getattr(config_private, 'SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024)
+SLOW_QUERY_LOG_BACKUP_COUNT = getattr(config_private, 'SLOW_QUERY_LOG_BACKUP_COUNT', 5)
+
+# Повторы транзакций при deadlock/lock wait timeout
+RETRY_ATTEMPTS = getattr(config_private, 'DB_RETRY_ATTEMPTS', 4)
+RETRY_BASE_DELAY = getattr(config_private, 'DB_RETRY_BASE_DELAY', 0.05)
+RETRY_MAX_DELAY = getattr(config_private, 'DB_RETRY_MAX_DELAY', 1.0)
+
+# Размер пакета строк при потоковом чтении больших выборок (отчеты, экспорт)
+STREAM_BATCH_SIZE = getattr(config_private, 'DB_STREAM_BATCH_SIZE', 1000)
+
 Base = declarative_base()
-SessionLocal = sessionmaker(bind=engine)
+SessionLocal = sessionmaker()
+event.listen(SessionLocal, 'after_begin', tag_connection)
+engine = None
+
+def configure_engine(url: str):
+    """Подключение сессий к бд по адресу (MySQL или SQLite); прежний движок закрывается"""
+    global engine
+    newEngine = create_db_engine(url,
+                                 pool_size=POOL_SIZE,
+                                 max_overflow=POOL_MAX_OVERFLOW,
+                                 pool_recycle=POOL_RECYCLE,
+                                 pool_pre_ping=POOL_PRE_PING,
+                                 pool_timeout=POOL_TIMEOUT)
+    attach_pool_listeners(newEngine)
+    attach_query_listeners(newEngine, SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_PATH,
+                           SLOW_QUERY_LOG_MAX_BYTES, SLOW_QUERY_LOG_BACKUP_COUNT)
+    if engine is not None:
+        engine.dispose()
+    engine = newEngine
+    SessionLocal.configure(bind=engine)
+    return engine
+
+DATABASE_URL = database_url()
+if DATABASE_URL:
+    configure_engine(DATABASE_URL)
 
 @contextmanager
-def get_db_session():
-    """Контекстный менеджер для безопасной работы с БД"""
-    session = SessionLocal()
+def get_db_session(queryTag: str = None):
+    """Контекстный менеджер для безопасной работы с БД; queryTag - метка запросов сессии в статистике"""
+    session = SessionLocal(info={'queryTag': queryTag or find_service_function()})
     try:
         yield session
         session.commit()
@@ -24,3 +73,57 @@ def get_db_session():
         raise
     finally:
         session.close()
+
+def stream_rows(stmt, batchSize: int = None):
+    """Потоковое чтение выборки: строки приходят с сервера пакетами по batchSize.
+
+    Для MySQL используется небуферизованный курсор (SSCursor), поэтому в памяти клиента
+    находится не больше одного пакета. Соединение занято до конца чтения или закрытия генератора.
+    """
+    # Генератор выполняется при чтении, уже вне вызвавшей сервисной функции - метка берется сразу
+    return iter_stream_rows(stmt, batchSize or STREAM_BATCH_SIZE, find_service_function())
+
+def iter_stream_rows(stmt, batchSize: int, queryTag: str):
+    with get_db_session(queryTag) as session:
+        result = session.execute(stmt, execution_options={'stream_results': True,
+                                                          'yield_per': batchSize})
+        try:
+            for partition in result.partitions():
+                yield from partition
+        finally:
+            result.close()
+
+def run_in_transaction(work, maxAttempts: int = None):
+    """Выполнение work(session) в транзакции с повтором при взаимных блокировках"""
+    maxAttempts = maxAttempts or RETRY_ATTEMPTS
+    retryStats.increment('transactions')
+    attempt = 1
+    while True:
+        try:
+            with get_db_session() as session:
+                result = work(session)
+            if attempt > 1:
+                retryStats.increment('recovered')
+            return result
+        except exc.DBAPIError as e:
+            code = retryable_error_code(e)
+            if code is None:
+                raise
+            if attempt >= maxAttempts:
+                retryStats.increment('exhausted')
+                raise
+            retryStats.record_retry(code)
+            time.sleep(backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY))
+            attempt += 1
+
+def retry_stats() -> dict:
+    """Счетчики повторов транзакций"""
+    return retryStats.snapshot()
+
+def pool_status() -> dict:
+    """Счетчики пула соединений: занятые соединения, overflow, ожидание, инвалидации"""
+    return get_pool_status(engine)
+
+def query_stats(path: str = None) -> dict:
+    """Перцентили времени запросов по сервисным функциям (с выгрузкой в JSON при указании пути)"""
+    return dump_query_stats(path)
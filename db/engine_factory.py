@@ -0,0 +1,84 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.mysql import TINYINT
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import functions
+from sqlalchemy.pool import StaticPool
+
+from db.connection_pool import InstrumentedQueuePool
+
+"""Создание движка бд: MySQL для работы приложения или локальная SQLite для замеров и отладки"""
+
+# Адреса SQLite в памяти: все сессии должны использовать одно соединение
+SQLITE_MEMORY_URLS = ('sqlite://', 'sqlite:///:memory:')
+
+
+def create_db_engine(url: str, **poolOptions):
+    """Движок по адресу бд; настройки пула применяются только к серверной бд"""
+    if is_sqlite(url):
+        return create_sqlite_engine(url)
+    return create_engine(url, echo=False, poolclass=InstrumentedQueuePool, **poolOptions)
+
+
+def is_sqlite(url: str) -> bool:
+    return str(url).startswith('sqlite')
+
+
+def create_sqlite_engine(url: str = 'sqlite://'):
+    """Движок SQLite (файл или память) с функциями, которых нет в SQLite, но которые используют сервисы"""
+    options = {'connect_args': {'check_same_thread': False}}
+    if url in SQLITE_MEMORY_URLS:
+        options['poolclass'] = StaticPool
+    engine = create_engine(url, echo=False, **options)
+    event.listen(engine, 'connect', on_sqlite_connect)
+    return engine
+
+
+def on_sqlite_connect(dbapiConn, record):
+    dbapiConn.create_function('concat', -1, sqlite_concat, deterministic=True)
+    dbapiConn.create_function('now', 0, sqlite_now)
+    cursor = dbapiConn.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def sqlite_concat(*values):
+    """CONCAT как в MySQL, но NULL считается пустой строкой"""
+    return ''.join('' if value is None else str(value) for value in values)
+
+
+def sqlite_now():
+    """NOW() как в MySQL - местное время, в формате хранения DateTime SQLAlchemy для SQLite"""
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+@compiles(functions.now, 'sqlite')
+def compile_now_sqlite(element, compiler, **kwargs):
+    # CURRENT_TIMESTAMP в SQLite - время UTC с точностью до секунды и не сравнимо с сохраненными датами
+    return 'now()'
+
+
+@compiles(TINYINT, 'sqlite')
+def compile_tinyint_sqlite(type_, compiler, **kwargs):
+    return 'INTEGER'
+
+
+def create_schema(engine):
+    """Создание таблиц по метаданным db/models.py"""
+    from db.models import Base
+
+    if engine.dialect.name == 'sqlite':
+        make_index_names_unique(Base.metadata)
+    Base.metadata.create_all(engine)
+
+
+def make_index_names_unique(metadata):
+    """В SQLite имя индекса уникально в пределах схемы, а не таблицы (как в MySQL):
+    повторяющиеся имена дополняются именем таблицы"""
+    counts = Counter(index.name for table in metadata.tables.values() for index in table.indexes)
+    for table in metadata.tables.values():
+        for index in table.indexes:
+            if counts[index.name] > 1:
+                index.name = f'{table.name}_{index.name}'
@@ -0,0 +1,15 @@
+-- Уникальность записи хранилища по паре (склад, товар)
+-- Заменяет одиночный индекс warehouse_id_inventory_idx составным уникальным индексом.
+
+-- Дубли до миграции изменялись одними и теми же UPDATE, поэтому сохраняется
+-- самая ранняя запись (минимальный id), остальные удаляются.
+DELETE duplicate
+FROM inventory AS duplicate
+JOIN inventory AS kept
+    ON kept.warehouse_id = duplicate.warehouse_id
+    AND kept.product_id = duplicate.product_id
+    AND kept.id < duplicate.id;
+
+ALTER TABLE inventory
+    ADD UNIQUE INDEX warehouse_product_UNIQUE (warehouse_id, product_id),
+    DROP INDEX warehouse_id_inventory_idx;
@@ -0,0 +1,10 @@
+-- Индексы для фильтров таблицы хранилища, выполняемых в бд
+
+-- Диапазон количества и дата изменения в пределах складов пользователя
+ALTER TABLE inventory
+    ADD INDEX warehouse_quantity_idx (warehouse_id, quantity),
+    ADD INDEX warehouse_updated_at_idx (warehouse_id, updated_at);
+
+-- Поиск подстроки в названии товара; префиксный поиск использует name_UNIQUE
+ALTER TABLE product
+    ADD FULLTEXT INDEX name_FULLTEXT (name) WITH PARSER ngram;
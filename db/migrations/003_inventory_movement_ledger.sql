@@ -0,0 +1,48 @@
+-- Журнал движений остатков и периодические снимки для остатков на дату
+
+-- Журнал только дополняется: каждое изменение хранилища (поставка, перемещение,
+-- ручная корректировка, удаление товара со склада) пишет сюда изменение количества
+CREATE TABLE inventory_movement (
+    id INT NOT NULL AUTO_INCREMENT,
+    warehouse_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    document_id INT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    INDEX product_id_inventory_movement_idx (product_id),
+    INDEX warehouse_product_created_at_idx (warehouse_id, product_id, created_at),
+    INDEX created_at_inventory_movement_idx (created_at),
+    CONSTRAINT product_id_inventory_movement FOREIGN KEY (product_id) REFERENCES product (id),
+    CONSTRAINT warehouse_id_inventory_movement FOREIGN KEY (warehouse_id) REFERENCES warehouse (id)
+);
+
+-- Остаток пары (склад, товар) на момент снимка; пишется только для пар с движениями после прошлого снимка
+CREATE TABLE inventory_snapshot (
+    id INT NOT NULL AUTO_INCREMENT,
+    warehouse_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    taken_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE INDEX warehouse_product_taken_at_UNIQUE (warehouse_id, product_id, taken_at),
+    INDEX product_id_inventory_snapshot_idx (product_id),
+    INDEX taken_at_inventory_snapshot_idx (taken_at),
+    CONSTRAINT product_id_inventory_snapshot FOREIGN KEY (product_id) REFERENCES product (id),
+    CONSTRAINT warehouse_id_inventory_snapshot FOREIGN KEY (warehouse_id) REFERENCES warehouse (id)
+);
+
+-- Начальный снимок по тому же правилу, что и take_inventory_snapshot: время снимка - NOW() минус
+-- INVENTORY_SNAPSHOT_SETTLE_SECONDS (300 по умолчанию), остаток - текущий минус движения журнала после этого
+-- времени. История до миграции не восстанавливается, остатки на дату доступны начиная со снимка
+INSERT INTO inventory_snapshot (warehouse_id, product_id, quantity, taken_at)
+SELECT inventory.warehouse_id, inventory.product_id, inventory.quantity - COALESCE(movement.total, 0),
+       NOW() - INTERVAL 300 SECOND
+FROM inventory
+LEFT JOIN (
+    SELECT warehouse_id, product_id, SUM(quantity) AS total
+    FROM inventory_movement
+    WHERE created_at > NOW() - INTERVAL 300 SECOND
+    GROUP BY warehouse_id, product_id
+) AS movement ON movement.warehouse_id = inventory.warehouse_id AND movement.product_id = inventory.product_id;
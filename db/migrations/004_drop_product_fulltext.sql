@@ -0,0 +1,6 @@
+-- Удаление полнотекстового индекса названий товаров (добавлен в 002)
+-- Поиск подстроки в названии выполняется только через LIKE: MATCH ... AGAINST с парсером ngram
+-- зависит от стоп-слов и ngram_token_size и отбрасывал часть названий, находимых фильтром на клиенте.
+-- Неиспользуемый индекс только замедлял бы запись в таблицу товаров.
+ALTER TABLE product
+    DROP INDEX name_FULLTEXT;
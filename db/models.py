@@ -1,4 +1,5 @@
 import datetime
+from typing import Optional
 
 from sqlalchemy import CHAR, Column, Date, DateTime, ForeignKeyConstraint, Index, Integer, String, Table, text
 from sqlalchemy.dialects.mysql import TINYINT
@@ -30,6 +31,8 @@ class Product(Base):
     name: Mapped[str] = mapped_column(String(50), nullable=False)
 
     inventory: Mapped[list['Inventory']] = relationship('Inventory', back_populates='product')
+    inventory_movement: Mapped[list['InventoryMovement']] = relationship('InventoryMovement', back_populates='product')
+    inventory_snapshot: Mapped[list['InventorySnapshot']] = relationship('InventorySnapshot', back_populates='product')
     shipment_line: Mapped[list['ShipmentLine']] = relationship('ShipmentLine', back_populates='product')
     transfer_line: Mapped[list['TransferLine']] = relationship('TransferLine', back_populates='product')
 
@@ -77,6 +80,8 @@ class Warehouse(Base):
 
     employee: Mapped[list['Employee']] = relationship('Employee', secondary='employee_warehouse', back_populates='warehouse')
     inventory: Mapped[list['Inventory']] = relationship('Inventory', back_populates='warehouse')
+    inventory_movement: Mapped[list['InventoryMovement']] = relationship('InventoryMovement', back_populates='warehouse')
+    inventory_snapshot: Mapped[list['InventorySnapshot']] = relationship('InventorySnapshot', back_populates='warehouse')
     shipment: Mapped[list['Shipment']] = relationship('Shipment', back_populates='warehouse')
     transfer: Mapped[list['Transfer']] = relationship('Transfer', foreign_keys='[Transfer.from_warehouse_id]', back_populates='from_warehouse')
     transfer_: Mapped[list['Transfer']] = relationship('Transfer', foreign_keys='[Transfer.to_warehouse_id]', back_populates='to_warehouse')
@@ -114,7 +119,9 @@ class Inventory(Base):
         ForeignKeyConstraint(['product_id'], ['product.id'], name='product_id_inventory'),
         ForeignKeyConstraint(['warehouse_id'], ['warehouse.id'], name='warehouse_id_inventory'),
         Index('product_id_inventory_idx', 'product_id'),
-        Index('warehouse_id_inventory_idx', 'warehouse_id')
+        Index('warehouse_product_UNIQUE', 'warehouse_id', 'product_id', unique=True),
+        Index('warehouse_quantity_idx', 'warehouse_id', 'quantity'),
+        Index('warehouse_updated_at_idx', 'warehouse_id', 'updated_at')
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -127,6 +134,48 @@ class Inventory(Base):
     warehouse: Mapped['Warehouse'] = relationship('Warehouse', back_populates='inventory')
 
 
+class InventoryMovement(Base):
+    __tablename__ = 'inventory_movement'
+    __table_args__ = (
+        ForeignKeyConstraint(['product_id'], ['product.id'], name='product_id_inventory_movement'),
+        ForeignKeyConstraint(['warehouse_id'], ['warehouse.id'], name='warehouse_id_inventory_movement'),
+        Index('product_id_inventory_movement_idx', 'product_id'),
+        Index('warehouse_product_created_at_idx', 'warehouse_id', 'product_id', 'created_at'),
+        Index('created_at_inventory_movement_idx', 'created_at')
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    warehouse_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    document_id: Mapped[Optional[int]] = mapped_column(Integer)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP'))
+
+    product: Mapped['Product'] = relationship('Product', back_populates='inventory_movement')
+    warehouse: Mapped['Warehouse'] = relationship('Warehouse', back_populates='inventory_movement')
+
+
+class InventorySnapshot(Base):
+    __tablename__ = 'inventory_snapshot'
+    __table_args__ = (
+        ForeignKeyConstraint(['product_id'], ['product.id'], name='product_id_inventory_snapshot'),
+        ForeignKeyConstraint(['warehouse_id'], ['warehouse.id'], name='warehouse_id_inventory_snapshot'),
+        Index('product_id_inventory_snapshot_idx', 'product_id'),
+        Index('warehouse_product_taken_at_UNIQUE', 'warehouse_id', 'product_id', 'taken_at', unique=True),
+        Index('taken_at_inventory_snapshot_idx', 'taken_at')
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    warehouse_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    taken_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+
+    product: Mapped['Product'] = relationship('Product', back_populates='inventory_snapshot')
+    warehouse: Mapped['Warehouse'] = relationship('Warehouse', back_populates='inventory_snapshot')
+
+
 t_employee_warehouse = Table(
     'employee_warehouse', Base.metadata,
     Column('employee_id', Integer, primary_key=True),
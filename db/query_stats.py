@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+"""Замер времени выполнения запросов и журнал медленных запросов"""
+
+slowQueryLogger = logging.getLogger('warehouse.slow_queries')
+
+
+class QueryStats:
+    """Гистограммы времени выполнения запросов по сервисным функциям"""
+    def __init__(self, historySize: int = 2000):
+        self.lock = threading.Lock()
+        self.historySize = historySize
+        self.samples = {}
+        self.counts = {}
+        self.totals = {}
+
+    def record(self, tag: str, seconds: float):
+        with self.lock:
+            if tag not in self.samples:
+                self.samples[tag] = deque(maxlen=self.historySize)
+                self.counts[tag] = 0
+                self.totals[tag] = 0.0
+            self.samples[tag].append(seconds)
+            self.counts[tag] += 1
+            self.totals[tag] += seconds
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.counts.clear()
+            self.totals.clear()
+
+    def snapshot(self) -> dict:
+        """Сводка p50/p95/p99 по каждой функции (в миллисекундах)"""
+        with self.lock:
+            items = [(tag, sorted(samples), self.counts[tag], self.totals[tag])
+                     for tag, samples in self.samples.items()]
+        result = {}
+        for tag, samples, count, total in items:
+            result[tag] = {
+                'count': count,
+                'totalMs': round(total * 1000, 3),
+                'p50Ms': round(percentile(samples, 50) * 1000, 3),
+                'p95Ms': round(percentile(samples, 95) * 1000, 3),
+                'p99Ms': round(percentile(samples, 99) * 1000, 3),
+                'maxMs': round(samples[-1] * 1000, 3),
+            }
+        return result
+
+
+queryStats = QueryStats()
+slowQueryThreshold = 0.2
+
+
+def percentile(sortedSamples: list, percent: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not sortedSamples:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(sortedSamples))) - 1, 0)
+    return sortedSamples[min(rank, len(sortedSamples) - 1)]
+
+
+def find_service_function() -> str:
+    """Имя внешней функции из пакета services в текущем стеке вызовов.
+
+    Стек просматривается один раз при открытии сессии (см. get_db_session), а не на каждый запрос.
+    """
+    tag = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        # Учитываются только функции уровня модуля (без оберток декораторов и lambda)
+        globalsDict = frame.f_globals
+        if globalsDict.get('__name__', '').startswith('services.') and frame.f_code.co_name in globalsDict:
+            tag = frame.f_code.co_name
+        frame = frame.f_back
+    return tag or 'unknown'
+
+
+def tag_connection(session, transaction, connection):
+    # Метка сессии переходит на соединение, которое она заняла
+    connection.info['queryTag'] = session.info.get('queryTag')
+
+
+def untag_connection(dbapiConnection, connectionRecord):
+    connectionRecord.info.pop('queryTag', None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('queryStartTime', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['queryStartTime'].pop()
+    tag = conn.info.get('queryTag') or 'unknown'
+    queryStats.record(tag, elapsed)
+
+    # Параметры не пишутся: среди них хэши паролей, логины и пригласительные коды
+    if elapsed >= slowQueryThreshold:
+        slowQueryLogger.warning('%s %.1f мс: %s', tag, elapsed * 1000, ' '.join(statement.split()))
+
+
+def handle_error(exceptionContext):
+    # Запрос завершился ошибкой - after_cursor_execute не будет вызван
+    conn = exceptionContext.connection
+    if conn is not None and conn.info.get('queryStartTime'):
+        conn.info['queryStartTime'].pop()
+
+
+def attach_query_listeners(engine, slowThresholdMs: float, logPath: str, logMaxBytes: int, logBackupCount: int):
+    """Подключение замера запросов к движку и настройка журнала медленных запросов"""
+    global slowQueryThreshold
+    slowQueryThreshold = slowThresholdMs / 1000
+
+    if logPath and not slowQueryLogger.handlers:
+        logDir = os.path.dirname(logPath)
+        if logDir:
+            os.makedirs(logDir, exist_ok=True)
+        handler = RotatingFileHandler(logPath, maxBytes=logMaxBytes, backupCount=logBackupCount, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slowQueryLogger.addHandler(handler)
+        slowQueryLogger.setLevel(logging.WARNING)
+        slowQueryLogger.propagate = False
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine, 'handle_error', handle_error)
+    event.listen(engine, 'checkin', untag_connection)
+
+
+def dump_query_stats(path: str = None) -> dict:
+    """Выгрузка гистограмм запросов; при указании пути сохраняет их в JSON"""
+    stats = queryStats.snapshot()
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+    return stats
@@ -0,0 +1,65 @@
+import random
+import threading
+
+from sqlalchemy import exc
+
+"""Политика повторов транзакций при взаимных блокировках"""
+
+# Коды MySQL: 1213 - deadlock, 1205 - превышено время ожидания блокировки
+RETRYABLE_MYSQL_CODES = (1213, 1205)
+
+
+class RetryStats:
+    """Счетчики повторов транзакций"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.transactions = 0
+            self.retries = 0
+            self.recovered = 0
+            self.exhausted = 0
+            self.byCode = {}
+
+    def record_retry(self, code):
+        with self.lock:
+            self.retries += 1
+            self.byCode[code] = self.byCode.get(code, 0) + 1
+
+    def increment(self, counter: str):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                'transactions': self.transactions,
+                'retries': self.retries,
+                'recovered': self.recovered,
+                'exhausted': self.exhausted,
+                'byCode': dict(self.byCode),
+            }
+
+
+retryStats = RetryStats()
+
+
+def retryable_error_code(error: Exception):
+    """Код ошибки, после которой транзакцию можно повторить, иначе None"""
+    if not isinstance(error, exc.DBAPIError) or error.connection_invalidated:
+        return None
+    orig = error.orig
+    args = getattr(orig, 'args', ())
+    if args and args[0] in RETRYABLE_MYSQL_CODES:
+        return args[0]
+    # Блокировка файла бд SQLite (локальные стенды и бенчмарки)
+    if 'database is locked' in str(orig):
+        return 'sqlite_locked'
+    return None
+
+
+def backoff_delay(attempt: int, baseDelay: float, maxDelay: float) -> float:
+    """Экспоненциальная задержка с полным джиттером"""
+    return random.uniform(0, min(maxDelay, baseDelay * 2 ** (attempt - 1)))
@@ -0,0 +1,21 @@
+import sys
+
+from services.inventory_history_service import take_inventory_snapshot
+
+"""Снимок остатков для запросов остатков на дату; запускается по расписанию (cron, планировщик заданий).
+
+Чем чаще снимки, тем короче хвост журнала движений, читаемый запросом на дату; разумный период - сутки.
+"""
+
+
+def main():
+    result = take_inventory_snapshot()
+    if not result['success']:
+        print(f'Ошибка: {result["data"]}', file=sys.stderr)
+        return 1
+    print(f'Снимок на {result["data"]["takenAt"]}: записано остатков {result["data"]["rows"]}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,12 @@
+import logging
+import multiprocessing
 import os
 import sys
+import time
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QFontDatabase, QFont, QPalette, QColor
-from PyQt6.QtWidgets import QApplication, QStackedWidget
+from PyQt6.QtWidgets import QApplication, QStackedWidget, QWidget
 from sqlalchemy import text
 
 from db.db_session import get_db_session
@@ -16,6 +19,8 @@ from ui.reg_auth_windows.login_window import LoginWindow
 from ui.reg_auth_windows.register_window import RegisterWindow
 from utils.app_state import AppState
 
+logger = logging.getLogger('warehouse.ui')
+
 
 # Загрузка стилей
 def load_stylesheets(*files):
@@ -107,81 +112,134 @@ class FixedWindowManager(QStackedWidget):
         mainWindowManager.init_main_app(AppState.currentUser)
         mainWindowManager.show()
 
+    def show_after_logout(self):
+        """Возврат к окну авторизации после выхода из учетной записи"""
+        self.show_login(self.loginWindow)
+        self.show()
+
 
 class ResizableWindowManager(QStackedWidget):
     """Менеджер для главных окон приложения"""
+
+    # Пользователь вышел из учетной записи
+    sessionEnded = pyqtSignal()
+
+    # Классы страниц в порядке их размещения в стеке
+    pageClasses = {
+        'main': MainWindow,
+        'inventory': InventoryWindow,
+        'shipments': ShipmentsWindow,
+        'transfers': TransfersWindow,
+        'userControls': UserControlsWindow,
+    }
+
     def __init__(self):
         super().__init__()
+        # Пользователь, под которым выполнен вход
+        self.user = None
         # Роль, под которой авторизировался пользователь
         self.userRole = None
-        # Главные окна приложения
-        self.mainWindow = None
-        self.inventoryWindow = None
-        self.shipmentsWindow = None
-        self.transfersWindow = None
-        self.userControlsWindow = None
+        # Созданные страницы и заглушки для еще не открытых
+        self.pages = {}
+        self.placeholders = {}
 
     def init_main_app(self, user):
+        # Страницы предыдущей сессии привязаны к ее пользователю и роли
+        if self.pages or self.placeholders:
+            self.end_session()
+
+        self.user = user
         self.userRole = user.role
 
-        self.mainWindow = MainWindow(user)
-        self.inventoryWindow = InventoryWindow(user)
-        self.shipmentsWindow = ShipmentsWindow(user)
-        self.transfersWindow = TransfersWindow(user)
-        self.userControlsWindow = UserControlsWindow(user)
+        # Страницы создаются при первом переходе, до этого в стеке находятся заглушки
+        for name in self.pageClasses:
+            placeholder = QWidget()
+            self.placeholders[name] = placeholder
+            self.addWidget(placeholder)
+
+        # Установка начального окна
+        self.show_page('main')
 
-        # Стек страниц
-        pages = []
-        pages.append(self.mainWindow)
-        pages.append(self.inventoryWindow)
-        pages.append(self.shipmentsWindow)
-        pages.append(self.transfersWindow)
-        pages.append(self.userControlsWindow)
+    def get_page(self, name):
+        """Страница по имени; создается при первом обращении на месте заглушки"""
+        page = self.pages.get(name)
+        if page is not None:
+            return page
 
-        # Подключение кнопок навигационной панели
-        for i in range(len(pages)):
-            pages[i].navPanel.switchToMainPage.connect(self.switch_to_main)
-            pages[i].navPanel.switchToInventory.connect(self.switch_to_inventory)
-            pages[i].navPanel.switchToShipments.connect(self.switch_to_shipments)
-            pages[i].navPanel.switchToTransfers.connect(self.switch_to_transfers)
-            pages[i].navPanel.switchToUserControls.connect(self.switch_to_user_controls)
+        startTime = time.perf_counter()
+        page = self.pageClasses[name](self.user)
+        logger.info('Страница %s создана за %.1f мс', name, (time.perf_counter() - startTime) * 1000)
 
-        # Добавление окон в менеджер
-        self.addWidget(self.mainWindow)
-        self.addWidget(self.inventoryWindow)
-        self.addWidget(self.shipmentsWindow)
-        self.addWidget(self.transfersWindow)
-        self.addWidget(self.userControlsWindow)
+        # Подключение кнопок навигационной панели
+        page.navPanel.switchToMainPage.connect(self.switch_to_main)
+        page.navPanel.switchToInventory.connect(self.switch_to_inventory)
+        page.navPanel.switchToShipments.connect(self.switch_to_shipments)
+        page.navPanel.switchToTransfers.connect(self.switch_to_transfers)
+        page.navPanel.switchToUserControls.connect(self.switch_to_user_controls)
+        page.navPanel.logout.connect(self.logout)
+
+        # Замена заглушки страницей
+        placeholder = self.placeholders.pop(name)
+        self.insertWidget(self.indexOf(placeholder), page)
+        self.removeWidget(placeholder)
+        placeholder.deleteLater()
+
+        self.pages[name] = page
+        return page
+
+    def end_session(self):
+        """Удаление страниц и заглушек текущей сессии из стека"""
+        for page in self.pages.values():
+            serviceRunner = getattr(page, 'serviceRunner', None)
+            if serviceRunner is not None:
+                serviceRunner.cancel_all()
+
+        for widget in [*self.pages.values(), *self.placeholders.values()]:
+            self.removeWidget(widget)
+            widget.deleteLater()
+
+        self.pages.clear()
+        self.placeholders.clear()
+        self.user = None
+        self.userRole = None
 
-        # Установка начального окна
-        self.mainWindow.apply_window_properties(self)
-        self.setCurrentWidget(self.mainWindow)
+    def logout(self):
+        """Выход из учетной записи с возвратом к окну авторизации"""
+        self.hide()
+        self.end_session()
+        AppState.currentUser = None
+        self.sessionEnded.emit()
+
+    def show_page(self, name, refresh=False):
+        """Переход на страницу; уже созданная страница при необходимости обновляет данные"""
+        isCreated = name in self.pages
+        page = self.get_page(name)
+        if refresh and isCreated:
+            page.refresh()
+        page.apply_window_properties(self)
+        self.setCurrentWidget(page)
 
     def switch_to_main(self):
-        self.mainWindow.apply_window_properties(self)
-        self.setCurrentWidget(self.mainWindow)
+        self.show_page('main')
 
     def switch_to_inventory(self):
-        self.inventoryWindow.refresh()
-        self.inventoryWindow.apply_window_properties(self)
-        self.setCurrentWidget(self.inventoryWindow)
+        self.show_page('inventory', refresh=True)
 
     def switch_to_shipments(self):
-        self.shipmentsWindow.refresh()
-        self.shipmentsWindow.apply_window_properties(self)
-        self.setCurrentWidget(self.shipmentsWindow)
+        self.show_page('shipments', refresh=True)
 
     def switch_to_transfers(self):
-        self.transfersWindow.refresh()
-        self.transfersWindow.apply_window_properties(self)
-        self.setCurrentWidget(self.transfersWindow)
+        self.show_page('transfers', refresh=True)
 
     def switch_to_user_controls(self):
-        self.userControlsWindow.apply_window_properties(self)
-        self.setCurrentWidget(self.userControlsWindow)
+        self.show_page('userControls')
 
 
 if __name__ == "__main__":
+    # Пул процессов хэширования паролей в собранном PyInstaller приложении
+    multiprocessing.freeze_support()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
     isDbConnected = False
     try:
         with get_db_session() as session:
@@ -209,6 +267,7 @@ if __name__ == "__main__":
         # Создание менеджеров окон
         regAuthWindowManager = FixedWindowManager()
         mainWindowManager = ResizableWindowManager()
+        mainWindowManager.sessionEnded.connect(regAuthWindowManager.show_after_logout)
 
         # Активация менеджера окон
         regAuthWindowManager.show()
@@ -0,0 +1,40 @@
+import argparse
+import multiprocessing
+import sys
+
+from services.provisioning_service import CSV_COLUMNS, read_employees_csv, provision_users, write_report
+
+"""Массовое заведение сотрудников из csv: python provision_users.py employees.csv --report report.csv
+
+Колонки файла: last_name, first_name, passport_series, passport_number, phone_number, post,
+warehouses (названия через запятую), role, login, password. Без логина и пароля сотруднику
+выдается пригласительный код, с ними - сразу создается учетная запись.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', help='csv с сотрудниками (заголовок: ' + ', '.join(CSV_COLUMNS) + ')')
+    parser.add_argument('--report', default='provision_report.csv', help='csv с результатом по каждой строке')
+    parser.add_argument('--chunk-size', type=int, help='сотрудников в одной транзакции')
+    parser.add_argument('--workers', type=int, help='процессов для хэширования паролей (по умолчанию - по ядрам)')
+    args = parser.parse_args()
+
+    result = provision_users(read_employees_csv(args.file), args.chunk_size, args.workers)
+    if not result['success']:
+        print(f'Ошибка: {result["message"]}', file=sys.stderr)
+        return 2
+
+    report = result['data']
+    write_report(args.report, report)
+    created = sum(1 for row in report if row['success'])
+    print(f'Заведено сотрудников: {created} из {len(report)}. Отчет: {args.report}')
+    for row in report:
+        if not row['success']:
+            print(f'  строка {row["row"]}: {row["message"]}')
+    return 0 if created == len(report) else 1
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,33 +1,47 @@
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from db.db_session import get_db_session
 from db.models import InviteCode, UserAccount, t_employee_warehouse
+from services.name_cache import warm_name_cache
 from utils.app_state import AppState, User
-from utils.password_utils import hash_password, verify_password
+from utils.password_utils import hash_password, verify_password, needs_rehash
 
 
-def register_user(inviteCode: str, login: str, password: str) -> dict:
-    """Внесение нового пользователя в бд"""
-    with get_db_session() as session:
-        try:
-            # Сверка пригласительного кода
-            stmt = select(InviteCode).where(InviteCode.code == inviteCode, InviteCode.is_active == 1)
-            inviteCodeObj = session.scalar(stmt)
+def check_registration(session, inviteCode: str, login: str):
+    """Пригласительный код для регистрации и текст ошибки, если регистрация невозможна"""
+    # Сверка пригласительного кода
+    stmt = select(InviteCode).where(InviteCode.code == inviteCode, InviteCode.is_active == 1)
+    inviteCodeObj = session.scalar(stmt)
+
+    # Пригласительного кода не существует или он уже активирован
+    if not inviteCodeObj:
+        return None, 'Некорректный код приглашения'
 
-            # Пригласительного кода не существует или он уже активирован
-            if not inviteCodeObj:
-                return {'success': False, 'message': 'Некорректный код приглашения'}
+    # Проверка на уникальность введенного логина
+    stmt = select(UserAccount.id).where(UserAccount.login == login)
+    loginExists = session.scalar(stmt)
 
-            # Проверка на уникальность введенного логина
-            stmt = select(UserAccount).where(UserAccount.login == login)
-            loginExists = session.scalar(stmt)
+    # Такой логин уже существует
+    if loginExists:
+        return None, 'Введенный логин уже существует'
+    return inviteCodeObj, None
+
+def register_user(inviteCode: str, login: str, password: str) -> dict:
+    """Внесение нового пользователя в бд"""
+    try:
+        with get_db_session() as session:
+            _, error = check_registration(session, inviteCode, login)
+        if error:
+            return {'success': False, 'message': error}
 
-            # Такой логин уже существует
-            if loginExists:
-                return {'success' : False, 'message': 'Введенный логин уже существует'}
+        # Хеширование пароля без занятого соединения с бд
+        hashedPassword = hash_password(password)
 
-            # Хеширование пароля
-            hashedPassword = hash_password(password)
+        with get_db_session() as session:
+            # Повторная проверка: за время хеширования код мог быть использован
+            inviteCodeObj, error = check_registration(session, inviteCode, login)
+            if error:
+                return {'success': False, 'message': error}
 
             # Добавление нового пользователя
             newUser = UserAccount(login=login,
@@ -43,33 +57,48 @@ def register_user(inviteCode: str, login: str, password: str) -> dict:
             stmt = select(t_employee_warehouse.c.warehouse_id).where(
                 t_employee_warehouse.c.employee_id == inviteCodeObj.employee_id)
             warehouseIds = session.execute(stmt).scalars().all()
+            roleId = inviteCodeObj.role_id
 
-            AppState.currentUser = User(login=newUser.login,role=newUser.role_id, warehouses=warehouseIds)
-            return {'success': True, 'message': 'Регистрация прошла успешно'}
-        except Exception as e:
-            return {'success': False, 'message': str(e)}
+        # Пользователь входит в систему только после фиксации регистрации
+        AppState.currentUser = User(login=login, role=roleId, warehouses=warehouseIds)
+
+        # Прогрев кэша имен товаров и складов
+        warm_name_cache()
+        return {'success': True, 'message': 'Регистрация прошла успешно'}
+    except Exception as e:
+        return {'success': False, 'message': str(e)}
 
 def authorize_user(login: str, password: str) -> dict:
     """Авторизация пользователя"""
-    with get_db_session() as session:
-        try:
-            #Получение пользователя по логину
-            stmt = select(UserAccount).where(UserAccount.login == login)
-            userObj = session.scalar(stmt)
+    try:
+        #Получение пользователя по логину
+        with get_db_session() as session:
+            stmt = select(UserAccount.id, UserAccount.login, UserAccount.password, UserAccount.employee_id,
+                          UserAccount.role_id, UserAccount.is_active).where(UserAccount.login == login)
+            userObj = session.execute(stmt).one_or_none()
+
+        # Проверка пароля выполняется без занятого соединения с бд: bcrypt работает сотни миллисекунд
+        if not userObj or not verify_password(password, userObj.password):
+            return {'success': False, 'message': 'Неверный логин или пароль'}
+        if not userObj.is_active:
+            return {'success': False, 'message': 'Учетная запись деактивирована'}
 
-            # Проверка на существование пользователя
-            if userObj:
+        # Хэш со старой стоимостью заменяется при успешном входе, пока известен пароль
+        newHash = hash_password(password) if needs_rehash(userObj.password) else None
 
-                if verify_password(password, userObj.password):
-                    if not userObj.is_active:
-                        return {'success': False, 'message': 'Учетная запись деактивирована'}
-                    stmt = select(t_employee_warehouse.c.warehouse_id).where(
-                        t_employee_warehouse.c.employee_id == userObj.employee_id)
-                    warehouseIds = session.execute(stmt).scalars().all()
+        with get_db_session() as session:
+            if newHash:
+                session.execute(update(UserAccount).where(UserAccount.id == userObj.id,
+                                                          UserAccount.password == userObj.password)
+                                .values(password=newHash))
+            stmt = select(t_employee_warehouse.c.warehouse_id).where(
+                t_employee_warehouse.c.employee_id == userObj.employee_id)
+            warehouseIds = session.execute(stmt).scalars().all()
 
-                    AppState.currentUser = User(login=userObj.login, role=userObj.role_id, warehouses=warehouseIds)
-                    return {'success': True, 'message': 'Авторизация прошла успешно'}
+        AppState.currentUser = User(login=userObj.login, role=userObj.role_id, warehouses=warehouseIds)
 
-            return {'success': False, 'message': 'Неверный логин или пароль'}
-        except Exception as e:
-            return {'success': False, 'message': str(e)}
\ No newline at end of file
+        # Прогрев кэша имен товаров и складов
+        warm_name_cache()
+        return {'success': True, 'message': 'Авторизация прошла успешно'}
+    except Exception as e:
+        return {'success': False, 'message': str(e)}
@@ -2,6 +2,7 @@ from sqlalchemy import select
 
 from db.db_session import get_db_session
 from db.models import Employee, Warehouse, UserAccount, Role, Post
+from services.reference_cache import cached_reference
 
 
 def get_users():
@@ -18,6 +19,7 @@ def get_users():
             usersList.append(user)
     return usersList
 
+@cached_reference('roles')
 def get_roles():
     with get_db_session() as session:
         stmt = select(Role.name)
@@ -25,6 +27,7 @@ def get_roles():
 
         return roles
 
+@cached_reference('posts')
 def get_posts():
     with get_db_session() as session:
         stmt = select(Post.name)
@@ -32,6 +35,7 @@ def get_posts():
 
         return posts
 
+@cached_reference('warehouses')
 def get_warehouses(warehouses=None):
     with get_db_session() as session:
         stmt = select(Warehouse.id, Warehouse.name)
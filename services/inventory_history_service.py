@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, func, and_
+
+from db.db_session import get_db_session
+from db.models import Inventory, InventoryMovement, InventorySnapshot, Product, Warehouse
+from utils.settings import config_private
+
+"""Остатки на дату по журналу движений и периодическим снимкам.
+
+Каждый снимок (запуск take_inventory_snapshot) записывает остаток на момент снимка для всех пар
+(склад, товар), по которым были движения после предыдущего снимка; первый снимок копирует хранилище целиком.
+Поэтому остаток пары на дату X - ее последний снимок не позже последнего запуска P <= X плюс движения
+журнала в интервале (P, X]: хвост журнала ограничен периодом между снимками, а не всей историей.
+"""
+
+# Снимок строится по движениям старше этого возраста (сек), чтобы не пропустить еще не зафиксированные транзакции
+SNAPSHOT_SETTLE_SECONDS = getattr(config_private, 'INVENTORY_SNAPSHOT_SETTLE_SECONDS', 300)
+
+# Строк в одной пакетной вставке снимка
+SNAPSHOT_CHUNK_SIZE = 5000
+
+
+def latest_snapshot_time(session, asOf: datetime = None):
+    """Время последнего снимка не позже asOf (последнего вообще, если asOf не задан); None - снимков нет"""
+    stmt = select(func.max(InventorySnapshot.taken_at))
+    if asOf is not None:
+        stmt = stmt.where(InventorySnapshot.taken_at <= asOf)
+    return session.scalar(stmt)
+
+
+def snapshot_quantities(session, takenAt: datetime, warehouseIds=None, productIds=None) -> dict:
+    """Остатки {(id склада, id товара): количество} по последним снимкам пар не позже takenAt"""
+    latest = select(InventorySnapshot.warehouse_id, InventorySnapshot.product_id,
+                    func.max(InventorySnapshot.taken_at).label('taken_at'))\
+        .where(InventorySnapshot.taken_at <= takenAt)\
+        .group_by(InventorySnapshot.warehouse_id, InventorySnapshot.product_id)
+    if warehouseIds is not None:
+        latest = latest.where(InventorySnapshot.warehouse_id.in_(warehouseIds))
+    if productIds is not None:
+        latest = latest.where(InventorySnapshot.product_id.in_(productIds))
+    latest = latest.subquery()
+
+    stmt = select(InventorySnapshot.warehouse_id, InventorySnapshot.product_id, InventorySnapshot.quantity)\
+        .join(latest, and_(InventorySnapshot.warehouse_id == latest.c.warehouse_id,
+                           InventorySnapshot.product_id == latest.c.product_id,
+                           InventorySnapshot.taken_at == latest.c.taken_at))
+    return {(warehouseId, productId): quantity for warehouseId, productId, quantity in session.execute(stmt)}
+
+
+def movement_totals(session, after: datetime, until: datetime = None, warehouseIds=None, productIds=None) -> dict:
+    """Суммарные изменения {(id склада, id товара): количество} по журналу в интервале (after, until]; until=None - без границы"""
+    stmt = select(InventoryMovement.warehouse_id, InventoryMovement.product_id, func.sum(InventoryMovement.quantity))\
+        .where(InventoryMovement.created_at > after)\
+        .group_by(InventoryMovement.warehouse_id, InventoryMovement.product_id)
+    if until is not None:
+        stmt = stmt.where(InventoryMovement.created_at <= until)
+    if warehouseIds is not None:
+        stmt = stmt.where(InventoryMovement.warehouse_id.in_(warehouseIds))
+    if productIds is not None:
+        stmt = stmt.where(InventoryMovement.product_id.in_(productIds))
+    return {(warehouseId, productId): int(total) for warehouseId, productId, total in session.execute(stmt)}
+
+
+def stock_as_of(session, asOf: datetime, warehouseIds=None, productIds=None):
+    """Остатки {(id склада, id товара): количество} на момент asOf; None, если asOf раньше первого снимка"""
+    snapshotTime = latest_snapshot_time(session, asOf)
+    if snapshotTime is None:
+        return None
+    quantities = snapshot_quantities(session, snapshotTime, warehouseIds, productIds)
+    for pair, delta in movement_totals(session, snapshotTime, asOf, warehouseIds, productIds).items():
+        quantities[pair] = quantities.get(pair, 0) + delta
+    return quantities
+
+
+def get_stock_as_of(asOf: datetime, warehouseIds: list = None, productIds: list = None):
+    """Остатки на дату: [(товар, склад, количество), ...] без нулевых остатков"""
+    with get_db_session() as session:
+        try:
+            quantities = stock_as_of(session, asOf, warehouseIds, productIds)
+            if quantities is None:
+                return {'success': False, 'data': 'На эту дату история остатков еще не велась'}
+
+            pairs = [pair for pair, quantity in quantities.items() if quantity]
+            products = dict(session.execute(select(Product.id, Product.name)
+                                            .where(Product.id.in_({productId for _, productId in pairs}))).all())
+            warehouses = dict(session.execute(select(Warehouse.id, Warehouse.name)
+                                              .where(Warehouse.id.in_({warehouseId for warehouseId, _ in pairs}))).all())
+            rows = sorted((products[productId], warehouses[warehouseId], quantities[(warehouseId, productId)])
+                          for warehouseId, productId in pairs)
+            return {'success': True, 'data': rows}
+        except Exception as e:
+            return {'success': False, 'data': str(e)}
+
+
+def take_inventory_snapshot(now: datetime = None):
+    """Очередной снимок остатков (для запуска по расписанию).
+
+    Первый снимок - все хранилище, следующие - только пары с движениями после предыдущего снимка;
+    без движений ничего не записывается - хвост журнала от прежнего снимка остается верным.
+    Время снимка берется с часов бд, как и время движений журнала, за вычетом SNAPSHOT_SETTLE_SECONDS;
+    now задается только в замерах.
+    """
+    with get_db_session() as session:
+        try:
+            previous = latest_snapshot_time(session)
+            now = now or session.scalar(select(func.now()))
+            takenAt = now - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+            if previous is None:
+                # Остаток на момент снимка - текущий минус движения после него: движение транзакции,
+                # зафиксированной позже чтения, попадает в хвост журнала, а не теряется между снимком и журналом
+                quantities = {(warehouseId, productId): quantity for warehouseId, productId, quantity
+                              in session.execute(select(Inventory.warehouse_id, Inventory.product_id,
+                                                        Inventory.quantity))}
+                for pair, delta in movement_totals(session, takenAt).items():
+                    quantities[pair] = quantities.get(pair, 0) - delta
+            else:
+                if takenAt <= previous:
+                    return {'success': True, 'data': {'takenAt': previous, 'rows': 0}}
+                deltas = movement_totals(session, previous, takenAt)
+                quantities = snapshot_quantities(session, previous, {warehouseId for warehouseId, _ in deltas})
+                quantities = {pair: quantities.get(pair, 0) + delta for pair, delta in deltas.items()}
+
+            rows = [{'warehouse_id': warehouseId, 'product_id': productId, 'quantity': quantity, 'taken_at': takenAt}
+                    for (warehouseId, productId), quantity in quantities.items()]
+            for start in range(0, len(rows), SNAPSHOT_CHUNK_SIZE):
+                session.execute(insert(InventorySnapshot), rows[start:start + SNAPSHOT_CHUNK_SIZE])
+            return {'success': True, 'data': {'takenAt': takenAt, 'rows': len(rows)}}
+        except Exception as e:
+            return {'success': False, 'data': str(e)}
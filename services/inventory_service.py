@@ -1,80 +1,231 @@
 from datetime import datetime
 
-from sqlalchemy import select, update
+from sqlalchemy import select, update, delete, insert, func, and_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 
 from db.db_session import get_db_session
-from db.models import Product, Inventory, Warehouse
+from db.models import Product, Inventory, Warehouse, InventoryMovement, InventorySnapshot
+from services.name_cache import resolve_product_id, resolve_warehouse_id, productCache, on_commit, \
+    forget_names
+from services.reference_cache import cached_reference, invalidate_reference
+from utils.settings import config_private
 
+# Максимально допустимое количество товара в одной записи хранилища
+MAX_QUANTITY = 2000000000
 
-def get_inventory(warehouseIds:list = None):
-    """Получение записей о хранящихся товарах"""
+# Число записей хранилища, выше которого поиск и фильтры выполняются в бд
+SERVER_FILTER_THRESHOLD = getattr(config_private, 'INVENTORY_SERVER_FILTER_THRESHOLD', 20000)
+
+# Код ошибки MySQL при нарушении уникального индекса
+MYSQL_DUPLICATE_KEY = 1062
+
+# Виды движений журнала остатков
+MOVEMENT_SHIPMENT = 'shipment'
+MOVEMENT_TRANSFER_OUT = 'transfer_out'
+MOVEMENT_TRANSFER_IN = 'transfer_in'
+MOVEMENT_ADJUSTMENT = 'adjustment'
+MOVEMENT_REMOVAL = 'removal'
+
+
+def get_inventory(warehouseIds:list = None, nameContains: str = None, namePrefix: str = None,
+                  warehouseName: str = None, minQuantity: int = None, maxQuantity: int = None,
+                  updatedSince: datetime = None, limit: int = None):
+    """Получение записей о хранящихся товарах; фильтры применяются в бд"""
     with get_db_session() as session:
         stmt = select(Product.name, Warehouse.name, Inventory.quantity, Inventory.updated_at)\
             .join(Product, Product.id == Inventory.product_id)\
-            .join(Warehouse, Warehouse.id == Inventory.warehouse_id)
+            .join(Warehouse, Warehouse.id == Inventory.warehouse_id)\
+            .order_by(Inventory.warehouse_id, Inventory.product_id)
         #Фильтр складов, если указан
         if warehouseIds:
             stmt = stmt.where(Inventory.warehouse_id.in_(warehouseIds))
+        if warehouseName:
+            stmt = stmt.where(Warehouse.name == warehouseName)
+
+        # Поиск по названию: префикс использует индекс name_UNIQUE, подстрока проверяется LIKE по таблице товаров
+        if namePrefix:
+            stmt = stmt.where(Product.name.startswith(namePrefix, autoescape=True))
+        if nameContains:
+            stmt = stmt.where(product_name_contains(nameContains))
+
+        # Диапазон количества и дата изменения (индексы по складу и полю)
+        if minQuantity is not None:
+            stmt = stmt.where(Inventory.quantity >= minQuantity)
+        if maxQuantity is not None:
+            stmt = stmt.where(Inventory.quantity <= maxQuantity)
+        if updatedSince is not None:
+            stmt = stmt.where(Inventory.updated_at >= updatedSince)
+        if limit:
+            stmt = stmt.limit(limit)
 
         inventory = session.execute(stmt).all()
         return inventory
 
+def product_name_contains(term: str):
+    """Условие вхождения подстроки в название товара.
+
+    Только LIKE: полнотекстовый поиск зависит от стоп-слов и длины токена ngram и мог отбрасывать
+    названия, которые находит фильтр на клиенте, - результаты выше и ниже порога должны совпадать.
+    """
+    return Product.name.contains(term, autoescape=True)
+
+def get_inventory_warehouse_names(warehouseIds: list = None) -> list:
+    """Названия складов, на которых есть записи хранилища"""
+    with get_db_session() as session:
+        stmt = select(Warehouse.name).where(select(Inventory.id).where(Inventory.warehouse_id == Warehouse.id).exists())\
+            .order_by(Warehouse.name)
+        if warehouseIds:
+            stmt = stmt.where(Warehouse.id.in_(warehouseIds))
+        return list(session.scalars(stmt))
+
+def count_inventory(warehouseIds: list = None) -> int:
+    """Количество записей хранилища в складах пользователя"""
+    with get_db_session() as session:
+        stmt = select(func.count()).select_from(Inventory)
+        if warehouseIds:
+            stmt = stmt.where(Inventory.warehouse_id.in_(warehouseIds))
+        return session.scalar(stmt)
+
+def search_inventory(warehouseIds: list = None, productName: str = None, warehouseName: str = None):
+    """Данные таблицы хранилища: до порога строк загружается все хранилище и фильтрует клиент,
+    выше порога фильтры выполняются в бд, а выдача ограничивается порогом"""
+    try:
+        if count_inventory(warehouseIds) <= SERVER_FILTER_THRESHOLD:
+            return {'success': True, 'serverSide': False, 'data': get_inventory(warehouseIds)}
+        rows = get_inventory(warehouseIds, nameContains=productName or None, warehouseName=warehouseName or None,
+                             limit=SERVER_FILTER_THRESHOLD + 1)
+        return {
+            'success': True,
+            'serverSide': True,
+            'truncated': len(rows) > SERVER_FILTER_THRESHOLD,
+            'data': rows[:SERVER_FILTER_THRESHOLD]
+        }
+    except Exception as e:
+        return {'success': False, 'data': str(e)}
+
+def new_quantity_in_range(delta: int):
+    """Условие UPDATE: остаток после изменения на delta остается в пределах 0..MAX_QUANTITY"""
+    return and_(Inventory.quantity >= -delta, Inventory.quantity <= MAX_QUANTITY - delta)
+
 def add_count(productName,warehouse, quantity):
+    if quantity <= 0:
+        return {'success': False, 'message': 'Количество должно быть больше нуля'}
     with get_db_session() as session:
         try:
-            stmt = select(Inventory.quantity).where(
-                Inventory.product_id == (select(Product.id).where(Product.name == productName).scalar_subquery()),
-                Inventory.warehouse_id == (select(Warehouse.id).where(Warehouse.name == warehouse)).scalar_subquery())
-            currentQuantity = session.execute(stmt).scalar()
-            if currentQuantity + quantity > 2000000000:
-                return {'success': False, 'message': 'Получившееся значение после изменения слишком большое'}
+            productId = resolve_product_id(session, productName)
+            warehouseId = resolve_warehouse_id(session, warehouse)
+            if productId is None or warehouseId is None:
+                return {'success': False, 'message': 'Этого товара нет складе'}
 
+            # Проверка границ выполняется в самом UPDATE - без отдельного чтения и гонки между запросами
             stmt = update(Inventory).where(
-                Inventory.product_id==(select(Product.id).where(Product.name==productName).scalar_subquery()),
-                Inventory.warehouse_id==(select(Warehouse.id).where(Warehouse.name==warehouse)).scalar_subquery())\
-                .values(quantity=quantity+Inventory.quantity).values(updated_at=datetime.now())
-            session.execute(stmt)
+                Inventory.product_id == productId,
+                Inventory.warehouse_id == warehouseId,
+                new_quantity_in_range(quantity))\
+                .values(quantity=Inventory.quantity + quantity, updated_at=datetime.now())\
+                .execution_options(synchronize_session=False)
+            result = session.execute(stmt)
+            if result.rowcount == 0:
+                if not inventory_row_exists(session, productId, warehouseId):
+                    forget_names(productName, warehouse)
+                    return {'success': False, 'message': 'Этого товара нет складе'}
+                return {'success': False, 'message': 'Получившееся значение после изменения слишком большое'}
+            record_movements(session, MOVEMENT_ADJUSTMENT, [(warehouseId, productId, quantity)])
         except Exception as e:
             return {'success': False, 'message':e}
         return {'success': True, 'message':'Количество товара успешно обновлено'}
 
 def substract_count(productName,warehouse, quantity):
+    if quantity <= 0:
+        return {'success': False, 'message': 'Количество должно быть больше нуля'}
     with get_db_session() as session:
         try:
-            stmt = select(Inventory.quantity).where(
-                Inventory.product_id == (select(Product.id).where(Product.name == productName).scalar_subquery()),
-                Inventory.warehouse_id == (select(Warehouse.id).where(Warehouse.name == warehouse)).scalar_subquery())
-            currentQuantity = session.execute(stmt).scalar()
-
-            if currentQuantity < quantity:
-                return {'success': False, 'message': 'Вы пытаетесь вычесть слишком большое число'}
+            productId = resolve_product_id(session, productName)
+            warehouseId = resolve_warehouse_id(session, warehouse)
+            if productId is None or warehouseId is None:
+                return {'success': False, 'message': 'Этого товара нет складе'}
 
+            # Проверка границ остатка выполняется в самом UPDATE
             stmt = update(Inventory).where(
-                Inventory.product_id == (select(Product.id).where(Product.name == productName).scalar_subquery()),
-                Inventory.warehouse_id == (select(Warehouse.id).where(Warehouse.name == warehouse)).scalar_subquery()) \
-                .values(quantity=Inventory.quantity - quantity).values(updated_at=datetime.now())
-
-            session.execute(stmt)
+                Inventory.product_id == productId,
+                Inventory.warehouse_id == warehouseId,
+                new_quantity_in_range(-quantity))\
+                .values(quantity=Inventory.quantity - quantity, updated_at=datetime.now())\
+                .execution_options(synchronize_session=False)
+            result = session.execute(stmt)
+            if result.rowcount == 0:
+                if not inventory_row_exists(session, productId, warehouseId):
+                    forget_names(productName, warehouse)
+                    return {'success': False, 'message': 'Этого товара нет складе'}
+                return {'success': False, 'message': 'Вы пытаетесь вычесть слишком большое число'}
+            record_movements(session, MOVEMENT_ADJUSTMENT, [(warehouseId, productId, -quantity)])
         except Exception as e:
             return {'success': False, 'message':e}
         return {'success': True, 'message':'Количество товара успешно обновлено'}
 
+def inventory_row_exists(session, productId, warehouseId) -> bool:
+    """Проверка наличия записи о товаре на складе (только для выбора текста ошибки)"""
+    stmt = select(Inventory.id).where(Inventory.product_id == productId, Inventory.warehouse_id == warehouseId)
+    return session.execute(stmt).first() is not None
+
+def record_movements(session, kind: str, movements: list, documentId: int = None):
+    """Запись движений [(id склада, id товара, изменение количества), ...] в журнал остатков одной вставкой.
+
+    Журнал только дополняется; вызывается в той же транзакции, что и изменение хранилища.
+    Время движения берется с часов бд - по ним же строятся снимки (inventory_history_service).
+    """
+    rows = [{'warehouse_id': warehouseId, 'product_id': productId, 'quantity': quantity, 'kind': kind,
+             'document_id': documentId}
+            for warehouseId, productId, quantity in movements if quantity]
+    if rows:
+        session.execute(insert(InventoryMovement).values(created_at=func.now()), rows)
+
+def upsert_inventory(session, warehouseId, quantities: dict):
+    """Зачисление товаров на склад: INSERT ... ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)"""
+    table = Inventory.__table__
+    now = datetime.now()
+    rows = [{'warehouse_id': warehouseId, 'product_id': productId, 'quantity': quantity, 'updated_at': now}
+            for productId, quantity in quantities.items()]
+    if session.get_bind().dialect.name == 'mysql':
+        stmt = mysql_insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(quantity=table.c.quantity + stmt.inserted.quantity,
+                                            updated_at=stmt.inserted.updated_at)
+    else:
+        # SQLite (локальные стенды и бенчмарки): то же зачисление через ON CONFLICT DO UPDATE
+        stmt = sqlite_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=['warehouse_id', 'product_id'],
+                                          set_={'quantity': table.c.quantity + stmt.excluded.quantity,
+                                                'updated_at': stmt.excluded.updated_at})
+    session.execute(stmt)
+
+def is_duplicate_key(error: IntegrityError) -> bool:
+    """Нарушение уникального индекса (MySQL 1062, SQLite UNIQUE), а не внешнего ключа или другого ограничения"""
+    args = getattr(error.orig, 'args', ())
+    if args and args[0] == MYSQL_DUPLICATE_KEY:
+        return True
+    return 'UNIQUE constraint failed' in str(error.orig)
+
 def add_new_product_to_warehouse(productName,warehouse):
     with get_db_session() as session:
         try:
-            stmt = select(Inventory).where(
-                Inventory.product_id == (select(Product.id).where(Product.name == productName).scalar_subquery()),
-                Inventory.warehouse_id == (select(Warehouse.id).where(Warehouse.name == warehouse)).scalar_subquery())
-            isAlreadeExists = session.execute(stmt).scalar()
-            if isAlreadeExists:
-                return {'success': False, 'message':'Этот товар уже есть на складе'}
-
-            warehouseId = session.scalar(select(Warehouse.id).where(Warehouse.name == warehouse))
-            productId = session.scalar(select(Product.id).where(Product.name == productName))
+            productId = resolve_product_id(session, productName)
+            warehouseId = resolve_warehouse_id(session, warehouse)
+            if productId is None or warehouseId is None:
+                return {'success': False, 'message': 'Товар или склад не найден'}
 
-            newInventory = Inventory(product_id=productId, warehouse_id=warehouseId, quantity=0, updated_at=datetime.now())
-
-            session.add(newInventory)
+            # Повторное добавление отсекает уникальный индекс (warehouse_id, product_id) без отдельной проверки
+            try:
+                session.execute(insert(Inventory).values(product_id=productId, warehouse_id=warehouseId,
+                                                         quantity=0, updated_at=datetime.now()))
+            except IntegrityError as e:
+                session.rollback()
+                if is_duplicate_key(e):
+                    return {'success': False, 'message':'Этот товар уже есть на складе'}
+                # Товар или склад удален после разрешения имени - имена из кэша больше не действительны
+                forget_names(productName, warehouse)
+                return {'success': False, 'message':'Не удалось добавить товар на склад'}
             return {'success':True, 'message':'Новый товар успешно добавлен'}
 
         except Exception as e:
@@ -83,18 +234,28 @@ def add_new_product_to_warehouse(productName,warehouse):
 def del_product_from_warehouse(productName,warehouse):
     with get_db_session() as session:
         try:
-            stmt = select(Inventory).where(
-                Inventory.product_id == (select(Product.id).where(Product.name == productName).scalar_subquery()),
-                Inventory.warehouse_id == (select(Warehouse.id).where(Warehouse.name == warehouse)).scalar_subquery())
-            inventoryItem = session.execute(stmt).scalar()
-            if inventoryItem:
-                session.delete(inventoryItem)
+            productId = resolve_product_id(session, productName)
+            warehouseId = resolve_warehouse_id(session, warehouse)
+            if productId is None or warehouseId is None:
+                return {'success': False, 'message': 'Этого товара нет складе'}
+
+            # Остаток удаляемой записи списывается в журнале, чтобы остатки на дату сходились
+            stmt = select(Inventory.quantity).where(Inventory.product_id == productId,
+                                                    Inventory.warehouse_id == warehouseId).with_for_update()
+            quantity = session.scalar(stmt)
+
+            stmt = delete(Inventory).where(Inventory.product_id == productId, Inventory.warehouse_id == warehouseId)\
+                .execution_options(synchronize_session=False)
+            if session.execute(stmt).rowcount:
+                record_movements(session, MOVEMENT_REMOVAL, [(warehouseId, productId, -quantity)])
                 return {'success': True, 'message':'Товар успешно удален'}
+            forget_names(productName, warehouse)
             return {'success': False, 'message': 'Этого товара нет складе'}
 
         except Exception as e:
             return {'success': False, 'message':e}
 
+@cached_reference('products')
 def get_all_products():
     with get_db_session() as session:
         try:
@@ -105,6 +266,7 @@ def get_all_products():
         except Exception as e:
             return {'success': False, 'message':e}
 
+@cached_reference('products')
 def get_all_product_and_ids():
     with get_db_session() as session:
         stmt = select(Product.id, Product.name)
@@ -121,6 +283,12 @@ def add_product(productName):
 
             newProduct = Product(name=productName)
             session.add(newProduct)
+            session.flush()
+
+            # Новый товар попадает в кэш имен только после фиксации транзакции
+            newProductId = newProduct.id
+            on_commit(session, lambda: productCache.put(newProductId, productName))
+            on_commit(session, lambda: invalidate_reference('products'))
 
             return {'success': True, 'message': 'Новый товар успешно добавлен'}
         except Exception as e:
@@ -139,7 +307,22 @@ def del_product(productId):
             if isUsed:
                 return {'success': False, 'message': 'Невозможно удалить товар, который используется на складах'}
 
+            # Журнал движений и снимки ссылаются на товар - история остатков не удаляется
+            hasHistory = session.scalar(select(InventoryMovement.id).where(InventoryMovement.product_id == productId)
+                                        .limit(1)) or \
+                session.scalar(select(InventorySnapshot.id).where(InventorySnapshot.product_id == productId).limit(1))
+            if hasHistory:
+                return {'success': False, 'message': 'Невозможно удалить товар, по которому есть история движений'}
+
             session.delete(productObj)
+            try:
+                session.flush()
+            except IntegrityError:
+                # Товар попал в поставку, перемещение или на склад параллельно с проверкой
+                session.rollback()
+                return {'success': False, 'message': 'Невозможно удалить товар, который используется на складах'}
+            on_commit(session, lambda: productCache.invalidate(entityId=productId))
+            on_commit(session, lambda: invalidate_reference('products'))
 
             return {'success':True, 'message': 'Товар успешно удален'}
         except Exception as e:
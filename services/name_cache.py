@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+
+from db.db_session import get_db_session
+from db.models import Product, Warehouse
+
+"""Кэш соответствия имен и id товаров и складов"""
+
+
+class NameIdCache:
+    """Двунаправленный кэш имя <-> id с ограничением размера (вытесняются давно не используемые записи)"""
+    def __init__(self, maxSize: int):
+        self.lock = threading.Lock()
+        self.maxSize = maxSize
+        self.idByName = OrderedDict()
+        self.nameById = {}
+
+    def get_id(self, name: str):
+        with self.lock:
+            entityId = self.idByName.get(name)
+            if entityId is not None:
+                self.idByName.move_to_end(name)
+            return entityId
+
+    def get_name(self, entityId: int):
+        with self.lock:
+            name = self.nameById.get(entityId)
+            if name is not None:
+                self.idByName.move_to_end(name)
+            return name
+
+    def put(self, entityId: int, name: str):
+        with self.lock:
+            self._put(entityId, name)
+
+    def _put(self, entityId: int, name: str):
+        oldName = self.nameById.pop(entityId, None)
+        if oldName is not None:
+            self.idByName.pop(oldName, None)
+        oldId = self.idByName.pop(name, None)
+        if oldId is not None:
+            self.nameById.pop(oldId, None)
+
+        self.idByName[name] = entityId
+        self.nameById[entityId] = name
+
+        # Вытеснение самых старых записей при превышении размера
+        while len(self.idByName) > self.maxSize:
+            evictedName, evictedId = self.idByName.popitem(last=False)
+            self.nameById.pop(evictedId, None)
+
+    def replace_all(self, rows):
+        """Полная перезагрузка кэша парами (id, имя)"""
+        with self.lock:
+            self.idByName.clear()
+            self.nameById.clear()
+            for entityId, name in rows:
+                self._put(entityId, name)
+
+    def invalidate(self, name: str = None, entityId: int = None):
+        with self.lock:
+            if name is not None and entityId is None:
+                entityId = self.idByName.get(name)
+            if entityId is not None and name is None:
+                name = self.nameById.get(entityId)
+            self.idByName.pop(name, None)
+            self.nameById.pop(entityId, None)
+
+    def clear(self):
+        with self.lock:
+            self.idByName.clear()
+            self.nameById.clear()
+
+    def __len__(self):
+        return len(self.idByName)
+
+
+productCache = NameIdCache(maxSize=50000)
+warehouseCache = NameIdCache(maxSize=5000)
+
+
+def warm_name_cache():
+    """Загрузка всех товаров и складов в кэш (выполняется при входе в систему)"""
+    with get_db_session() as session:
+        products = session.execute(select(Product.id, Product.name).limit(productCache.maxSize)).all()
+        warehouses = session.execute(select(Warehouse.id, Warehouse.name).limit(warehouseCache.maxSize)).all()
+    productCache.replace_all(products)
+    warehouseCache.replace_all(warehouses)
+
+
+def resolve_product_id(session, productName: str):
+    """id товара по имени: из кэша, при промахе - из бд"""
+    productId = productCache.get_id(productName)
+    if productId is None:
+        productId = session.scalar(select(Product.id).where(Product.name == productName))
+        if productId is not None:
+            productCache.put(productId, productName)
+    return productId
+
+
+def resolve_warehouse_id(session, warehouseName: str):
+    """id склада по имени: из кэша, при промахе - из бд"""
+    warehouseId = warehouseCache.get_id(warehouseName)
+    if warehouseId is None:
+        warehouseId = session.scalar(select(Warehouse.id).where(Warehouse.name == warehouseName))
+        if warehouseId is not None:
+            warehouseCache.put(warehouseId, warehouseName)
+    return warehouseId
+
+
+def forget_names(productName: str = None, warehouseName: str = None):
+    """Сброс записей, которые могли устареть (например, товар удален с другого клиента)"""
+    if productName is not None:
+        productCache.invalidate(name=productName)
+    if warehouseName is not None:
+        warehouseCache.invalidate(name=warehouseName)
+
+
+def on_commit(session, callback):
+    """Выполнение обновления кэша только после успешной фиксации транзакции"""
+    event.listen(session, 'after_commit', lambda s: callback(), once=True)
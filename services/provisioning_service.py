@@ -0,0 +1,231 @@
+import csv
+import re
+import secrets
+import string
+from datetime import date
+
+from sqlalchemy import select, insert, tuple_, exc
+
+from db.db_session import get_db_session, run_in_transaction
+from db.models import UserAccount, Role, Employee, Post, t_employee_warehouse, Warehouse, InviteCode
+from utils.password_utils import hash_passwords
+from utils.settings import config_private
+
+"""Массовое заведение сотрудников с пригласительными кодами или готовыми учетными записями.
+
+Строки файла проверяются целиком до записи: справочники, занятые паспорта, логины и коды
+читаются из бд одним проходом. Пароли хэшируются в пуле процессов, записи вставляются
+пакетными INSERT по PROVISION_CHUNK_SIZE строк - одна транзакция на пакет.
+"""
+
+# Сотрудников в одной транзакции при массовом заведении
+PROVISION_CHUNK_SIZE = getattr(config_private, 'PROVISION_CHUNK_SIZE', 200)
+
+# Длина генерируемых пригласительных кодов (латиница и цифры, как при ручном создании)
+INVITE_CODE_LENGTH = 12
+INVITE_CODE_ALPHABET = string.ascii_letters + string.digits
+
+# Значений в одном условии IN при проверке существующих записей
+LOOKUP_CHUNK_SIZE = 500
+
+# Колонки файла сотрудников; login и password заполняются, если учетная запись создается сразу
+CSV_COLUMNS = ['last_name', 'first_name', 'passport_series', 'passport_number', 'phone_number',
+               'post', 'warehouses', 'role', 'login', 'password']
+REPORT_COLUMNS = ['row', 'success', 'message', 'employeeId', 'login', 'inviteCode']
+
+NAME_PATTERN = re.compile(r'^[A-Za-zА-Яа-яЁё]+$')
+
+
+def read_employees_csv(path: str):
+    """Строки файла сотрудников (словари по заголовку); разделитель - запятая или точка с запятой"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        header = f.readline()
+        delimiter = ';' if header.count(';') > header.count(',') else ','
+        f.seek(0)
+        for row in csv.DictReader(f, delimiter=delimiter):
+            yield {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+
+
+def write_report(path: str, report: list):
+    """Сохранение построчного отчета в csv"""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, delimiter=';')
+        writer.writeheader()
+        writer.writerows(report)
+
+
+def split_warehouses(value: str) -> list:
+    return [name.strip() for name in re.split(r'[,;|]', value) if name.strip()]
+
+
+def check_row(row: dict) -> str:
+    """Текст ошибки в полях строки без обращения к бд; None, если строка корректна"""
+    for column in ('last_name', 'first_name', 'passport_series', 'passport_number', 'phone_number',
+                   'post', 'warehouses', 'role'):
+        if not row.get(column):
+            return f'Не заполнено поле {column}'
+    if not NAME_PATTERN.match(row['last_name']) or len(row['last_name']) > 100:
+        return 'Некорректная фамилия'
+    if not NAME_PATTERN.match(row['first_name']) or len(row['first_name']) > 50:
+        return 'Некорректное имя'
+    if not (row['passport_series'].isdigit() and len(row['passport_series']) == 4):
+        return 'Серия паспорта должна состоять из 4 цифр'
+    if not (row['passport_number'].isdigit() and len(row['passport_number']) == 6):
+        return 'Номер паспорта должен состоять из 6 цифр'
+    if not row['phone_number'].lstrip('+').isdigit() or len(row['phone_number']) > 20:
+        return 'Некорректный номер телефона'
+    if row.get('login') or row.get('password'):
+        if not 4 <= len(row.get('login', '')) <= 255:
+            return 'Длина логина должна быть от 4 до 255 символов'
+        if len(row.get('password', '')) < 4:
+            return 'Пароль должен быть не короче 4 символов'
+    return None
+
+
+def select_existing(session, columns: tuple, values: list) -> set:
+    """Значения (кортежи по columns), уже существующие в бд; проверка пачками IN"""
+    existing = set()
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        stmt = select(*columns).where(tuple_(*columns).in_(values[start:start + LOOKUP_CHUNK_SIZE]))
+        existing.update(tuple(row) for row in session.execute(stmt))
+    return existing
+
+
+def generate_invite_codes(session, count: int) -> list:
+    """count уникальных пригласительных кодов: кандидаты сверяются с бд одним запросом на раунд"""
+    codes = []
+    used = set()
+    while len(codes) < count:
+        candidates = set()
+        while len(candidates) < count - len(codes):
+            code = ''.join(secrets.choice(INVITE_CODE_ALPHABET) for _ in range(INVITE_CODE_LENGTH))
+            if code not in used:
+                candidates.add(code)
+        taken = {code for code, in select_existing(session, (InviteCode.code,), [(code,) for code in candidates])}
+        used.update(candidates)
+        codes.extend(candidates - taken)
+    return codes
+
+
+def insert_chunk(session, chunk: list, today: date) -> dict:
+    """Пакетная вставка сотрудников, складов, кодов и учетных записей; возвращает id сотрудников по паспорту"""
+    session.execute(insert(Employee), [
+        {'first_name': item['row']['first_name'], 'last_name': item['row']['last_name'],
+         'passport_series': item['row']['passport_series'], 'passport_number': item['row']['passport_number'],
+         'phone_number': item['row']['phone_number'], 'post_id': item['postId'],
+         'date_of_employment': today, 'is_active': 1} for item in chunk])
+
+    # MySQL не возвращает id пакетной вставки - сотрудники находятся по уникальному паспорту
+    passports = [item['passport'] for item in chunk]
+    stmt = select(Employee.id, Employee.passport_series, Employee.passport_number)\
+        .where(tuple_(Employee.passport_series, Employee.passport_number).in_(passports))
+    employeeIds = {(series, number): employeeId for employeeId, series, number in session.execute(stmt)}
+
+    session.execute(insert(t_employee_warehouse), [
+        {'employee_id': employeeIds[item['passport']], 'warehouse_id': warehouseId}
+        for item in chunk for warehouseId in item['warehouseIds']])
+
+    # Код сотрудника с готовой учетной записью сразу считается использованным, как после регистрации
+    session.execute(insert(InviteCode), [
+        {'code': item['code'], 'employee_id': employeeIds[item['passport']], 'role_id': item['roleId'],
+         'is_active': 0 if item['passwordHash'] else 1} for item in chunk])
+
+    accounts = [{'login': item['row']['login'], 'password': item['passwordHash'],
+                 'employee_id': employeeIds[item['passport']], 'role_id': item['roleId'], 'is_active': 1}
+                for item in chunk if item['passwordHash']]
+    if accounts:
+        session.execute(insert(UserAccount), accounts)
+    return employeeIds
+
+
+def provision_users(rows, chunkSize: int = None, workers: int = None) -> dict:
+    """Заведение сотрудников из строк файла (см. CSV_COLUMNS).
+
+    Для каждой строки создаются сотрудник, привязка к складам и пригласительный код; если заданы
+    логин и пароль - сразу и учетная запись. В data - отчет по строкам в порядке файла.
+    """
+    try:
+        report = []
+        pending = []
+        valid = []
+        for number, row in enumerate(rows, start=1):
+            result = {'row': number, 'success': False, 'message': '', 'employeeId': None,
+                      'login': row.get('login') or None, 'inviteCode': None}
+            report.append(result)
+            error = check_row(row)
+            if error:
+                result['message'] = error
+                continue
+            pending.append({'row': row, 'result': result,
+                            'passport': (row['passport_series'], row['passport_number'])})
+
+        if pending:
+            with get_db_session() as session:
+                posts = dict(session.execute(select(Post.name, Post.id)).all())
+                roles = dict(session.execute(select(Role.name, Role.id)).all())
+                warehouses = dict(session.execute(select(Warehouse.name, Warehouse.id)).all())
+                takenPassports = select_existing(session, (Employee.passport_series, Employee.passport_number),
+                                                 list({item['passport'] for item in pending}))
+                takenLogins = {login for login, in select_existing(
+                    session, (UserAccount.login,),
+                    list({(item['row']['login'],) for item in pending if item['row'].get('login')}))}
+
+            # Проверка по справочникам и уникальности, включая повторы внутри файла
+            for item in pending:
+                row = item['row']
+                names = split_warehouses(row['warehouses'])
+                missing = [name for name in names if name not in warehouses]
+                if row['post'] not in posts:
+                    error = f'Должность "{row["post"]}" не найдена'
+                elif row['role'] not in roles:
+                    error = f'Роль "{row["role"]}" не найдена'
+                elif missing:
+                    error = f'Склады не найдены: {", ".join(missing)}'
+                elif item['passport'] in takenPassports:
+                    error = 'Человек с такой серией и номером паспорта уже существует'
+                elif row.get('login') and row['login'] in takenLogins:
+                    error = 'Такой логин уже существует'
+                else:
+                    error = None
+                if error:
+                    item['result']['message'] = error
+                    continue
+                takenPassports.add(item['passport'])
+                if row.get('login'):
+                    takenLogins.add(row['login'])
+                item.update(postId=posts[row['post']], roleId=roles[row['role']],
+                            warehouseIds=sorted({warehouses[name] for name in names}))
+                valid.append(item)
+
+        if valid:
+            with get_db_session() as session:
+                codes = generate_invite_codes(session, len(valid))
+            withAccount = [item for item in valid if item['row'].get('login')]
+            hashes = hash_passwords([item['row']['password'] for item in withAccount], workers=workers)
+            for item in valid:
+                item['passwordHash'] = None
+            for item, passwordHash in zip(withAccount, hashes):
+                item['passwordHash'] = passwordHash
+            for item, code in zip(valid, codes):
+                item['code'] = code
+
+        # Ошибка пакета (например, логин занят параллельно) не отменяет уже записанные пакеты
+        chunkSize = chunkSize or PROVISION_CHUNK_SIZE
+        today = date.today()
+        for start in range(0, len(valid), chunkSize):
+            chunk = valid[start:start + chunkSize]
+            try:
+                employeeIds = run_in_transaction(lambda session: insert_chunk(session, chunk, today))
+            except exc.SQLAlchemyError as e:
+                for item in chunk:
+                    item['result']['message'] = f'Пакет не записан: {e.__class__.__name__}'
+                continue
+            for item in chunk:
+                item['result'].update(success=True, employeeId=employeeIds[item['passport']],
+                                      inviteCode=item['code'],
+                                      message='Учетная запись создана' if item['passwordHash']
+                                      else 'Пригласительный код создан')
+
+        return {'success': True, 'data': report}
+    except Exception as e:
+        return {'success': False, 'message': str(e)}
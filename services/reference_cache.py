@@ -0,0 +1,128 @@
+import threading
+import time
+from functools import wraps
+from types import MappingProxyType
+
+from utils.settings import config_private
+
+"""Кэш справочных данных (роли, должности, склады, поставщики, товары)"""
+
+# Время жизни записи кэша (сек)
+REFERENCE_CACHE_TTL = getattr(config_private, 'REFERENCE_CACHE_TTL', 300)
+
+
+class ReferenceCache:
+    """Кэш с TTL и номером версии группы: сброс группы увеличивает версию и делает ее записи недействительными"""
+    def __init__(self, ttl: float):
+        self.lock = threading.Lock()
+        self.ttl = ttl
+        self.entries = {}
+        self.versions = {}
+        self.hits = {}
+        self.misses = {}
+        self.invalidations = {}
+
+    def get_or_load(self, group: str, key, loader):
+        now = time.monotonic()
+        with self.lock:
+            version = self.versions.get(group, 0)
+            entry = self.entries.get((group, key))
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self.hits[group] = self.hits.get(group, 0) + 1
+                return entry[2]
+            self.misses[group] = self.misses.get(group, 0) + 1
+
+        # Загрузка вне блокировки; версия зафиксирована до запроса, поэтому данные,
+        # прочитанные до сброса группы, не переживут следующее обращение
+        value = loader()
+        if value is not None:
+            with self.lock:
+                self.entries[(group, key)] = (version, now + self.ttl, value)
+        return value
+
+    def invalidate(self, group: str):
+        with self.lock:
+            self.versions[group] = self.versions.get(group, 0) + 1
+            self.invalidations[group] = self.invalidations.get(group, 0) + 1
+            for entryKey in [entryKey for entryKey in self.entries if entryKey[0] == group]:
+                del self.entries[entryKey]
+
+    def clear(self):
+        with self.lock:
+            for group in set(self.versions) | {entryKey[0] for entryKey in self.entries}:
+                self.versions[group] = self.versions.get(group, 0) + 1
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            groups = set(self.hits) | set(self.misses) | set(self.versions)
+            result = {}
+            for group in sorted(groups):
+                hits = self.hits.get(group, 0)
+                misses = self.misses.get(group, 0)
+                result[group] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hitRate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                    'version': self.versions.get(group, 0),
+                    'invalidations': self.invalidations.get(group, 0),
+                }
+            return result
+
+
+referenceCache = ReferenceCache(REFERENCE_CACHE_TTL)
+
+
+def cached_reference(group: str):
+    """Декоратор кэширования функции чтения справочника; неуспешные ответы сервисов не кэшируются.
+
+    Значение из кэша общее для всех вызывающих, поэтому списки отдаются кортежами, а словари - только для чтения.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, freeze(args), freeze(tuple(sorted(kwargs.items()))))
+
+            loaded = {}
+
+            def loader():
+                loaded['result'] = func(*args, **kwargs)
+                if isinstance(loaded['result'], dict) and not loaded['result'].get('success'):
+                    return None
+                return read_only(loaded['result'])
+
+            value = referenceCache.get_or_load(group, key, loader)
+            if value is None:
+                # Ошибка загрузки - возвращается исходный ответ сервиса
+                return loaded['result']
+            return value
+        return wrapper
+    return decorator
+
+
+def freeze(value):
+    """Приведение аргументов к хэшируемому виду"""
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    return value
+
+
+def read_only(value):
+    """Копия значения, которую нельзя изменить на месте (списки - в кортежи, словари - в MappingProxyType)"""
+    # Кортежи и строки результата (Row) уже неизменяемы и возвращаются как есть
+    if isinstance(value, list):
+        return tuple(read_only(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({k: read_only(v) for k, v in value.items()})
+    return value
+
+
+def invalidate_reference(group: str):
+    referenceCache.invalidate(group)
+
+
+def reference_cache_stats() -> dict:
+    """Статистика попаданий и промахов по группам справочников"""
+    return referenceCache.stats()
@@ -0,0 +1,210 @@
+import csv
+import os
+
+from openpyxl import load_workbook
+from sqlalchemy import select
+
+from db.db_session import get_db_session, run_in_transaction
+from db.models import Supplier, Warehouse, Product
+from services.inventory_service import MAX_QUANTITY
+from services.shipments_service import post_shipment
+from utils.app_state import AppState
+from utils.settings import config_private
+
+"""Импорт поставок из накладных поставщиков (csv или xlsx).
+
+Файл читается потоком (openpyxl в режиме read_only), названия товаров, складов и поставщиков
+сопоставляются с id по словарям, загруженным один раз. Поставки проводятся через post_shipment
+пакетами по IMPORT_CHUNK_SIZE строк - одна транзакция на пакет; ошибочные строки и пакеты
+попадают в отчет, не прерывая импорт остального файла.
+"""
+
+# Строк файла в одной транзакции импорта
+IMPORT_CHUNK_SIZE = getattr(config_private, 'SHIPMENT_IMPORT_CHUNK_SIZE', 1000)
+
+# Допустимые заголовки колонок файла
+COLUMN_ALIASES = {
+    'product': ('product', 'товар', 'наименование'),
+    'quantity': ('quantity', 'количество', 'кол-во'),
+    'warehouse': ('warehouse', 'склад'),
+    'supplier': ('supplier', 'поставщик'),
+    'document': ('document', 'документ', 'накладная'),
+}
+REPORT_COLUMNS = ['row', 'message']
+
+
+def iter_table_rows(path: str):
+    """Строки csv/xlsx файла списками значений; xlsx читается без загрузки книги в память"""
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xlsm'):
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+        return
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        header = f.readline()
+        delimiter = ';' if header.count(';') > header.count(',') else ','
+        f.seek(0)
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def column_positions(header) -> dict:
+    """Номера колонок по заголовку файла"""
+    names = [str(value or '').strip().lower() for value in header]
+    positions = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                positions[column] = index
+                break
+    return positions
+
+
+def parse_quantity(value):
+    """Количество из ячейки: целое число от 1 до MAX_QUANTITY, иначе None"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, str):
+        value = value.strip().replace(' ', '')
+        value = int(value) if value.isdigit() else None
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 < value <= MAX_QUANTITY:
+        return None
+    return value
+
+
+def load_names() -> tuple:
+    """Словари название -> id товаров, складов и поставщиков"""
+    with get_db_session() as session:
+        products = dict(session.execute(select(Product.name, Product.id)).all())
+        warehouses = dict(session.execute(select(Warehouse.name, Warehouse.id)).all())
+        suppliers = dict(session.execute(select(Supplier.name, Supplier.id)).all())
+    return products, warehouses, suppliers
+
+
+def iter_shipment_rows(rows, positions: dict, names: tuple, supplierId=None, warehouseId=None, errors=None):
+    """Проверенные строки файла: (номер строки, ключ поставки, id товара, количество).
+
+    Ключ поставки - (документ, id поставщика, id склада); строки с ошибками попадают в errors.
+    """
+    products, warehouses, suppliers = names
+    allowedWarehouses = set(AppState.currentUser.warehouses) if AppState.currentUser else None
+
+    def cell(row, column):
+        index = positions.get(column)
+        if index is None or index >= len(row) or row[index] is None:
+            return ''
+        return str(row[index]).strip()
+
+    for number, row in rows:
+        if not any(value not in (None, '') for value in row):
+            continue
+        productName = cell(row, 'product')
+        warehouseName = cell(row, 'warehouse')
+        supplierName = cell(row, 'supplier')
+        rowWarehouseId = warehouses.get(warehouseName) if warehouseName else warehouseId
+        rowSupplierId = suppliers.get(supplierName) if supplierName else supplierId
+        quantity = parse_quantity(row[positions['quantity']] if positions['quantity'] < len(row) else None)
+
+        if productName not in products:
+            error = f'Товар "{productName}" не найден' if productName else 'Не указан товар'
+        elif quantity is None:
+            error = 'Количество должно быть целым числом больше нуля'
+        elif rowWarehouseId is None:
+            error = f'Склад "{warehouseName}" не найден' if warehouseName else 'Не указан склад'
+        elif allowedWarehouses is not None and rowWarehouseId not in allowedWarehouses:
+            error = f'Нет доступа к складу "{warehouseName}"'
+        elif rowSupplierId is None:
+            error = f'Поставщик "{supplierName}" не найден' if supplierName else 'Не указан поставщик'
+        else:
+            error = None
+        if error:
+            if errors is not None:
+                errors.append({'row': number, 'message': error})
+            continue
+        yield number, (cell(row, 'document'), rowSupplierId, rowWarehouseId), products[productName], quantity
+
+
+def post_chunk(chunk: list, errors: list) -> tuple:
+    """Проведение пакета поставок в одной транзакции; возвращает число проведенных поставок и строк"""
+    def work(session):
+        rejected = []
+        for shipment in chunk:
+            _, supplierId, warehouseId = shipment['key']
+            result = post_shipment(session, supplierId, warehouseId, shipment['lines'])
+            # Отклоненная поставка ничего не записывает - остальные поставки пакета проводятся
+            if not result['success']:
+                rows = shipment['rows']
+                rejected.append({'row': rows[0], 'message': f'Строки {rows[0]}-{rows[-1]} не импортированы: {result["data"]}'})
+        return rejected
+
+    try:
+        rejected = run_in_transaction(work)
+    except Exception as e:
+        errors.append({'row': chunk[0]['rows'][0], 'message': f'Строки {chunk[0]["rows"][0]}-{chunk[-1]["rows"][-1]} '
+                                                             f'не импортированы: {e}'})
+        return 0, 0
+    errors.extend(rejected)
+    rejectedRows = {error['row'] for error in rejected}
+    postedShipments = [shipment for shipment in chunk if shipment['rows'][0] not in rejectedRows]
+    return len(postedShipments), sum(len(shipment['rows']) for shipment in postedShipments)
+
+
+def import_shipments(rows, supplierId: int = None, warehouseId: int = None, chunkSize: int = None) -> dict:
+    """Импорт поставок из строк таблицы (первая строка - заголовок).
+
+    Подряд идущие строки с одинаковыми документом, поставщиком и складом образуют одну поставку;
+    поставка длиннее пакета делится на части. supplierId/warehouseId используются для строк без этих колонок.
+    В data - количество проведенных поставок и строк и отчет об ошибках по строкам файла.
+    """
+    try:
+        rows = iter(enumerate(rows, start=1))
+        _, header = next(rows, (0, None))
+        positions = column_positions(header or [])
+        if 'product' not in positions or 'quantity' not in positions:
+            return {'success': False, 'data': 'В файле нет колонок "Товар" и "Количество"'}
+
+        chunkSize = chunkSize or IMPORT_CHUNK_SIZE
+        errors = []
+        shipmentsCount = linesCount = 0
+        chunk = []
+        chunkLines = 0
+        current = None
+
+        for number, key, productId, quantity in iter_shipment_rows(rows, positions, load_names(),
+                                                                   supplierId, warehouseId, errors):
+            if current is None or current['key'] != key:
+                current = {'key': key, 'lines': [], 'rows': []}
+                chunk.append(current)
+            current['lines'].append((productId, quantity))
+            current['rows'].append(number)
+            chunkLines += 1
+            if chunkLines >= chunkSize:
+                posted = post_chunk(chunk, errors)
+                shipmentsCount += posted[0]
+                linesCount += posted[1]
+                chunk = []
+                chunkLines = 0
+                current = None
+        if chunk:
+            posted = post_chunk(chunk, errors)
+            shipmentsCount += posted[0]
+            linesCount += posted[1]
+
+        errors.sort(key=lambda error: error['row'])
+        return {'success': True, 'data': {'shipments': shipmentsCount, 'lines': linesCount, 'errors': errors}}
+    except Exception as e:
+        return {'success': False, 'data': str(e)}
+
+
+def import_shipment_file(path: str, supplierId: int = None, warehouseId: int = None, chunkSize: int = None) -> dict:
+    """Импорт поставок из csv/xlsx файла"""
+    return import_shipments(iter_table_rows(path), supplierId, warehouseId, chunkSize)
+
+
+def write_error_report(path: str, errors: list):
+    """Сохранение отчета об ошибках импорта в csv"""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, delimiter=';')
+        writer.writeheader()
+        writer.writerows(errors)
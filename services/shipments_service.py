@@ -1,24 +1,37 @@
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import select, func, update, or_
+from sqlalchemy import select, func, or_, insert
 
-from db.db_session import get_db_session
+from db.db_session import get_db_session, run_in_transaction, stream_rows
 from db.models import Supplier, Shipment, Employee, Warehouse, ShipmentLine, Product, Inventory, UserAccount
+from services.inventory_service import MAX_QUANTITY, MOVEMENT_SHIPMENT, upsert_inventory, record_movements
+from services.name_cache import on_commit
+from services.reference_cache import cached_reference, invalidate_reference
 from utils.app_state import AppState
 
 
-def get_shipments_data(warehouses=None):
+def shipments_query(warehouses=None):
+    """Выборка истории поставок от новых к старым"""
+    stmt = select(Shipment.id, Supplier.name, func.concat(Employee.last_name, ' ' , Employee.first_name),
+                  Warehouse.name, Shipment.date)\
+        .join(Supplier, Supplier.id == Shipment.supplier_id)\
+        .join(Employee, Employee.id == Shipment.employee_id)\
+        .join(Warehouse, Warehouse.id == Shipment.warehouse_id)\
+        .order_by(Shipment.id.desc())
+    if warehouses:
+        stmt = stmt.where(Shipment.warehouse_id.in_(warehouses))
+    return stmt
+
+def get_shipments_data(warehouses=None, lastId=None, limit=None):
+    """История поставок от новых к старым; lastId/limit - постраничная выборка по ключу (id < lastId)"""
     with get_db_session() as session:
         try:
-            stmt = select(Shipment.id, Supplier.name, func.concat(Employee.last_name, ' ' , Employee.first_name),
-                          Warehouse.name, Shipment.date)\
-                .join(Supplier, Supplier.id == Shipment.supplier_id)\
-                .join(Employee, Employee.id == Shipment.employee_id)\
-                .join(Warehouse, Warehouse.id == Shipment.warehouse_id)\
-                .order_by(Shipment.id.desc())
-            if warehouses:
-                stmt = stmt.where(Shipment.warehouse_id.in_(warehouses))
+            stmt = shipments_query(warehouses)
+            if lastId is not None:
+                stmt = stmt.where(Shipment.id < lastId)
+            if limit:
+                stmt = stmt.limit(limit)
             shipments = session.execute(stmt).all()
             return {
                 'success': True,
@@ -30,7 +43,24 @@ def get_shipments_data(warehouses=None):
                 'data': str(e)
             }
 
+def iter_shipments(warehouses=None, batchSize=None):
+    """Вся история поставок потоком (для отчетов); ошибки бд передаются вызывающему"""
+    return stream_rows(shipments_query(warehouses), batchSize)
 
+def iter_shipment_lines(warehouses=None, batchSize=None):
+    """Строки всех поставок потоком: id поставки, дата, склад, поставщик, товар, количество"""
+    stmt = select(Shipment.id, Shipment.date, Warehouse.name, Supplier.name, Product.name, ShipmentLine.quantity)\
+        .join(Shipment, Shipment.id == ShipmentLine.shipment_id)\
+        .join(Supplier, Supplier.id == Shipment.supplier_id)\
+        .join(Warehouse, Warehouse.id == Shipment.warehouse_id)\
+        .join(Product, Product.id == ShipmentLine.product_id)\
+        .order_by(Shipment.id.desc(), ShipmentLine.product_id)
+    if warehouses:
+        stmt = stmt.where(Shipment.warehouse_id.in_(warehouses))
+    return stream_rows(stmt, batchSize)
+
+
+@cached_reference('suppliers')
 def get_suppliers_name():
     with get_db_session() as session:
         try:
@@ -112,45 +142,58 @@ def get_available_products(warehouseId):
             }
 
 def add_new_shipment(supplierId:int, warehouseId:int, productsList:List):
-    with get_db_session() as session:
-        try:
-            # Проверки
-            for productId, quantity in productsList:
-                stmt = select(Inventory.quantity).where(Inventory.product_id == productId,
-                                                        Inventory.warehouse_id == warehouseId)
-                currentQuantity = session.scalar(stmt)
-                if currentQuantity + quantity > 2000000000:
-                    return {
-                        'success': False,
-                        'data': 'Получившееся значение количества после добавления слишком большое'
-                    }
-
-
-            # Создание записи о поставке
-            shipment = Shipment(supplier_id=supplierId,
-                                employee_id=(select(UserAccount.employee_id).\
-                                             where(UserAccount.login == AppState.currentUser.login)).scalar_subquery(),
-                                warehouse_id=warehouseId,
-                                date=datetime.now())
-
-            session.add(shipment)
-
-            for productId, quantity in productsList:
-                stmt = update(Inventory).where(Inventory.product_id == productId,
-                                               Inventory.warehouse_id == warehouseId)\
-                    .values(quantity=Inventory.quantity + quantity).values(updated_at=datetime.now())
-                session.execute(stmt)
-                shipmentLine = ShipmentLine(shipment_id= shipment.id,product_id=productId,quantity=quantity)
-                session.add(shipmentLine)
-            return {
-                'success': True,
-                'data': 'Поставка успешно создана'
-            }
-        except Exception as e:
+    try:
+        return run_in_transaction(lambda session: post_shipment(session, supplierId, warehouseId, productsList))
+    except Exception as e:
+        return {
+            'success': False,
+            'data': str(e)
+        }
+
+def post_shipment(session, supplierId:int, warehouseId:int, productsList:List):
+    """Проведение поставки в рамках переданной сессии"""
+    # Суммарное количество по каждому товару поставки
+    quantities = {}
+    for productId, quantity in productsList:
+        quantities[productId] = quantities.get(productId, 0) + quantity
+
+    # Проверки: текущие остатки всех товаров поставки одним запросом (строки блокируются до конца транзакции).
+    # Товара, которого еще нет на складе, в выборке нет - его остаток считается нулевым
+    stmt = select(Inventory.product_id, Inventory.quantity).where(Inventory.warehouse_id == warehouseId,
+                                                                  Inventory.product_id.in_(quantities))\
+        .order_by(Inventory.product_id).with_for_update()
+    currentQuantities = dict(session.execute(stmt).all())
+    for productId, quantity in quantities.items():
+        if currentQuantities.get(productId, 0) + quantity > MAX_QUANTITY:
             return {
                 'success': False,
-                'data': str(e)
-            }
+                'data': 'Получившееся значение количества после добавления слишком большое'
+            }
+
+    # Создание записи о поставке (flush для получения id)
+    shipment = Shipment(supplier_id=supplierId,
+                        employee_id=(select(UserAccount.employee_id).\
+                                     where(UserAccount.login == AppState.currentUser.login)).scalar_subquery(),
+                        warehouse_id=warehouseId,
+                        date=datetime.now())
+
+    session.add(shipment)
+    session.flush()
+
+    # Зачисление остатков одним UPSERT: первая поставка товара на склад создает запись хранилища
+    upsert_inventory(session, warehouseId, quantities)
+    record_movements(session, MOVEMENT_SHIPMENT,
+                     [(warehouseId, productId, quantity) for productId, quantity in quantities.items()], shipment.id)
+
+    # Строки поставки одной пакетной вставкой
+    session.execute(insert(ShipmentLine), [
+        {'shipment_id': shipment.id, 'product_id': productId, 'quantity': quantity}
+        for productId, quantity in quantities.items()
+    ])
+    return {
+        'success': True,
+        'data': 'Поставка успешно создана'
+    }
 
 def add_new_supplier(supplierName, supplierPhone, supplierEmail):
     with get_db_session() as session:
@@ -171,6 +214,7 @@ def add_new_supplier(supplierName, supplierPhone, supplierEmail):
 
             supplier = Supplier(name=supplierName, phone_number=supplierPhone,email=supplierEmail)
             session.add(supplier)
+            on_commit(session, lambda: invalidate_reference('suppliers'))
             return {
                 'success': True,
                 'data': 'Поставщик успешно добавлен'
@@ -1,28 +1,40 @@
 from datetime import datetime
 
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func, or_, update, case, insert
 from sqlalchemy.orm import aliased
 
-from db.db_session import get_db_session
+from db.db_session import get_db_session, run_in_transaction, stream_rows
 from db.models import Transfer, Employee, Warehouse, TransferLine, Product, Inventory, UserAccount
+from services.inventory_service import MAX_QUANTITY, MOVEMENT_TRANSFER_OUT, MOVEMENT_TRANSFER_IN, record_movements
+from services.name_cache import warehouseCache, productCache, on_commit
+from services.reference_cache import invalidate_reference
 from utils.app_state import AppState
 
 
-def get_transfers_data(warehouses=None):
+def transfers_query(warehouses=None):
+    """Выборка истории перемещений от новых к старым"""
+    fromWarehouse = aliased(Warehouse)
+    toWarehouse = aliased(Warehouse)
+
+    stmt = select(Transfer.id, fromWarehouse.name, toWarehouse.name,
+                  func.concat(Employee.last_name, ' ' , Employee.first_name), Transfer.date)\
+    .join(toWarehouse, toWarehouse.id == Transfer.to_warehouse_id) \
+    .join(fromWarehouse, fromWarehouse.id == Transfer.from_warehouse_id) \
+    .join(Employee, Employee.id == Transfer.employee_id)\
+    .order_by(Transfer.id.desc())
+    if warehouses:
+        stmt = stmt.where(or_(Transfer.from_warehouse_id.in_(warehouses), Transfer.to_warehouse_id.in_(warehouses)))
+    return stmt
+
+def get_transfers_data(warehouses=None, lastId=None, limit=None):
+    """История перемещений от новых к старым; lastId/limit - постраничная выборка по ключу (id < lastId)"""
     with get_db_session() as session:
         try:
-
-            fromWarehouse = aliased(Warehouse)
-            toWarehouse = aliased(Warehouse)
-
-            stmt = select(Transfer.id, fromWarehouse.name, toWarehouse.name,
-                          func.concat(Employee.last_name, ' ' , Employee.first_name), Transfer.date)\
-            .join(toWarehouse, toWarehouse.id == Transfer.to_warehouse_id) \
-            .join(fromWarehouse, fromWarehouse.id == Transfer.from_warehouse_id) \
-            .join(Employee, Employee.id == Transfer.employee_id)\
-            .order_by(Transfer.id.desc())
-            if warehouses:
-                stmt = stmt.where(or_(Transfer.from_warehouse_id.in_(warehouses), Transfer.to_warehouse_id.in_(warehouses)))
+            stmt = transfers_query(warehouses)
+            if lastId is not None:
+                stmt = stmt.where(Transfer.id < lastId)
+            if limit:
+                stmt = stmt.limit(limit)
             transfers = session.execute(stmt).all()
             return {
                 'success': True,
@@ -34,6 +46,10 @@ def get_transfers_data(warehouses=None):
                 'data': str(e)
             }
 
+def iter_transfers(warehouses=None, batchSize=None):
+    """Вся история перемещений потоком (для отчетов); ошибки бд передаются вызывающему"""
+    return stream_rows(transfers_query(warehouses), batchSize)
+
 def get_warehouses_data():
     with get_db_session() as session:
         try:
@@ -49,16 +65,19 @@ def get_warehouses_data():
                 'data': str(e)
             }
 
-def get_transfer_details(transferId):
+def get_transfer_products(fromWarehouseId, toWarehouseId):
+    """Товары, которые есть на обоих складах перемещения"""
     with get_db_session() as session:
         try:
-            stmt = select(Product.name, TransferLine.quantity)\
-            .join(Product, Product.id == TransferLine.product_id).where(TransferLine.transfer_id == transferId)
-            transferDetails = session.execute(stmt).all()
-
+            stmt = select(Product.id, Product.name)\
+                .join(Inventory, Inventory.product_id == Product.id)\
+                .where(Inventory.warehouse_id.in_([fromWarehouseId, toWarehouseId]))\
+                .group_by(Product.id, Product.name)\
+                .having(func.count(func.distinct(Inventory.warehouse_id)) == 2)
+            products = session.execute(stmt).all()
             return {
                 'success': True,
-                'data': transferDetails
+                'data': products
             }
         except Exception as e:
             return {
@@ -66,46 +85,16 @@ def get_transfer_details(transferId):
                 'data': str(e)
             }
 
-def add_new_transfer(fromWarehouseId, toWarehouseId, productsList):
+def get_transfer_details(transferId):
     with get_db_session() as session:
         try:
-            transfer = Transfer(from_warehouse_id=fromWarehouseId,
-                                to_warehouse_id=toWarehouseId,
-                                employee_id=(select(UserAccount.employee_id).where(
-                                    UserAccount.login == AppState.currentUser.login)).scalar_subquery(),
-                                date=datetime.now())
-            session.add(transfer)
-
-            for productId, quantity in productsList:
-                stmt = select(Inventory).where(
-                    Inventory.product_id == productId,
-                    Inventory.warehouse_id == fromWarehouseId)
-                fromWarehouseInvenory = session.execute(stmt).scalar_one_or_none()
-                if fromWarehouseInvenory.quantity - quantity < 0:
-                    return {
-                        'success': False,
-                        'data': 'Вы пытаетесь взять со склада больше товара, чем фактически имеется'
-                    }
-                fromWarehouseInvenory.quantity -= quantity
-
-                stmt = select(Inventory).where(
-                    Inventory.product_id == productId,
-                    Inventory.warehouse_id == toWarehouseId)
-                toWarehouseInventory = session.execute(stmt).scalar_one_or_none()
-                if toWarehouseInventory.quantity + quantity > 2000000000:
-                    return {
-                        'success': False,
-                        'data': 'Получившееся значение количества товара после изменения на конечном складе слишком большое'
-                    }
-                toWarehouseInventory.quantity += quantity
-
-                transferLine = TransferLine(transfer_id=transfer.id,
-                                            product_id=productId,
-                                            quantity=quantity)
-                session.add(transferLine)
+            stmt = select(Product.name, TransferLine.quantity)\
+            .join(Product, Product.id == TransferLine.product_id).where(TransferLine.transfer_id == transferId)
+            transferDetails = session.execute(stmt).all()
+
             return {
                 'success': True,
-                'data': 'Транспортировка успешно оформлена'
+                'data': transferDetails
             }
         except Exception as e:
             return {
@@ -113,6 +102,94 @@ def add_new_transfer(fromWarehouseId, toWarehouseId, productsList):
                 'data': str(e)
             }
 
+def add_new_transfer(fromWarehouseId, toWarehouseId, productsList):
+    try:
+        return run_in_transaction(lambda session: post_transfer(session, fromWarehouseId, toWarehouseId, productsList))
+    except Exception as e:
+        return {
+            'success': False,
+            'data': str(e)
+        }
+
+def post_transfer(session, fromWarehouseId, toWarehouseId, productsList):
+    """Проведение перемещения в рамках переданной сессии"""
+    # Единый UPDATE списания и зачисления применим только к двум разным складам
+    if fromWarehouseId == toWarehouseId:
+        return {
+            'success': False,
+            'data': 'Склад-отправитель и склад-получатель должны различаться'
+        }
+
+    # Суммарное количество по каждому товару перемещения
+    quantities = {}
+    for productId, quantity in productsList:
+        quantities[productId] = quantities.get(productId, 0) + quantity
+
+    # Остатки обоих складов одним запросом; строки блокируются в порядке (warehouse_id, product_id),
+    # одинаковом для всех транзакций, что исключает взаимные блокировки
+    stmt = select(Inventory.warehouse_id, Inventory.product_id, Inventory.quantity)\
+        .where(Inventory.warehouse_id.in_([fromWarehouseId, toWarehouseId]),
+               Inventory.product_id.in_(quantities))\
+        .order_by(Inventory.warehouse_id, Inventory.product_id)\
+        .with_for_update()
+    stock = {(warehouseId, productId): quantity
+             for warehouseId, productId, quantity in session.execute(stmt).all()}
+
+    # Проверка всех строк с накоплением ошибок
+    errors = []
+    for productId, quantity in quantities.items():
+        productName = productCache.get_name(productId) or f'Товар с id {productId}'
+        fromQuantity = stock.get((fromWarehouseId, productId))
+        toQuantity = stock.get((toWarehouseId, productId))
+        if fromQuantity is None:
+            errors.append(f'{productName}: товар отсутствует на складе-отправителе')
+        elif fromQuantity - quantity < 0:
+            errors.append(f'{productName}: вы пытаетесь взять со склада больше товара, '
+                          f'чем фактически имеется ({fromQuantity})')
+        if toQuantity is None:
+            errors.append(f'{productName}: товар отсутствует на складе-получателе')
+        elif toQuantity + quantity > MAX_QUANTITY:
+            errors.append(f'{productName}: получившееся значение количества товара '
+                          f'на конечном складе слишком большое')
+    if errors:
+        return {
+            'success': False,
+            'data': 'Транспортировка не оформлена:\n' + '\n'.join(errors)
+        }
+
+    # Создание записи о перемещении (flush для получения id)
+    transfer = Transfer(from_warehouse_id=fromWarehouseId,
+                        to_warehouse_id=toWarehouseId,
+                        employee_id=(select(UserAccount.employee_id).where(
+                            UserAccount.login == AppState.currentUser.login)).scalar_subquery(),
+                        date=datetime.now())
+    session.add(transfer)
+    session.flush()
+
+    # Списание и зачисление одним запросом
+    delta = case(quantities, value=Inventory.product_id)
+    stmt = update(Inventory).where(Inventory.warehouse_id.in_([fromWarehouseId, toWarehouseId]),
+                                   Inventory.product_id.in_(quantities))\
+        .values(quantity=Inventory.quantity + case((Inventory.warehouse_id == fromWarehouseId, -delta),
+                                                   else_=delta),
+                updated_at=datetime.now())\
+        .execution_options(synchronize_session=False)
+    session.execute(stmt)
+    record_movements(session, MOVEMENT_TRANSFER_OUT,
+                     [(fromWarehouseId, productId, -quantity) for productId, quantity in quantities.items()], transfer.id)
+    record_movements(session, MOVEMENT_TRANSFER_IN,
+                     [(toWarehouseId, productId, quantity) for productId, quantity in quantities.items()], transfer.id)
+
+    # Строки перемещения одной пакетной вставкой
+    session.execute(insert(TransferLine), [
+        {'transfer_id': transfer.id, 'product_id': productId, 'quantity': quantity}
+        for productId, quantity in quantities.items()
+    ])
+    return {
+        'success': True,
+        'data': 'Транспортировка успешно оформлена'
+    }
+
 def add_new_warehouse(warehouseName, warehouseAddress, warehouseArea):
     with get_db_session() as session:
         try:
@@ -132,6 +209,12 @@ def add_new_warehouse(warehouseName, warehouseAddress, warehouseArea):
                                      address=warehouseAddress,
                                      floor_space=warehouseArea)
             session.add(newWarehouse)
+            session.flush()
+
+            # Новый склад попадает в кэш имен только после фиксации транзакции
+            newWarehouseId = newWarehouse.id
+            on_commit(session, lambda: warehouseCache.put(newWarehouseId, warehouseName))
+            on_commit(session, lambda: invalidate_reference('warehouses'))
             return {
                 'success': True,
                 'data': 'Новый склад успешно добавлен'
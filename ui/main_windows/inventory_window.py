@@ -1,19 +1,22 @@
-from PyQt6.QtCore import QSize, Qt, QRegularExpression, QSortFilterProxyModel
+from PyQt6.QtCore import QSize, Qt, QRegularExpression, QTimer
 from PyQt6.QtGui import QColor, QRegularExpressionValidator
 from PyQt6.QtWidgets import QLabel, QWidget, QWIDGETSIZE_MAX, QVBoxLayout, QStackedLayout, QHBoxLayout, QTableView, \
     QFrame, QGraphicsDropShadowEffect, QScrollArea, QComboBox, QPushButton, QLineEdit, QMessageBox, QHeaderView
 
 from services.inventory_service import get_inventory, add_count, substract_count, get_all_products, \
-    add_new_product_to_warehouse, del_product_from_warehouse, get_all_product_and_ids, add_product, del_product
+    add_new_product_to_warehouse, del_product_from_warehouse, get_all_product_and_ids, add_product, del_product, \
+    search_inventory, get_inventory_warehouse_names, SERVER_FILTER_THRESHOLD
 from services.shipments_service import get_users_warehouses
 from ui.base_window import BaseWindow
+from ui.ui_elements.filter_proxy_model import IndexedFilterProxyModel, CONTAINS, EQUALS, FILTER_DEBOUNCE_MS
 from ui.ui_elements.nav_panel import NavPanel
 from ui.ui_elements.table_model import TableModel
 from utils.app_state import AppState
 from utils.export_to_excel import exportToExcel
+from utils.task_runner import ServiceRunner
 
 
-class MultiFilterProxyModelInventory(QSortFilterProxyModel):
+class MultiFilterProxyModelInventory(IndexedFilterProxyModel):
     """Класс прокси модели для реализации фильтрации в таблице хранилища"""
     def __init__(self):
         super().__init__()
@@ -21,23 +24,15 @@ class MultiFilterProxyModelInventory(QSortFilterProxyModel):
         self.productNameFilter = ''
         self.warehouseFilter = None
 
-    def filterAcceptsRow(self, sourceRow, sourceParent):
-        model = self.sourceModel()
-
+    def filter_criteria(self):
+        criteria = {}
         # Текстовый фильтр
-        productName = model.data(model.index(sourceRow, 0), Qt.ItemDataRole.DisplayRole).lower()
-
-        if self.productNameFilter and self.productNameFilter.lower() not in productName:
-            return False
-
+        if self.productNameFilter:
+            criteria[0] = (CONTAINS, self.productNameFilter)
         # Фильтр по складу
-        warehouse = model.data(model.index(sourceRow, 1), Qt.ItemDataRole.DisplayRole).lower()
-
         if self.warehouseFilter and self.warehouseFilter != "Все склады":
-            if warehouse.lower() != self.warehouseFilter.lower():
-                return False
-
-        return True
+            criteria[1] = (EQUALS, self.warehouseFilter)
+        return criteria
 
 class InventoryWindow(BaseWindow):
 
@@ -50,6 +45,14 @@ class InventoryWindow(BaseWindow):
     def __init__(self, user):
         super().__init__()
         self.user = user
+        # Запросы к бд выполняются вне GUI-потока
+        self.serviceRunner = ServiceRunner(self)
+        # Фильтрация в бд (включается, если записей хранилища больше порога)
+        self.serverSideFilter = False
+        self.serverFilterTimer = QTimer(self)
+        self.serverFilterTimer.setSingleShot(True)
+        self.serverFilterTimer.setInterval(FILTER_DEBOUNCE_MS)
+        self.serverFilterTimer.timeout.connect(self.update_inventory_table)
         # Инициализация пользовательского интерфейса
         self.init_ui()
 
@@ -101,15 +104,14 @@ class InventoryWindow(BaseWindow):
         self.inventoryCard.setGraphicsEffect(cardEffect)
 
         # Заголовок управления количеством товаров
-        inventoryLayoutLabel = QLabel('Хранящиеся товары')
-        inventoryLayoutLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        inventoryLayout.addWidget(inventoryLayoutLabel, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.inventoryLayoutLabel = QLabel('Хранящиеся товары')
+        self.inventoryLayoutLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        inventoryLayout.addWidget(self.inventoryLayoutLabel, alignment=Qt.AlignmentFlag.AlignCenter)
         inventoryLayout.addSpacing(10)
 
         # Модель для таблицы хранящихся товаров
         inventoryHeaders = ['Название', 'Склад', 'Кол-во', 'Изменено']
-        inventoryData = get_inventory(AppState.currentUser.warehouses)
-        inventoryModel = TableModel(inventoryData, inventoryHeaders)
+        inventoryModel = TableModel([], inventoryHeaders, keyColumns=(0, 1))
 
         # Модель для фильтрации
         self.inventoryFilterModel = MultiFilterProxyModelInventory()
@@ -137,7 +139,7 @@ class InventoryWindow(BaseWindow):
         # Поиск по названию
         self.productNameFilter = QLineEdit()
         self.productNameFilter.setFixedSize(620, 30)
-        self.productNameFilter.textChanged.connect(self.update_inventory_filters)
+        self.productNameFilter.textChanged.connect(lambda: self.update_inventory_filters(delayed=True))
         self.productNameFilter.setPlaceholderText("Название товара")
         inventoryFilterLayout.addWidget(self.productNameFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
@@ -145,15 +147,16 @@ class InventoryWindow(BaseWindow):
         self.warehouseFilter = QComboBox()
         self.warehouseFilter.setFixedSize(620, 30)
 
-        self.warehouseFilter.currentTextChanged.connect(self.update_inventory_filters)
+        self.warehouseFilter.currentTextChanged.connect(lambda: self.update_inventory_filters())
         inventoryFilterLayout.addWidget(self.warehouseFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
         inventoryLayout.addLayout(inventoryFilterLayout)
 
         generateReport = QPushButton("Сгенерировать отчет")
-        generateReport.clicked.connect(lambda: exportToExcel(inventoryModel))
+        generateReport.clicked.connect(lambda: exportToExcel(inventoryModel, self))
         generateReport.setFixedSize(620, 30)
         inventoryLayout.addWidget(generateReport, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.serviceRunner.bind_busy('inventory', inventoryTable, generateReport)
 
         inventoryLayout.addSpacing(10)
 
@@ -228,6 +231,7 @@ class InventoryWindow(BaseWindow):
 
         manipulateProductBtnLayout.addStretch()
         manipulateProductLayout.addLayout(manipulateProductBtnLayout)
+        self.serviceRunner.bind_busy('quantity', addProductBtn, subtractProductBtn)
 
         manipulateProductLayout.addStretch()
         inventoryLayout.addLayout(manipulateProductLayout)
@@ -290,6 +294,7 @@ class InventoryWindow(BaseWindow):
             deleteProductFromWarehouseBtn.setFixedWidth(170)
             delAddProductWarehouseBtns.addWidget(deleteProductFromWarehouseBtn, alignment=Qt.AlignmentFlag.AlignCenter)
             delAddProductWarehouseBtns.addStretch()
+            self.serviceRunner.bind_busy('warehouseProduct', addNewProductToWarehouseBtn, deleteProductFromWarehouseBtn)
 
             newProductToWarehouseLayout.addLayout(delAddProductWarehouseBtns)
 
@@ -323,8 +328,8 @@ class InventoryWindow(BaseWindow):
 
             # Модель для таблицы товаров
             productsHeaders = ['Id','Название']
-            productsData = get_all_product_and_ids()['data']
-            self.productsModel = TableModel(productsData, productsHeaders)
+            self.productsModel = TableModel([], productsHeaders)
+            self.update_product_table()
 
             # Таблица для общего списка товаров
             productsTable = QTableView()
@@ -401,6 +406,7 @@ class InventoryWindow(BaseWindow):
             delProductFromSystemBtn.setFixedWidth(180)
             delProductFromSystemBtn.clicked.connect(self.del_product_from_database)
             delProductFromSystemLayout.addWidget(delProductFromSystemBtn, alignment=Qt.AlignmentFlag.AlignCenter)
+            self.serviceRunner.bind_busy('product', addProductToSystemBtn, delProductFromSystemBtn)
 
             actionWithProductsLayout.addLayout(delProductFromSystemLayout)
 
@@ -418,16 +424,30 @@ class InventoryWindow(BaseWindow):
 
         self.setLayout(mainLayout)
 
-    def update_inventory_filters(self):
+        self.update_inventory_table()
+
+    def update_inventory_filters(self, delayed=False):
+        """Применение фильтров таблицы хранилища; ввод текста применяется после паузы"""
         self.inventoryFilterModel.productNameFilter = self.productNameFilter.text()
         self.inventoryFilterModel.warehouseFilter = self.warehouseFilter.currentText()
-        self.inventoryFilterModel.invalidateFilter()
+        if delayed:
+            self.inventoryFilterModel.schedule_filters()
+            if self.serverSideFilter:
+                self.serverFilterTimer.start()
+            return None
+        self.inventoryFilterModel.apply_filters()
+        if self.serverSideFilter:
+            self.update_inventory_table()
+        return None
 
     def load_selectable_warehouses(self):
-        """Загрузка доступных пользователю складов для добавления товара на склад"""
+        """Фоновая загрузка доступных пользователю складов для добавления товара на склад"""
+        self.serviceRunner.run('selectableWarehouses', get_users_warehouses,
+                               onResult=self.set_selectable_warehouses, onError=self.show_error)
+
+    def set_selectable_warehouses(self, warehouses):
         self.toWarehouseSelection.clear()
         self.toWarehouseSelection.addItem('Выберите склад')
-        warehouses = get_users_warehouses()
         if warehouses['success']:
             for warehouseId, warehouseName in warehouses['data']:
                 self.toWarehouseSelection.addItem(warehouseName, warehouseId)
@@ -436,11 +456,11 @@ class InventoryWindow(BaseWindow):
         return None
 
     def load_warehouses_for_quantity_manupulation(self):
-        warehouseList = []
-        for warehouse in get_inventory(AppState.currentUser.warehouses):
-            warehouseList.append(warehouse[1])
-        warehouseList = list(set(warehouseList))
+        """Фоновая загрузка складов с товарами для управления количеством и фильтра таблицы"""
+        self.serviceRunner.run('warehouseNames', get_inventory_warehouse_names, AppState.currentUser.warehouses,
+                               onResult=self.set_warehouse_names, onError=self.show_error)
 
+    def set_warehouse_names(self, warehouseList):
         self.warehouseSelection.clear()
         self.warehouseSelection.addItem('Выберите склад')
         self.warehouseSelection.addItems(warehouseList)
@@ -450,6 +470,13 @@ class InventoryWindow(BaseWindow):
         self.warehouseFilter.addItems(warehouseList)
 
     def add_product_count(self):
+        self.change_product_count(add_count)
+
+    def substract_product_count(self):
+        self.change_product_count(substract_count)
+
+    def change_product_count(self, operation):
+        """Изменение количества товара на складе операцией add_count или substract_count"""
         if self.warehouseSelection.currentIndex() == 0:
             QMessageBox.warning(self, 'Ошибка', 'Выберите склад')
             return None
@@ -462,79 +489,90 @@ class InventoryWindow(BaseWindow):
             QMessageBox.warning(self, 'Ошибка','Введите количество')
             return None
 
-        try:
-            warehouse = self.warehouseSelection.currentText()
-            product = self.productSelection.currentText()
-            quantity = int(self.productCountLine.text())
+        warehouse = self.warehouseSelection.currentText()
+        product = self.productSelection.currentText()
+        quantity = int(self.productCountLine.text())
 
-            res = add_count(product, warehouse, quantity)
-            if res['success']:
-                QMessageBox.information(self, 'Успех', res['message'])
-                self.update_inventory_table()
-                self.productCountLine.clear()
-                return None
-            QMessageBox.warning(self, 'Ошбика', res['message'])
-
-        except Exception as e:
-            QMessageBox.warning(self, 'Ошибка', str(e))
-
-    def substract_product_count(self):
-        if self.warehouseSelection.currentIndex() == 0:
-            QMessageBox.warning(self, 'Ошибка', 'Выберите склад')
-            return None
+        self.serviceRunner.run('quantity', operation, product, warehouse, quantity,
+                               onResult=self.on_product_count_changed, onError=self.show_error)
+        return None
 
-        if self.productSelection.currentIndex() == 0:
-            QMessageBox.warning(self, 'Ошибка', 'Выберите товар')
+    def on_product_count_changed(self, res):
+        if res['success']:
+            QMessageBox.information(self, 'Успех', res['message'])
+            self.update_inventory_table()
+            self.productCountLine.clear()
             return None
+        QMessageBox.warning(self, 'Ошибка', res['message'])
+        return None
 
-        if not self.productCountLine.text():
-            QMessageBox.warning(self, 'Ошибка','Введите количество')
-            return None
-        try:
-            warehouse = self.warehouseSelection.currentText()
-            product = self.productSelection.currentText()
-            quantity = int(self.productCountLine.text())
-
-            res = substract_count(product, warehouse, quantity)
-            if res['success']:
-                QMessageBox.information(self, 'Успех', res['message'])
-                self.update_inventory_table()
-                self.productCountLine.clear()
-                return None
-            QMessageBox.warning(self, 'Ошбика', res['message'])
-
-        except Exception as e:
-            QMessageBox.warning(self, 'Ошибка', str(e))
+    def show_error(self, message):
+        QMessageBox.warning(self, 'Ошибка', message)
 
     def update_inventory_table(self):
-        newInventoryData = get_inventory(AppState.currentUser.warehouses)
-        self.inventoryFilterModel.sourceModel().update_data(newInventoryData)
-        self.inventoryFilterModel.invalidateFilter()
+        """Фоновая загрузка таблицы хранилища; более ранний незавершенный запрос отменяется"""
+        self.serverFilterTimer.stop()
+        warehouseName = self.warehouseFilter.currentText()
+        self.serviceRunner.run('inventory', search_inventory, AppState.currentUser.warehouses,
+                               productName=self.productNameFilter.text().strip(),
+                               warehouseName=warehouseName if self.warehouseFilter.currentIndex() > 0 else None,
+                               onResult=self.set_inventory_data, onError=self.show_error)
+
+    def set_inventory_data(self, result):
+        if not result['success']:
+            QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке хранилища: {result["data"]}')
+            return None
+        self.serverSideFilter = result['serverSide']
+        if result.get('truncated'):
+            self.inventoryLayoutLabel.setText(f'Хранящиеся товары (первые {SERVER_FILTER_THRESHOLD}, уточните поиск)')
+        else:
+            self.inventoryLayoutLabel.setText('Хранящиеся товары')
+        # Прокси-модель перепроверяет фильтр только для добавленных и измененных строк
+        self.inventoryFilterModel.sourceModel().update_data(result['data'])
+        return None
 
     def update_product_table(self):
-        newProductData = get_all_product_and_ids()['data']
-        self.productsModel.update_data(newProductData)
+        """Фоновое обновление общего списка товаров"""
+        self.serviceRunner.run('products', get_all_product_and_ids,
+                               onResult=self.set_products_data, onError=self.show_error)
+
+    def set_products_data(self, result):
+        if result['success']:
+            self.productsModel.update_data(result['data'])
+            return None
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке товаров: {result["data"]}')
+        return None
 
     def update_product_selection_data(self):
+        """Фоновая загрузка товаров выбранного склада; запрос для прежнего склада отменяется"""
         self.productSelection.clear()
-        if self.warehouseSelection.currentIndex() == 0:
+        if self.warehouseSelection.currentIndex() <= 0:
+            self.serviceRunner.cancel('productSelection')
             self.productSelection.addItem('Склад не выбран')
             return None
 
         self.productSelection.addItem('Выберите товар')
-        inventoryData = get_inventory(AppState.currentUser.warehouses)
+        self.serviceRunner.run('productSelection', get_inventory, AppState.currentUser.warehouses,
+                               warehouseName=self.warehouseSelection.currentText(),
+                               onResult=self.set_product_selection_data, onError=self.show_error)
+        return None
 
-        productList = []
-        for item in inventoryData:
-            if item[1] == self.warehouseSelection.currentText():
-                productList.append(item[0])
-        productList = list(set(productList))
-        self.productSelection.addItems(productList)
+    def set_product_selection_data(self, inventoryData):
+        self.productSelection.addItems([item[0] for item in inventoryData])
 
     def update_new_product_selection_data(self):
+        """Фоновая загрузка товаров для добавления на склад"""
+        self.serviceRunner.run('newProducts', get_all_products,
+                               onResult=self.set_new_product_selection_data, onError=self.show_error)
+
+    def set_new_product_selection_data(self, result):
         self.newProductSelection.clear()
         self.newProductSelection.addItem('Выберите товар')
-        self.newProductSelection.addItems(get_all_products()['data'])
+        if result['success']:
+            self.newProductSelection.addItems(result['data'])
+            return None
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке товаров: {result["message"]}')
+        return None
 
     def add_new_product_to_warehouse(self):
         if self.toWarehouseSelection.currentIndex() == 0:
@@ -543,20 +581,22 @@ class InventoryWindow(BaseWindow):
         if self.newProductSelection.currentIndex() == 0:
             QMessageBox.warning(self, "Ошибка", "Выберите товар")
             return None
-        try:
-            warehouse = self.toWarehouseSelection.currentText()
-            product = self.newProductSelection.currentText()
-
-            res = add_new_product_to_warehouse(product, warehouse)
-            if res['success']:
-                QMessageBox.information(self, 'Успех', res['message'])
-                self.update_inventory_table()
-                self.update_product_selection_data()
-                self.load_warehouses_for_quantity_manupulation()
-                return None
-            QMessageBox.warning(self, 'Ошибка', res['message'])
-        except Exception as e:
-            QMessageBox.warning(self, 'Ошибка', str(e))
+        warehouse = self.toWarehouseSelection.currentText()
+        product = self.newProductSelection.currentText()
+
+        self.serviceRunner.run('warehouseProduct', add_new_product_to_warehouse, product, warehouse,
+                               onResult=self.on_product_added_to_warehouse, onError=self.show_error)
+        return None
+
+    def on_product_added_to_warehouse(self, res):
+        if res['success']:
+            QMessageBox.information(self, 'Успех', res['message'])
+            self.update_inventory_table()
+            self.update_product_selection_data()
+            self.load_warehouses_for_quantity_manupulation()
+            return None
+        QMessageBox.warning(self, 'Ошибка', res['message'])
+        return None
 
     def del_product_from_warehouse(self):
         if self.toWarehouseSelection.currentIndex() == 0:
@@ -565,19 +605,21 @@ class InventoryWindow(BaseWindow):
         if self.newProductSelection.currentIndex() == 0:
             QMessageBox.warning(self, "Ошибка", "Выберите товар")
             return None
-        try:
-            warehouse = self.toWarehouseSelection.currentText()
-            product = self.newProductSelection.currentText()
-
-            res = del_product_from_warehouse(product, warehouse)
-            if res['success']:
-                QMessageBox.information(self, 'Успех', res['message'])
-                self.update_inventory_table()
-                self.update_product_selection_data()
-                return None
-            QMessageBox.warning(self, 'Ошибка', res['message'])
-        except Exception as e:
-            QMessageBox.warning(self, 'Ошибка', str(e))
+        warehouse = self.toWarehouseSelection.currentText()
+        product = self.newProductSelection.currentText()
+
+        self.serviceRunner.run('warehouseProduct', del_product_from_warehouse, product, warehouse,
+                               onResult=self.on_product_deleted_from_warehouse, onError=self.show_error)
+        return None
+
+    def on_product_deleted_from_warehouse(self, res):
+        if res['success']:
+            QMessageBox.information(self, 'Успех', res['message'])
+            self.update_inventory_table()
+            self.update_product_selection_data()
+            return None
+        QMessageBox.warning(self, 'Ошибка', res['message'])
+        return None
 
     def add_product_to_database(self):
 
@@ -585,20 +627,10 @@ class InventoryWindow(BaseWindow):
         if not newProductName:
             QMessageBox.warning(self, 'Ошибка', 'Введите имя нового товара')
             return None
-        try:
-            res = add_product(newProductName)
-
-            if res['success']:
-                QMessageBox.information(self, 'Успех', res['message'])
-                self.update_product_table()
-                self.update_new_product_selection_data()
-                self.update_product_selection_data()
-                self.newProductNameLine.clear()
-                return None
-
-            QMessageBox.warning(self, 'Ошибка', res['message'])
-        except Exception as e:
-            QMessageBox.warning(self, 'Ошибка', str(e))
+        self.serviceRunner.run('product', add_product, newProductName,
+                               onResult=lambda res: self.on_products_changed(res, self.newProductNameLine),
+                               onError=self.show_error)
+        return None
 
     def del_product_from_database(self):
 
@@ -606,21 +638,22 @@ class InventoryWindow(BaseWindow):
         if not delProductId:
             QMessageBox.warning(self, 'Ошибка', 'Введите Id удаляемого товара')
             return None
-        try:
-            delProductId = int(delProductId)
-            res = del_product(delProductId)
-
-            if res['success']:
-                QMessageBox.information(self, 'Успех', res['message'])
-                self.update_product_table()
-                self.update_new_product_selection_data()
-                self.update_product_selection_data()
-                self.delProductIdLine.clear()
-                return None
-
-            QMessageBox.warning(self, 'Ошибка', res['message'])
-        except Exception as e:
-            QMessageBox.warning(self,'Ошибка', str(e))
+        self.serviceRunner.run('product', del_product, int(delProductId),
+                               onResult=lambda res: self.on_products_changed(res, self.delProductIdLine),
+                               onError=self.show_error)
+        return None
+
+    def on_products_changed(self, res, inputLine):
+        """Результат добавления или удаления товара из общего списка"""
+        if res['success']:
+            QMessageBox.information(self, 'Успех', res['message'])
+            self.update_product_table()
+            self.update_new_product_selection_data()
+            self.update_product_selection_data()
+            inputLine.clear()
+            return None
+        QMessageBox.warning(self, 'Ошибка', str(res['message']))
+        return None
 
     def refresh(self):
         self.update_inventory_table()
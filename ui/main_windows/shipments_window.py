@@ -7,13 +7,14 @@ from PyQt6.QtWidgets import QLabel, QWidget, QWIDGETSIZE_MAX, QVBoxLayout, QStac
     QLineEdit
 
 from services.shipments_service import get_suppliers_name, get_suppliers_data, get_shipments_data, get_users_warehouses, \
-    add_new_supplier
+    add_new_supplier, iter_shipments
 from ui.base_window import BaseWindow
 from ui.ui_elements.create_new_shipment_window import CreateNewShipmentWindow
 from ui.ui_elements.nav_panel import NavPanel
 from ui.ui_elements.shipment_details_window import ShipmentDetailsWindow
-from ui.ui_elements.table_model import TableModel
-from utils.export_to_excel import exportToExcel
+from ui.ui_elements.table_model import TableModel, DEFAULT_PAGE_SIZE
+from utils.export_to_excel import exportRowsToExcel
+from utils.task_runner import ServiceRunner
 
 
 class ShipmentsWindow(BaseWindow):
@@ -27,6 +28,8 @@ class ShipmentsWindow(BaseWindow):
     def __init__(self, user):
         super().__init__()
         self.user = user
+        # Запросы к бд выполняются вне GUI-потока
+        self.serviceRunner = ServiceRunner(self)
         # Инициализация пользовательского интерфейса
         self.init_ui()
 
@@ -83,8 +86,10 @@ class ShipmentsWindow(BaseWindow):
         newShipmentLayout.addSpacing(10)
 
         shipmentsHeaders = ['Id', 'Поставщик', 'Сотрудник', 'Склад', 'Дата']
-        shipmentsData = get_shipments_data(self.user.warehouses)['data']
-        self.shipmentsModel = TableModel(shipmentsData, shipmentsHeaders)
+        self.shipmentsModel = TableModel([], shipmentsHeaders, fetchPage=self.fetch_shipments_page,
+                                        keyColumns=(0,), serviceRunner=self.serviceRunner)
+        self.shipmentsModel.fetchFailed.connect(
+            lambda message: QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке поставок: {message}'))
 
         # Таблица поставок
         self.shipmentsTable = QTableView()
@@ -102,9 +107,10 @@ class ShipmentsWindow(BaseWindow):
         newShipmentLayout.addWidget(self.shipmentsTable, alignment=Qt.AlignmentFlag.AlignCenter)
 
         generateReport = QPushButton("Сгенерировать отчет")
-        generateReport.clicked.connect(lambda: exportToExcel(self.shipmentsModel))
+        generateReport.clicked.connect(self.export_shipments_report)
         generateReport.setFixedSize(706, 30)
         newShipmentLayout.addWidget(generateReport, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.serviceRunner.bind_busy('shipments', self.shipmentsTable, generateReport)
 
         newShipmentLayout.addSpacing(10)
 
@@ -181,8 +187,8 @@ class ShipmentsWindow(BaseWindow):
 
             # Модель для таблицы поставщиков
             suppliersHeaders = ['Имя', 'Номер телефона', 'Почта']
-            suppliersData = get_suppliers_data()['data']
-            self.suppliersModel = TableModel(suppliersData, suppliersHeaders)
+            self.suppliersModel = TableModel([], suppliersHeaders)
+            self.update_suppliers_table()
 
             # Таблица для поставщиков
             suppliersTable = QTableView()
@@ -249,6 +255,7 @@ class ShipmentsWindow(BaseWindow):
 
             addNewSupplierBtn = QPushButton('Добавить')
             addNewSupplierBtn.clicked.connect(self.handle_add_new_supplier)
+            self.serviceRunner.bind_busy('newSupplier', addNewSupplierBtn)
             addNewSupplierBtn.setFixedWidth(200)
             newSupplierLayout.addWidget(addNewSupplierBtn, alignment=Qt.AlignmentFlag.AlignCenter)
 
@@ -265,11 +272,16 @@ class ShipmentsWindow(BaseWindow):
 
         self.setLayout(mainLayout)
 
+        self.update_shipments_table()
+
     def load_selectable_suppliers(self):
-        """Загрузка поставщиков из бд в список для создания поставки"""
+        """Фоновая загрузка поставщиков из бд в список для создания поставки"""
+        self.serviceRunner.run('selectableSuppliers', get_suppliers_name,
+                               onResult=self.set_selectable_suppliers, onError=self.show_error)
+
+    def set_selectable_suppliers(self, suppliers):
         self.supplierSelection.clear()
         self.supplierSelection.addItem('Выберите поставщика')
-        suppliers = get_suppliers_name()
         if suppliers['success']:
             for supplierId, supplierName in suppliers['data']:
                 self.supplierSelection.addItem(supplierName, supplierId)
@@ -278,10 +290,13 @@ class ShipmentsWindow(BaseWindow):
         return None
 
     def load_selectable_warehouses(self):
-        """Загрузка доступных пользователю складов в список для создания поставки"""
+        """Фоновая загрузка доступных пользователю складов в список для создания поставки"""
+        self.serviceRunner.run('selectableWarehouses', get_users_warehouses,
+                               onResult=self.set_selectable_warehouses, onError=self.show_error)
+
+    def set_selectable_warehouses(self, warehouses):
         self.warehouseSelection.clear()
         self.warehouseSelection.addItem('Выберите склад')
-        warehouses = get_users_warehouses()
         if warehouses['success']:
             for warehouseId, warehouseName in warehouses['data']:
                 self.warehouseSelection.addItem(warehouseName, warehouseId)
@@ -313,9 +328,32 @@ class ShipmentsWindow(BaseWindow):
         return None
 
     def update_shipments_table(self):
-        """Обновление таблицы поставок"""
-        newShipmentsData = get_shipments_data(self.user.warehouses)['data']
-        self.shipmentsModel.update_data(newShipmentsData)
+        """Фоновое обновление таблицы поставок"""
+        self.serviceRunner.run('shipments', get_shipments_data, self.user.warehouses, limit=DEFAULT_PAGE_SIZE,
+                               onResult=self.set_shipments_data, onError=self.show_error)
+
+    def set_shipments_data(self, result):
+        if result['success']:
+            self.shipmentsModel.update_data(result['data'])
+            return None
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке поставок: {result["data"]}')
+        return None
+
+    def show_error(self, message):
+        QMessageBox.warning(self, 'Ошибка', message)
+
+    def export_shipments_report(self):
+        """Отчет по всей истории поставок: строки читаются из бд потоком, а не из загруженных страниц таблицы"""
+        headers = self.shipmentsModel.headers
+        exportRowsToExcel(headers, lambda: iter_shipments(self.user.warehouses), self)
+
+    def fetch_shipments_page(self, lastRow):
+        """Следующая страница истории поставок (старше последней загруженной)"""
+        result = get_shipments_data(self.user.warehouses, lastId=lastRow[0], limit=DEFAULT_PAGE_SIZE)
+        if not result['success']:
+            # Ошибка доходит до модели через исполнитель: таблица не считает историю законченной
+            raise RuntimeError(result['data'])
+        return result['data']
 
     def handle_add_new_supplier(self):
         """Обработка нажатия на кнопку добавления поставщика"""
@@ -337,7 +375,11 @@ class ShipmentsWindow(BaseWindow):
             QMessageBox.warning(self, 'Ошибка', 'Введен некорректный email')
             return None
 
-        res = add_new_supplier(newSupplierName, newSupplierPhone, newSupplierEmail)
+        self.serviceRunner.run('newSupplier', add_new_supplier, newSupplierName, newSupplierPhone, newSupplierEmail,
+                               onResult=self.on_supplier_added, onError=self.show_error)
+        return None
+
+    def on_supplier_added(self, res):
         if res['success']:
             QMessageBox.information(self,'Успех', res['data'])
             self.newSupplierNameLine.clear()
@@ -349,9 +391,16 @@ class ShipmentsWindow(BaseWindow):
         return None
 
     def update_suppliers_table(self):
-        """Обновление таблицы с поставщиками"""
-        newSuppliersData = get_suppliers_data()['data']
-        self.suppliersModel.update_data(newSuppliersData)
+        """Фоновое обновление таблицы с поставщиками"""
+        self.serviceRunner.run('suppliers', get_suppliers_data,
+                               onResult=self.set_suppliers_data, onError=self.show_error)
+
+    def set_suppliers_data(self, result):
+        if result['success']:
+            self.suppliersModel.update_data(result['data'])
+            return None
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке поставщиков: {result["data"]}')
+        return None
 
     def refresh(self):
         self.update_shipments_table()
@@ -4,13 +4,14 @@ from PyQt6.QtWidgets import QLabel, QWidget, QWIDGETSIZE_MAX, QVBoxLayout, QStac
     QGraphicsDropShadowEffect, QTableView, QHeaderView, QHBoxLayout, QComboBox, QPushButton, QLineEdit, QMessageBox
 
 from services.info_from_db import get_warehouses
-from services.transfers_service import get_transfers_data, get_warehouses_data, add_new_warehouse
+from services.transfers_service import get_transfers_data, get_warehouses_data, add_new_warehouse, iter_transfers
 from ui.base_window import BaseWindow
 from ui.ui_elements.create_new_transfer_window import CreateNewTransferWindow
 from ui.ui_elements.nav_panel import NavPanel
-from ui.ui_elements.table_model import TableModel
+from ui.ui_elements.table_model import TableModel, DEFAULT_PAGE_SIZE
 from ui.ui_elements.transfer_details import TransferDetailsWindow
-from utils.export_to_excel import exportToExcel
+from utils.export_to_excel import exportRowsToExcel
+from utils.task_runner import ServiceRunner
 
 
 class TransfersWindow(BaseWindow):
@@ -24,6 +25,8 @@ class TransfersWindow(BaseWindow):
     def __init__(self, user):
         super().__init__()
         self.user = user
+        # Запросы к бд выполняются вне GUI-потока
+        self.serviceRunner = ServiceRunner(self)
         # Инициализация пользовательского интерфейса
         self.init_ui()
 
@@ -81,8 +84,10 @@ class TransfersWindow(BaseWindow):
 
 
         transfersHeaders = ['Id', 'Отправитель', 'Получатель', 'Сотрудник', 'Дата']
-        transfersData = get_transfers_data(self.user.warehouses)['data']
-        self.transfersModel = TableModel(transfersData, transfersHeaders)
+        self.transfersModel = TableModel([], transfersHeaders, fetchPage=self.fetch_transfers_page,
+                                        keyColumns=(0,), serviceRunner=self.serviceRunner)
+        self.transfersModel.fetchFailed.connect(
+            lambda message: QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке перемещений: {message}'))
 
         # Таблица транспортировок
         self.transfersTable = QTableView()
@@ -102,9 +107,10 @@ class TransfersWindow(BaseWindow):
         newTransferLayout.addWidget(self.transfersTable, alignment=Qt.AlignmentFlag.AlignCenter)
 
         generateReport = QPushButton("Сгенерировать отчет")
-        generateReport.clicked.connect(lambda: exportToExcel(self.transfersModel))
+        generateReport.clicked.connect(self.export_transfers_report)
         generateReport.setFixedSize(706, 30)
         newTransferLayout.addWidget(generateReport, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.serviceRunner.bind_busy('transfers', self.transfersTable, generateReport)
 
         newTransferLayout.addSpacing(10)
 
@@ -179,8 +185,8 @@ class TransfersWindow(BaseWindow):
 
             # Модель для таблицы складов
             warehousesHeaders = ['Id', 'Имя', 'Адрес', 'Площадь']
-            warehousesData = get_warehouses_data()['data']
-            self.warehousesModel = TableModel(warehousesData, warehousesHeaders)
+            self.warehousesModel = TableModel([], warehousesHeaders)
+            self.update_warehouses_table()
 
             # Таблица для складов
             warehousesTable = QTableView()
@@ -255,6 +261,7 @@ class TransfersWindow(BaseWindow):
             # Кнопка добавления склада
             addNewWarehouseBtn = QPushButton('Добавить')
             addNewWarehouseBtn.clicked.connect(self.handle_add_new_warehouse)
+            self.serviceRunner.bind_busy('newWarehouse', addNewWarehouseBtn)
             addNewWarehouseBtn.setFixedWidth(300)
             newWarehouseLayout.addWidget(addNewWarehouseBtn, alignment=Qt.AlignmentFlag.AlignCenter)
 
@@ -271,6 +278,7 @@ class TransfersWindow(BaseWindow):
 
         self.setLayout(mainLayout)
 
+        self.update_transfers_table()
 
     def open_transfer_details(self, index):
         """Открытие окна с содержимым транспортировки"""
@@ -281,21 +289,32 @@ class TransfersWindow(BaseWindow):
         dialog.exec()
 
     def load_from_warehouse(self):
+        """Фоновая загрузка складов пользователя в список отправителей"""
+        self.serviceRunner.run('fromWarehouses', get_warehouses, self.user.warehouses,
+                               onResult=self.set_from_warehouses, onError=self.show_error)
+
+    def set_from_warehouses(self, warehouses):
         self.fromWarehouseSelection.clear()
         self.fromWarehouseSelection.addItem('Выберите склад')
-        warehouses = get_warehouses(self.user.warehouses)
 
         for warehouseId, warehouseName in warehouses:
             self.fromWarehouseSelection.addItem(warehouseName, warehouseId)
         return None
 
     def load_to_warehouse(self):
+        """Фоновая загрузка складов-получателей для выбранного отправителя"""
         self.toWarehouseSelection.clear()
-        if self.fromWarehouseSelection.currentIndex() == 0:
+        if self.fromWarehouseSelection.currentIndex() <= 0:
+            self.serviceRunner.cancel('toWarehouses')
             self.toWarehouseSelection.addItem('Выберите отправителя')
             return None
+        self.serviceRunner.run('toWarehouses', get_warehouses,
+                               onResult=self.set_to_warehouses, onError=self.show_error)
+        return None
+
+    def set_to_warehouses(self, warehouses):
+        self.toWarehouseSelection.clear()
         self.toWarehouseSelection.addItem('Выберите склад')
-        warehouses = get_warehouses()
 
         for warehouseId, warehouseName in warehouses:
             if warehouseId == self.fromWarehouseSelection.currentData():
@@ -333,7 +352,11 @@ class TransfersWindow(BaseWindow):
             QMessageBox.warning(self, 'Ошибка', 'Заполните поле площади склада')
             return None
 
-        result = add_new_warehouse(newWarehouseName,newWarehouseAddress, newWarehouseArea)
+        self.serviceRunner.run('newWarehouse', add_new_warehouse, newWarehouseName, newWarehouseAddress,
+                               newWarehouseArea, onResult=self.on_warehouse_added, onError=self.show_error)
+        return None
+
+    def on_warehouse_added(self, result):
         if result['success']:
             QMessageBox.information(self, 'Успех', result['data'])
             self.refresh()
@@ -342,12 +365,44 @@ class TransfersWindow(BaseWindow):
         return None
 
     def update_transfers_table(self):
-        newTransfersData = get_transfers_data(self.user.warehouses)['data']
-        self.transfersModel.update_data(newTransfersData)
+        """Фоновое обновление таблицы перемещений"""
+        self.serviceRunner.run('transfers', get_transfers_data, self.user.warehouses, limit=DEFAULT_PAGE_SIZE,
+                               onResult=self.set_transfers_data, onError=self.show_error)
+
+    def set_transfers_data(self, result):
+        if result['success']:
+            self.transfersModel.update_data(result['data'])
+            return None
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке перемещений: {result["data"]}')
+        return None
+
+    def show_error(self, message):
+        QMessageBox.warning(self, 'Ошибка', message)
+
+    def export_transfers_report(self):
+        """Отчет по всей истории перемещений: строки читаются из бд потоком, а не из загруженных страниц таблицы"""
+        headers = self.transfersModel.headers
+        exportRowsToExcel(headers, lambda: iter_transfers(self.user.warehouses), self)
+
+    def fetch_transfers_page(self, lastRow):
+        """Следующая страница истории перемещений (старше последней загруженной)"""
+        result = get_transfers_data(self.user.warehouses, lastId=lastRow[0], limit=DEFAULT_PAGE_SIZE)
+        if not result['success']:
+            # Ошибка доходит до модели через исполнитель: таблица не считает историю законченной
+            raise RuntimeError(result['data'])
+        return result['data']
 
     def update_warehouses_table(self):
-        newWarehousesData = get_warehouses_data()['data']
-        self.warehousesModel.update_data(newWarehousesData)
+        """Фоновое обновление таблицы складов"""
+        self.serviceRunner.run('warehouses', get_warehouses_data,
+                               onResult=self.set_warehouses_data, onError=self.show_error)
+
+    def set_warehouses_data(self, result):
+        if result['success']:
+            self.warehousesModel.update_data(result['data'])
+            return None
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке складов: {result["data"]}')
+        return None
 
     def refresh(self):
         self.update_transfers_table()
@@ -1,20 +1,22 @@
-from PyQt6.QtCore import QSize, Qt, QSortFilterProxyModel
+from PyQt6.QtCore import QSize, Qt
 from PyQt6.QtGui import QColor
 from PyQt6.QtWidgets import QLabel, QWidget, QWIDGETSIZE_MAX, QVBoxLayout, QStackedLayout, QHBoxLayout, QTableView, \
-    QHeaderView, QLineEdit, QComboBox, QPushButton, QScrollArea, QFrame, QGraphicsDropShadowEffect
+    QHeaderView, QLineEdit, QComboBox, QPushButton, QScrollArea, QFrame, QGraphicsDropShadowEffect, QMessageBox
 
 from services.control_user_service import get_employees
 from services.info_from_db import get_users, get_roles, get_posts
 from ui.base_window import BaseWindow
 from ui.ui_elements.add_employee_window import AddEmployeeWindow
 from ui.ui_elements.create_invitecode_window import CreateInviteCodeWindow
+from ui.ui_elements.filter_proxy_model import IndexedFilterProxyModel, CONTAINS, EQUALS
 from ui.ui_elements.manage_employee_window import ManageEmployeeWindow
 from ui.ui_elements.manage_user_window import ManageUserWindow
 from ui.ui_elements.nav_panel import NavPanel
 from ui.ui_elements.table_model import TableModel
+from utils.task_runner import ServiceRunner
 
 
-class MultiFilterProxyModelUsers(QSortFilterProxyModel):
+class MultiFilterProxyModelUsers(IndexedFilterProxyModel):
     """Класс прокси модели для реализации фильтров в таблице пользователей"""
     def __init__(self):
         super().__init__()
@@ -24,39 +26,27 @@ class MultiFilterProxyModelUsers(QSortFilterProxyModel):
         self.firstNameFilter = ''
         self.isActiveFilter = None
 
-    def filterAcceptsRow(self, sourceRow, sourceParent):
-        model = self.sourceModel()
-
+    def filter_criteria(self):
+        criteria = {}
         # Текстовые фильтры
-        login = model.data(model.index(sourceRow, 0), Qt.ItemDataRole.DisplayRole).lower()
-        role = model.data(model.index(sourceRow, 1), Qt.ItemDataRole.DisplayRole).lower()
-        lastName = model.data(model.index(sourceRow, 2), Qt.ItemDataRole.DisplayRole).lower()
-        firstName = model.data(model.index(sourceRow, 3), Qt.ItemDataRole.DisplayRole).lower()
-
-        if self.loginFilter and self.loginFilter.lower() not in login:
-            return False
-        if self.lastNameFilter and self.lastNameFilter.lower() not in lastName:
-            return False
-        if self.firstNameFilter and self.firstNameFilter.lower() not in firstName:
-            return False
+        if self.loginFilter:
+            criteria[0] = (CONTAINS, self.loginFilter)
+        if self.lastNameFilter:
+            criteria[2] = (CONTAINS, self.lastNameFilter)
+        if self.firstNameFilter:
+            criteria[3] = (CONTAINS, self.firstNameFilter)
 
         # Фильтр по роли
         if self.roleFilter and self.roleFilter != "Все роли":
-            if role.lower() != self.roleFilter.lower():
-                return False
+            criteria[1] = (EQUALS, self.roleFilter)
 
         # Фильтр активности
         if self.isActiveFilter is not None:
-            isActive = model.data(model.index(sourceRow, 4), Qt.ItemDataRole.DisplayRole)
-            try:
-                if int(isActive) != self.isActiveFilter:
-                    return False
-            except (ValueError,TypeError):
-                return False
+            criteria[4] = (EQUALS, str(self.isActiveFilter))
 
-        return True
+        return criteria
 
-class MultiFilterProxyModelEmployees(QSortFilterProxyModel):
+class MultiFilterProxyModelEmployees(IndexedFilterProxyModel):
     """Класс прокси модели для реализации фильтрации в таблице сотрудники"""
     def __init__(self):
         super().__init__()
@@ -66,35 +56,23 @@ class MultiFilterProxyModelEmployees(QSortFilterProxyModel):
         self.postFilter = None
         self.isActiveFilter = None
 
-    def filterAcceptsRow(self, sourceRow, sourceParent):
-        model = self.sourceModel()
-
+    def filter_criteria(self):
+        criteria = {}
         # Текстовые фильтры
-        lastName = model.data(model.index(sourceRow, 2), Qt.ItemDataRole.DisplayRole).lower()
-        firstName = model.data(model.index(sourceRow, 1), Qt.ItemDataRole.DisplayRole).lower()
-        post = model.data(model.index(sourceRow, 6), Qt.ItemDataRole.DisplayRole).lower()
-
-        if self.lastNameFilter and self.lastNameFilter.lower() not in lastName:
-            return False
-        if self.firstNameFilter and self.firstNameFilter.lower() not in firstName:
-            return False
+        if self.lastNameFilter:
+            criteria[2] = (CONTAINS, self.lastNameFilter)
+        if self.firstNameFilter:
+            criteria[1] = (CONTAINS, self.firstNameFilter)
 
         # Фильтр по должности
-
         if self.postFilter and self.postFilter != "Все должности":
-            if post.lower() != self.postFilter.lower():
-                return False
+            criteria[6] = (EQUALS, self.postFilter)
 
         # Фильтр активности
         if self.isActiveFilter is not None:
-            isActive = model.data(model.index(sourceRow, 8), Qt.ItemDataRole.DisplayRole)
-            try:
-                if int(isActive) != self.isActiveFilter:
-                    return False
-            except (ValueError, TypeError):
-                return False
+            criteria[8] = (EQUALS, str(self.isActiveFilter))
 
-        return True
+        return criteria
 
 
 class UserControlsWindow(BaseWindow):
@@ -109,6 +87,8 @@ class UserControlsWindow(BaseWindow):
         super().__init__()
         """Получение данных о пользователе"""
         self.user = user
+        # Запросы к бд выполняются вне GUI-потока
+        self.serviceRunner = ServiceRunner(self)
         # Инициализация пользовательского интерфейса
         self.init_ui()
 
@@ -171,8 +151,7 @@ class UserControlsWindow(BaseWindow):
 
         # Данные для таблицы с пользователями
         usersHeaders = ["Логин", "Роль", "Фамилия", "Имя", "Активен"]
-        usersData = get_users()
-        usersModel = TableModel(usersData, usersHeaders)
+        usersModel = TableModel([], usersHeaders)
 
         #Модель для фильтрации
         self.usersFilterModel = MultiFilterProxyModelUsers()
@@ -187,6 +166,7 @@ class UserControlsWindow(BaseWindow):
         usersTable.setFixedSize(620, 200)
         usersTable.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         usersLayout.addWidget(usersTable, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.serviceRunner.bind_busy('users', usersTable)
 
         # Фильтрация по активности учетной записи
         usersFilterButtons = QHBoxLayout()
@@ -217,28 +197,27 @@ class UserControlsWindow(BaseWindow):
         self.roleFilter = QComboBox()
         self.roleFilter.setFixedSize(620, 30)
         self.roleFilter.addItem("Все роли")
-        self.roleFilter.addItems(get_roles())
-        self.roleFilter.currentTextChanged.connect(self.update_users_filters)
+        self.roleFilter.currentTextChanged.connect(lambda: self.update_users_filters())
         employeesFilterFields.addWidget(self.roleFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
         # Поле поиска по логину
         self.loginFilter = QLineEdit()
         self.loginFilter.setFixedSize(620, 30)
-        self.loginFilter.textChanged.connect(self.update_users_filters)
+        self.loginFilter.textChanged.connect(lambda: self.update_users_filters(delayed=True))
         self.loginFilter.setPlaceholderText("Логин")
         employeesFilterFields.addWidget(self.loginFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
         # Поле поиска по фамилии
         self.userLastNameFilter = QLineEdit()
         self.userLastNameFilter.setFixedSize(620, 30)
-        self.userLastNameFilter.textChanged.connect(self.update_users_filters)
+        self.userLastNameFilter.textChanged.connect(lambda: self.update_users_filters(delayed=True))
         self.userLastNameFilter.setPlaceholderText("Фамилия")
         employeesFilterFields.addWidget(self.userLastNameFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
         # Поле поиска по имени
         self.userFirstNameFilter = QLineEdit()
         self.userFirstNameFilter.setFixedSize(620, 30)
-        self.userFirstNameFilter.textChanged.connect(self.update_users_filters)
+        self.userFirstNameFilter.textChanged.connect(lambda: self.update_users_filters(delayed=True))
         self.userFirstNameFilter.setPlaceholderText("Имя")
         employeesFilterFields.addWidget(self.userFirstNameFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
@@ -279,8 +258,7 @@ class UserControlsWindow(BaseWindow):
         # Данные для таблицы с сотрудниками
         employeeHeaders = ["id", "Имя", "Фамилия", "Серия\nпаспорта",
                            "Номер\nпаспорта", "Телефон", "Должность", "Дата", "Работает"]
-        employeesData = get_employees()
-        employeesModel = TableModel(employeesData, employeeHeaders)
+        employeesModel = TableModel([], employeeHeaders)
 
         # Модель для фильтрации
         self.employeesFilterModel = MultiFilterProxyModelEmployees()
@@ -295,6 +273,7 @@ class UserControlsWindow(BaseWindow):
         employeesTable.setFixedSize(900, 200)
         employeesTable.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         employeeLayout.addWidget(employeesTable, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.serviceRunner.bind_busy('employees', employeesTable)
 
         # Фильтрация ныне работающих и уволенных сотрудников
         employeesFilterButtons = QHBoxLayout()
@@ -325,21 +304,20 @@ class UserControlsWindow(BaseWindow):
         self.postFilter = QComboBox()
         self.postFilter.setFixedSize(620, 30)
         self.postFilter.addItem("Все должности")
-        self.postFilter.addItems(get_posts())
-        self.postFilter.currentTextChanged.connect(self.update_employees_filters)
+        self.postFilter.currentTextChanged.connect(lambda: self.update_employees_filters())
         employeesFilterFields.addWidget(self.postFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
         # Поиск по фамилии
         self.employeeLastNameFilter = QLineEdit()
         self.employeeLastNameFilter.setFixedSize(620, 30)
-        self.employeeLastNameFilter.textChanged.connect(self.update_employees_filters)
+        self.employeeLastNameFilter.textChanged.connect(lambda: self.update_employees_filters(delayed=True))
         self.employeeLastNameFilter.setPlaceholderText("Фамилия")
         employeesFilterFields.addWidget(self.employeeLastNameFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
         # Поиск по имени
         self.employeeFirstNameFilter = QLineEdit()
         self.employeeFirstNameFilter.setFixedSize(620, 30)
-        self.employeeFirstNameFilter.textChanged.connect(self.update_employees_filters)
+        self.employeeFirstNameFilter.textChanged.connect(lambda: self.update_employees_filters(delayed=True))
         self.employeeFirstNameFilter.setPlaceholderText("Имя")
         employeesFilterFields.addWidget(self.employeeFirstNameFilter, alignment=Qt.AlignmentFlag.AlignCenter)
 
@@ -397,42 +375,56 @@ class UserControlsWindow(BaseWindow):
 
         self.setLayout(mainLayout)
 
-    def update_users_filters(self):
-        """Обновление фильтров для таблицы учетных записей"""
+        self.serviceRunner.run('roles', get_roles, onResult=self.roleFilter.addItems, onError=self.show_error)
+        self.serviceRunner.run('posts', get_posts, onResult=self.postFilter.addItems, onError=self.show_error)
+        self.update_users_table()
+        self.update_employees_table()
+
+    def update_users_filters(self, delayed=False):
+        """Обновление фильтров для таблицы учетных записей; ввод текста применяется после паузы"""
         self.usersFilterModel.roleFilter = self.roleFilter.currentText()
         self.usersFilterModel.loginFilter = self.loginFilter.text()
         self.usersFilterModel.lastNameFilter = self.userLastNameFilter.text()
         self.usersFilterModel.firstNameFilter = self.userFirstNameFilter.text()
-        self.usersFilterModel.invalidateFilter()
-
-    def update_employees_filters(self):
-        """Обновление фильтров для таблицы сотрудников"""
+        if delayed:
+            self.usersFilterModel.schedule_filters()
+            return None
+        self.usersFilterModel.apply_filters()
+        return None
+
+    def update_employees_filters(self, delayed=False):
+        """Обновление фильтров для таблицы сотрудников; ввод текста применяется после паузы"""
         self.employeesFilterModel.postFilter = self.postFilter.currentText()
         self.employeesFilterModel.lastNameFilter = self.employeeLastNameFilter.text()
         self.employeesFilterModel.firstNameFilter = self.employeeFirstNameFilter.text()
-        self.employeesFilterModel.invalidateFilter()
+        if delayed:
+            self.employeesFilterModel.schedule_filters()
+            return None
+        self.employeesFilterModel.apply_filters()
+        return None
 
     def set_users_active_filter(self, value):
         """Установка фильтра учетных записей по активности"""
         self.usersFilterModel.isActiveFilter = value
-        self.usersFilterModel.invalidateFilter()
+        self.usersFilterModel.apply_filters()
 
     def set_employees_active_filter(self, value):
         """Установка фильтров работающих/уволенных сотрудников"""
         self.employeesFilterModel.isActiveFilter = value
-        self.employeesFilterModel.invalidateFilter()
+        self.employeesFilterModel.apply_filters()
 
     def update_users_table(self):
-        """Обновление данных для таблицы учетных записей"""
-        newUsersData = get_users()
-        self.usersFilterModel.sourceModel().update_data(newUsersData)
-        self.usersFilterModel.invalidateFilter()
+        """Фоновое обновление данных для таблицы учетных записей"""
+        self.serviceRunner.run('users', get_users, onResult=self.usersFilterModel.sourceModel().update_data,
+                               onError=self.show_error)
 
     def update_employees_table(self):
-        """Обновление данных для таблицы сотрудников"""
-        newEmployeesData = get_employees()
-        self.employeesFilterModel.sourceModel().update_data(newEmployeesData)
-        self.employeesFilterModel.invalidateFilter()
+        """Фоновое обновление данных для таблицы сотрудников"""
+        self.serviceRunner.run('employees', get_employees, onResult=self.employeesFilterModel.sourceModel().update_data,
+                               onError=self.show_error)
+
+    def show_error(self, message):
+        QMessageBox.warning(self, 'Ошибка', message)
 
     def manage_user(self):
         """Открытие окна управления учетной записью"""
@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import (
 )
 
 from services.auth_service import authorize_user
+from utils.task_runner import ServiceRunner
 from ui.base_window import BaseWindow
 
 
@@ -23,6 +24,8 @@ class LoginWindow(BaseWindow):
 
     def __init__(self):
         super().__init__()
+        # Обращение к бд выполняется вне GUI-потока
+        self.serviceRunner = ServiceRunner(self)
         # Инициализация пользовательского интерфейса
 
         self.init_ui()
@@ -81,6 +84,7 @@ class LoginWindow(BaseWindow):
         switchToRegister.clicked.connect(self.handle_switch_to_register)
         switchToRegister.setFixedSize(90, 20)
         switchToRegister.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.serviceRunner.bind_busy('login', handleLoginButton, switchToRegister)
 
         # Подложка для формы авторизации
         self.card = QFrame()
@@ -167,10 +171,16 @@ class LoginWindow(BaseWindow):
         if len(login) == 0 or len(password) == 0 :
             QMessageBox.warning(self, 'Ошибка', 'Все поля должны быть заполнены')
             return None
-        result = authorize_user(login, password)
+        self.serviceRunner.run('login', authorize_user, login, password,
+                               onResult=self.on_authorized, onError=self.show_error)
+        return None
+
+    def on_authorized(self, result):
         if result['success']:
             self.set_to_default()
             self.switchToMain.emit()
             return None
         QMessageBox.warning(self, 'Ошибка', result['message'])
 
+    def show_error(self, message):
+        QMessageBox.warning(self, 'Ошибка', message)
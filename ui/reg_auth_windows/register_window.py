@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import QPushButton, QVBoxLayout, QFrame, QGraphicsDropShado
     QLineEdit, QMessageBox
 
 from services.auth_service import register_user
+from utils.task_runner import ServiceRunner
 from ui.base_window import BaseWindow
 
 
@@ -22,6 +23,8 @@ class RegisterWindow(BaseWindow):
 
     def __init__(self):
         super().__init__()
+        # Обращение к бд выполняется вне GUI-потока
+        self.serviceRunner = ServiceRunner(self)
         # Инициализация пользовательского интерфейса
         self.init_ui()
 
@@ -83,6 +86,7 @@ class RegisterWindow(BaseWindow):
         swithToLogin.clicked.connect(self.handle_switch_to_login)
         swithToLogin.setFixedSize(33, 20)
         swithToLogin.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.serviceRunner.bind_busy('register', handleRegisterButton, swithToLogin)
 
         # Подложка для формы регистрации
         self.card = QFrame()
@@ -189,8 +193,11 @@ class RegisterWindow(BaseWindow):
             return None
 
         # Попытка регистрации с обращением к бд
-        result = register_user(inviteCode, login, password)
+        self.serviceRunner.run('register', register_user, inviteCode, login, password,
+                               onResult=self.on_registered, onError=self.show_error)
+        return None
 
+    def on_registered(self, result):
         # Проверка с обращением к бд
         if not result['success']:
             QMessageBox.warning(self, 'Ошибка', result['message'])
@@ -201,3 +208,5 @@ class RegisterWindow(BaseWindow):
             self.set_to_default()
             self.switchToMain.emit()
 
+    def show_error(self, message):
+        QMessageBox.warning(self, 'Ошибка', message)
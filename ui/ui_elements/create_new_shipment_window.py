@@ -1,20 +1,25 @@
 from PyQt6.QtCore import QSize, QRegularExpression
 from PyQt6.QtGui import QIcon, QRegularExpressionValidator
 from PyQt6.QtWidgets import QVBoxLayout, QDialog, QPushButton, QTableWidget, QHBoxLayout, QComboBox, QLineEdit, \
-    QHeaderView, QMessageBox
+    QHeaderView, QMessageBox, QFileDialog
 
-from services.shipments_service import get_available_products, add_new_shipment
+from services.inventory_service import get_all_product_and_ids
+from services.shipment_import_service import import_shipment_file, write_error_report
+from services.shipments_service import add_new_shipment
+from utils.task_runner import ServiceRunner
 
 
 class CreateNewShipmentWindow(QDialog):
     """Диалоговое окно для создания новой поставки"""
     def __init__(self, supplierId, warehouseId):
         super().__init__()
+        # Загрузка товаров и сохранение выполняются вне GUI-потока
+        self.serviceRunner = ServiceRunner(self)
 
         self.supplierId = supplierId
         self.warehouseId = warehouseId
-        # Получение всех продуктов, доступных на выбранном складе
-        self.products = get_available_products(self.warehouseId)['data']
+        # Все товары: при первой поставке товар добавляется на склад автоматически (загружаются после открытия окна)
+        self.products = []
 
         # Настройка параметров окна
         self.setWindowTitle("Создание поставки")
@@ -42,10 +47,15 @@ class CreateNewShipmentWindow(QDialog):
 
         mainLayout.addWidget(self.table)
 
-        # Кнопка добавления строки
+        # Кнопки добавления строки и импорта накладной из файла
+        rowBtnLayout = QHBoxLayout()
         addRowBtn = QPushButton("Добавить товар")
         addRowBtn.clicked.connect(self.add_row)
-        mainLayout.addWidget(addRowBtn)
+        importBtn = QPushButton("Импорт из файла")
+        importBtn.clicked.connect(self.handle_import_btn)
+        rowBtnLayout.addWidget(addRowBtn)
+        rowBtnLayout.addWidget(importBtn)
+        mainLayout.addLayout(rowBtnLayout)
 
         mainLayout.addStretch()
         # Кнопки сохранения
@@ -56,11 +66,31 @@ class CreateNewShipmentWindow(QDialog):
         cancelBtn.clicked.connect(self.close)
         btnLayout.addWidget(saveBtn)
         btnLayout.addWidget(cancelBtn)
+        self.serviceRunner.bind_busy('save', saveBtn, cancelBtn, addRowBtn, importBtn, self.table)
+        self.serviceRunner.bind_busy('products', saveBtn, addRowBtn)
         mainLayout.addLayout(btnLayout)
+        self.addRowBtn = addRowBtn
+        self.saveBtn = saveBtn
 
 
         self.setLayout(mainLayout)
 
+        self.serviceRunner.run('products', get_all_product_and_ids,
+                               onResult=self.set_products, onError=self.on_products_error)
+
+    def set_products(self, result):
+        if not result['success']:
+            self.on_products_error(result['data'])
+            return None
+        self.products = result['data']
+        return None
+
+    def on_products_error(self, message):
+        # Без списка товаров строки поставки не заполнить; импорт из файла остается доступен
+        self.addRowBtn.setEnabled(False)
+        self.saveBtn.setEnabled(False)
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке товаров: {message}')
+
     def add_row(self):
         row = self.table.rowCount()
         self.table.insertRow(row)
@@ -113,7 +143,11 @@ class CreateNewShipmentWindow(QDialog):
             addedProducts.add(pid)
 
             result.append((pid, int(qty)))
-        addingResult = add_new_shipment(self.supplierId, self.warehouseId, result)
+        self.serviceRunner.run('save', add_new_shipment, self.supplierId, self.warehouseId, result,
+                               onResult=self.on_saved, onError=self.on_save_error)
+        return None
+
+    def on_saved(self, addingResult):
         if addingResult['success']:
             QMessageBox.information(self, 'Успех', addingResult['data'])
             self.close()
@@ -121,3 +155,34 @@ class CreateNewShipmentWindow(QDialog):
         QMessageBox.warning(self, 'Ошибка', addingResult['data'])
         return None
 
+    def handle_import_btn(self):
+        """Импорт накладной (csv/xlsx с колонками "Товар" и "Количество") в выбранные склад и поставщика"""
+        filePath, _ = QFileDialog.getOpenFileName(self, "Импорт поставки", "", "Таблицы (*.xlsx *.csv)")
+        if not filePath:
+            return None
+        self.serviceRunner.run('save', import_shipment_file, filePath, self.supplierId, self.warehouseId,
+                               onResult=self.on_imported, onError=self.on_save_error)
+        return None
+
+    def on_imported(self, importResult):
+        if not importResult['success']:
+            QMessageBox.warning(self, 'Ошибка', importResult['data'])
+            return None
+        data = importResult['data']
+        message = f'Проведено поставок: {data["shipments"]}, строк: {data["lines"]}'
+        if not data['errors']:
+            QMessageBox.information(self, 'Успех', message)
+            self.close()
+            return None
+
+        # Строки с ошибками не прерывают импорт - их список сохраняется отдельным файлом
+        answer = QMessageBox.question(self, 'Импорт завершен с ошибками',
+                                      f'{message}\nСтрок с ошибками: {len(data["errors"])}. Сохранить отчет?')
+        if answer == QMessageBox.StandardButton.Yes:
+            reportPath, _ = QFileDialog.getSaveFileName(self, "Сохранить отчет", "", "CSV (*.csv)")
+            if reportPath:
+                write_error_report(reportPath, data['errors'])
+        return None
+
+    def on_save_error(self, message):
+        QMessageBox.warning(self, 'Ошибка', message)
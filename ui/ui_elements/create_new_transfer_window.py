@@ -3,22 +3,22 @@ from PyQt6.QtGui import QIcon, QRegularExpressionValidator
 from PyQt6.QtWidgets import QVBoxLayout, QDialog, QPushButton, QTableWidget, QHBoxLayout, QComboBox, QLineEdit, \
     QHeaderView, QMessageBox
 
-from services.shipments_service import get_available_products
-from services.transfers_service import add_new_transfer
+from services.transfers_service import add_new_transfer, get_transfer_products
+from utils.task_runner import ServiceRunner
 
 
 class CreateNewTransferWindow(QDialog):
     """Диалоговое окно для оформления перемещения"""
     def __init__(self, fromWarehouseId, toWarehouseId):
         super().__init__()
+        # Загрузка товаров и сохранение выполняются вне GUI-потока
+        self.serviceRunner = ServiceRunner(self)
 
         self.fromWarehouseId = fromWarehouseId
         self.toWarehouseId = toWarehouseId
 
-        # Получение всех продуктов, доступных на выбранном складе
-        self.fromWarehouseProducts = get_available_products(self.fromWarehouseId)['data']
-        self.toWarehouseProducts = get_available_products(self.toWarehouseId)['data']
-        self.products =  list(set(self.fromWarehouseProducts) & set(self.toWarehouseProducts))
+        # Товары, которые есть на обоих складах (загружаются после открытия окна)
+        self.products = []
 
         # Настройка параметров окна
         self.setWindowTitle("Оформление транспортировки")
@@ -60,11 +60,31 @@ class CreateNewTransferWindow(QDialog):
         cancelBtn.clicked.connect(self.close)
         btnLayout.addWidget(saveBtn)
         btnLayout.addWidget(cancelBtn)
+        self.serviceRunner.bind_busy('save', saveBtn, cancelBtn, addRowBtn, self.table)
+        self.serviceRunner.bind_busy('products', saveBtn, addRowBtn)
         mainLayout.addLayout(btnLayout)
+        self.addRowBtn = addRowBtn
+        self.saveBtn = saveBtn
 
 
         self.setLayout(mainLayout)
 
+        self.serviceRunner.run('products', get_transfer_products, self.fromWarehouseId, self.toWarehouseId,
+                               onResult=self.set_products, onError=self.on_products_error)
+
+    def set_products(self, result):
+        if not result['success']:
+            self.on_products_error(result['data'])
+            return None
+        self.products = result['data']
+        return None
+
+    def on_products_error(self, message):
+        # Без списка товаров перемещение не оформить
+        self.addRowBtn.setEnabled(False)
+        self.saveBtn.setEnabled(False)
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка в загрузке товаров: {message}')
+
     def add_row(self):
         row = self.table.rowCount()
         self.table.insertRow(row)
@@ -117,10 +137,17 @@ class CreateNewTransferWindow(QDialog):
             addedProducts.add(pid)
 
             result.append((pid, int(qty)))
-        addingResult = add_new_transfer(self.fromWarehouseId, self.toWarehouseId, result)
+        self.serviceRunner.run('save', add_new_transfer, self.fromWarehouseId, self.toWarehouseId, result,
+                               onResult=self.on_saved, onError=self.on_save_error)
+        return None
+
+    def on_saved(self, addingResult):
         if addingResult['success']:
             QMessageBox.information(self, 'Успех', addingResult['data'])
             self.close()
             return None
         QMessageBox.warning(self, 'Ошибка', addingResult['data'])
         return None
+
+    def on_save_error(self, message):
+        QMessageBox.warning(self, 'Ошибка', message)
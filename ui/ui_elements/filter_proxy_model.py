@@ -0,0 +1,111 @@
+from PyQt6.QtCore import QSortFilterProxyModel, QTimer
+
+from ui.ui_elements.table_model import SORT_ROLE
+
+# Задержка применения текстовых фильтров после последнего нажатия клавиши (мс)
+FILTER_DEBOUNCE_MS = 250
+
+# Виды условий фильтра
+CONTAINS = 'contains'
+EQUALS = 'equals'
+
+
+class IndexedFilterProxyModel(QSortFilterProxyModel):
+    """Прокси-модель для TableModel с фильтрацией по индексу столбцов в нижнем регистре.
+
+    Наследники задают условия в filter_criteria. Результат фильтрации хранится маской строк:
+    если новые условия только сужают предыдущие (например, к строке поиска добавлен символ),
+    проверяются лишь строки, прошедшие прошлый фильтр.
+    """
+    def __init__(self):
+        super().__init__()
+        # Сортировка по исходным значениям, а не по тексту ячеек
+        self.setSortRole(SORT_ROLE)
+
+        self.appliedCriteria = {}
+        self.matches = None
+        self.checks = None
+
+        self.applyTimer = QTimer(self)
+        self.applyTimer.setSingleShot(True)
+        self.applyTimer.setInterval(FILTER_DEBOUNCE_MS)
+        self.applyTimer.timeout.connect(self.apply_filters)
+
+    def filter_criteria(self) -> dict:
+        """Условия фильтра: {столбец: (CONTAINS | EQUALS, значение)}"""
+        return {}
+
+    def setSourceModel(self, sourceModel):
+        oldModel = self.sourceModel()
+        if oldModel is not None:
+            for signal in self.source_change_signals(oldModel):
+                signal.disconnect(self.drop_matches)
+        # Подключение до базового класса: маска сбрасывается раньше, чем прокси обработает изменение строк
+        for signal in self.source_change_signals(sourceModel):
+            signal.connect(self.drop_matches)
+        self.drop_matches()
+        super().setSourceModel(sourceModel)
+
+    @staticmethod
+    def source_change_signals(model):
+        return (model.rowsInserted, model.rowsRemoved, model.dataChanged, model.modelReset, model.layoutChanged)
+
+    def drop_matches(self, *args):
+        """После изменения данных строки проверяются напрямую до следующего применения фильтров"""
+        self.matches = None
+        self.checks = None
+
+    def schedule_filters(self):
+        """Отложенное применение фильтров (для ввода текста)"""
+        self.applyTimer.start()
+
+    def apply_filters(self):
+        self.applyTimer.stop()
+        model = self.sourceModel()
+        criteria = {column: (kind, value.casefold()) for column, (kind, value) in self.filter_criteria().items()}
+
+        if self.matches is not None and self.is_narrowing(criteria):
+            candidates = [row for row, matched in enumerate(self.matches) if matched]
+        else:
+            candidates = range(model.rowCount())
+
+        matches = bytearray(model.rowCount())
+        checks = self.compile_checks(criteria)
+        for row in candidates:
+            if all(check(row) for check in checks):
+                matches[row] = 1
+
+        self.appliedCriteria = criteria
+        self.matches = matches
+        self.checks = checks
+        self.invalidate()
+
+    def is_narrowing(self, criteria: dict) -> bool:
+        """Каждое прежнее условие сохранено или уточнено"""
+        for column, (kind, value) in self.appliedCriteria.items():
+            newCondition = criteria.get(column)
+            if newCondition is None or newCondition[0] != kind:
+                return False
+            if kind == CONTAINS and value not in newCondition[1]:
+                return False
+            if kind == EQUALS and value != newCondition[1]:
+                return False
+        return True
+
+    def compile_checks(self, criteria: dict) -> list:
+        model = self.sourceModel()
+        checks = []
+        for column, (kind, value) in criteria.items():
+            folded = model.column_folded(column)
+            if kind == CONTAINS:
+                checks.append(lambda row, folded=folded, value=value: value in folded[row])
+            else:
+                checks.append(lambda row, folded=folded, value=value: folded[row] == value)
+        return checks
+
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        if self.matches is not None and sourceRow < len(self.matches):
+            return bool(self.matches[sourceRow])
+        if self.checks is None:
+            self.checks = self.compile_checks(self.appliedCriteria)
+        return all(check(sourceRow) for check in self.checks)
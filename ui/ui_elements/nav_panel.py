@@ -54,6 +54,7 @@ class NavPanel(QFrame):
     switchToShipments = pyqtSignal()
     switchToTransfers = pyqtSignal()
     switchToUserControls = pyqtSignal()
+    logout = pyqtSignal()
 
 
     def __init__(self, parent=None):
@@ -145,7 +146,7 @@ class NavPanel(QFrame):
         self.exitButton.setIcon(QIcon(icon))
         self.exitButton.setCursor(Qt.CursorShape.PointingHandCursor)
         self.exitButton.setObjectName('navPanelExitButton')
-        self.exitButton.clicked.connect(lambda: (self.window() and self.window().close()))
+        self.exitButton.clicked.connect(self.logout)
         mainLayout.addWidget(self.exitButton)
 
         # Установка layout
@@ -1,16 +1,109 @@
-from PyQt6.QtCore import QAbstractTableModel, Qt
+from PyQt6.QtCore import QAbstractTableModel, Qt, QModelIndex, pyqtSignal
+
+# Размер страницы для постепенно подгружаемых таблиц
+DEFAULT_PAGE_SIZE = 200
+
+# Роль с исходным (типизированным) значением ячейки для сортировки
+SORT_ROLE = Qt.ItemDataRole.UserRole
+
+
+class ColumnStore:
+    """Постолбцовое хранилище строк: типизированные значения и заранее подготовленный текст ячеек"""
+    __slots__ = ('values', 'display', 'folded')
+
+    def __init__(self, columnCount: int):
+        self.values = [[] for _ in range(columnCount)]
+        self.display = [[] for _ in range(columnCount)]
+        # Текст в нижнем регистре для поиска; столбец индексируется при первом обращении
+        self.folded = {}
+
+    def __len__(self):
+        return len(self.values[0]) if self.values else 0
+
+    def extend(self, rows):
+        """Добавление строк: транспонирование и форматирование выполняются один раз при загрузке"""
+        self.insert(len(self), rows)
+
+    def insert(self, position: int, rows):
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        for col, (values, display) in enumerate(zip(self.values, self.display)):
+            values[position:position] = columns[col]
+            display[position:position] = map(str, columns[col])
+            if col in self.folded:
+                self.folded[col][position:position] = [text.casefold() for text in display[position:position + len(rows)]]
+
+    def delete(self, first: int, last: int):
+        """Удаление строк first..last включительно"""
+        for values, display in zip(self.values, self.display):
+            del values[first:last + 1]
+            del display[first:last + 1]
+        for folded in self.folded.values():
+            del folded[first:last + 1]
+
+    def set_row(self, row: int, rowValues):
+        for col, (values, display) in enumerate(zip(self.values, self.display)):
+            values[row] = rowValues[col]
+            display[row] = str(rowValues[col])
+            if col in self.folded:
+                self.folded[col][row] = display[row].casefold()
+
+    def folded_column(self, col: int) -> list:
+        folded = self.folded.get(col)
+        if folded is None:
+            folded = self.folded[col] = [text.casefold() for text in self.display[col]]
+        return folded
+
+    def row(self, row: int) -> tuple:
+        return tuple(values[row] for values in self.values)
+
+    def keys(self, keyColumns) -> list:
+        return list(zip(*(self.values[col] for col in keyColumns)))
+
+
+def contiguous_runs(positions):
+    """Разбиение возрастающих номеров строк на непрерывные диапазоны (first, last)"""
+    runs = []
+    for position in positions:
+        if runs and runs[-1][1] == position - 1:
+            runs[-1][1] = position
+        else:
+            runs.append([position, position])
+    return runs
 
 
 class TableModel(QAbstractTableModel):
-    def __init__(self, tData, headers):
+
+    # Загрузка следующей страницы завершилась ошибкой (текст ошибки)
+    fetchFailed = pyqtSignal(str)
+
+    def __init__(self, tData, headers, fetchPage=None, pageSize=DEFAULT_PAGE_SIZE, keyColumns=None, serviceRunner=None):
         super().__init__()
-        self.tData = tData
         self.headers = headers
+        # Столбцы первичного ключа: при их наличии обновление данных выполняется по разнице, без сброса модели
+        self.keyColumns = tuple(keyColumns) if keyColumns else None
+        self.store = ColumnStore(len(headers))
+        rows = list(tData)
+        self.store.extend(rows)
+
+        # Функция получения следующей страницы по последней загруженной строке (для больших историй)
+        self.fetchPage = fetchPage
+        self.pageSize = pageSize
+        self.hasMore = self.is_full_page(rows)
+        # При заданном исполнителе страница загружается вне GUI-потока, до ответа новые не запрашиваются
+        self.serviceRunner = serviceRunner
+        self.fetchChannel = f'fetchPage{id(self)}'
+        self.fetching = False
 
     def rowCount(self, parent=None):
-        return len(self.tData)
+        if parent is not None and parent.isValid():
+            return 0
+        return len(self.store)
 
     def columnCount(self,parent=None):
+        if parent is not None and parent.isValid():
+            return 0
         return len(self.headers)
 
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
@@ -18,7 +111,10 @@ class TableModel(QAbstractTableModel):
             return None
 
         if role == Qt.ItemDataRole.DisplayRole:
-            return str(self.tData[index.row()][index.column()])
+            return self.store.display[index.column()][index.row()]
+
+        if role == SORT_ROLE:
+            return self.store.values[index.column()][index.row()]
 
         return None
 
@@ -34,7 +130,138 @@ class TableModel(QAbstractTableModel):
 
         return None
 
+    def row_values(self, row: int) -> tuple:
+        """Исходные значения строки"""
+        return self.store.row(row)
+
+    def column_display(self, column: int) -> list:
+        """Текст всех ячеек столбца (без копирования)"""
+        return self.store.display[column]
+
+    def column_folded(self, column: int) -> list:
+        """Текст столбца в нижнем регистре (casefold) для фильтрации"""
+        return self.store.folded_column(column)
+
+    def is_full_page(self, rows):
+        """Полная страница означает, что в бд могут оставаться еще строки"""
+        return self.fetchPage is not None and len(rows) >= self.pageSize
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.hasMore and not self.fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Подгрузка следующей страницы при прокрутке таблицы"""
+        if parent.isValid() or not self.hasMore or self.fetching:
+            return
+        rowCount = len(self.store)
+        lastRow = self.store.row(rowCount - 1) if rowCount else None
+        if self.serviceRunner is None:
+            try:
+                page = self.fetchPage(lastRow)
+            except Exception as e:
+                self.on_fetch_failed(str(e))
+                return
+            self.append_page(page)
+            return
+        self.fetching = True
+        self.serviceRunner.run(self.fetchChannel, self.fetchPage, lastRow,
+                               onResult=self.append_page, onError=self.on_fetch_failed)
+
+    def append_page(self, page):
+        """Добавление загруженной страницы в конец таблицы"""
+        self.fetching = False
+        page = list(page)
+        self.hasMore = self.is_full_page(page)
+        if not page:
+            return
+
+        rowCount = len(self.store)
+        self.beginInsertRows(QModelIndex(), rowCount, rowCount + len(page) - 1)
+        self.store.extend(page)
+        self.endInsertRows()
+
+    def on_fetch_failed(self, message):
+        # hasMore не сбрасывается: страница будет запрошена снова при следующей прокрутке
+        self.fetching = False
+        self.fetchFailed.emit(message)
+
+    def cancel_fetch(self):
+        """Отмена загрузки страницы: ее строки относятся к прежним данным таблицы"""
+        if self.fetching:
+            self.serviceRunner.cancel(self.fetchChannel)
+            self.fetching = False
+
     def update_data(self, newData):
+        self.cancel_fetch()
+        rows = list(newData)
+        if self.keyColumns is None or not len(self.store) or not self.apply_diff(rows):
+            self.reset_data(rows)
+
+    def apply_diff(self, rows) -> bool:
+        """Обновление по первичному ключу: сигналы только для удаленных, добавленных и измененных строк.
+
+        Возвращает False, если разницу применить нельзя (повтор ключей или другой порядок строк) -
+        тогда модель сбрасывается целиком.
+        """
+        newKeys = [tuple(row[col] for col in self.keyColumns) for row in rows]
+        newPositions = {key: position for position, key in enumerate(newKeys)}
+        if len(newPositions) != len(newKeys):
+            return False
+
+        oldKeys = self.store.keys(self.keyColumns)
+        compared = len(oldKeys)
+        keepTail = self.fetchPage is not None and self.is_full_page(rows)
+        if keepTail:
+            # Новая первая страница: подгруженные ранее строки после последней общей строки сохраняются
+            common = [position for position, key in enumerate(oldKeys) if key in newPositions]
+            if not common:
+                return False
+            compared = common[-1] + 1
+
+        removed = [position for position in range(compared) if oldKeys[position] not in newPositions]
+        keptPositions = [newPositions[key] for key in oldKeys[:compared] if key in newPositions]
+        if any(a > b for a, b in zip(keptPositions, keptPositions[1:])):
+            return False
+
+        for first, last in reversed(contiguous_runs(removed)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self.store.delete(first, last)
+            self.endRemoveRows()
+
+        # Строки [0, position) модели уже совпадают с новыми данными
+        oldKeySet = set(oldKeys[:compared])
+        columnCount = len(self.headers)
+        position = 0
+        while position < len(rows):
+            if newKeys[position] not in oldKeySet:
+                end = position
+                while end < len(rows) and newKeys[end] not in oldKeySet:
+                    end += 1
+                self.beginInsertRows(QModelIndex(), position, end - 1)
+                self.store.insert(position, rows[position:end])
+                self.endInsertRows()
+                position = end
+                continue
+
+            end = position
+            while end < len(rows) and newKeys[end] in oldKeySet and self.store.row(end) != tuple(rows[end])[:columnCount]:
+                self.store.set_row(end, rows[end])
+                end += 1
+            if end > position:
+                self.dataChanged.emit(self.index(position, 0), self.index(end - 1, columnCount - 1))
+                position = end
+            else:
+                position += 1
+
+        if not keepTail:
+            self.hasMore = self.is_full_page(rows)
+        return True
+
+    def reset_data(self, rows):
         self.beginResetModel()
-        self.tData = newData
-        self.endResetModel()
\ No newline at end of file
+        self.store = ColumnStore(len(self.headers))
+        self.store.extend(rows)
+        self.hasMore = self.is_full_page(rows)
+        self.endResetModel()
@@ -1,34 +1,174 @@
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QFileDialog
+import datetime
+import decimal
+import os
+import threading
+
+from PyQt6.QtCore import Qt, QObject, pyqtSignal
+from PyQt6.QtWidgets import QFileDialog, QProgressDialog, QMessageBox
 from openpyxl import Workbook
 
+from utils.task_runner import ServiceRunner
+
+# Строк в одном пакете записи: между пакетами проверяется отмена и обновляется прогресс
+EXPORT_CHUNK_SIZE = 1000
+
+# Типы, которые openpyxl записывает в ячейку без преобразования
+NATIVE_TYPES = (str, int, float, bool, decimal.Decimal, datetime.datetime, datetime.date, datetime.time)
+
+# Выполняющиеся экспорты (удерживаются до завершения, если у окна экспорта нет владельца)
+activeJobs = set()
+
+
+def excel_value(value):
+    """Значение ячейки с сохранением числового и временного типа"""
+    if value is None or isinstance(value, NATIVE_TYPES):
+        return value
+    return str(value)
+
+
+def write_xlsx(filePath, headers, rows, progress=None, isCancelled=None, chunkSize=EXPORT_CHUNK_SIZE):
+    """Потоковая запись строк в xlsx (write-only): в памяти находится только текущий пакет.
+
+    Возвращает количество записанных строк или None, если экспорт отменен (файл не создается).
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(headers))
+
+    written = 0
+    chunk = []
+    try:
+        for row in rows:
+            chunk.append([excel_value(value) for value in row])
+            if len(chunk) < chunkSize:
+                continue
+            if isCancelled and isCancelled():
+                # Закрытие потока листа; временный файл openpyxl удаляет при выходе из программы
+                ws.close()
+                return None
+            for values in chunk:
+                ws.append(values)
+            written += len(chunk)
+            chunk.clear()
+            if progress:
+                progress(written)
+    finally:
+        # Генератор потоковой выборки (stream_rows) сразу освобождает курсор и соединение пула,
+        # в том числе при отмене, а не при сборке мусора
+        close = getattr(rows, 'close', None)
+        if close:
+            close()
+
+    if isCancelled and isCancelled():
+        ws.close()
+        return None
+    for values in chunk:
+        ws.append(values)
+    written += len(chunk)
+
+    # Запись во временный файл: прерванное сохранение не портит существующий файл
+    tmpPath = filePath + '.tmp'
+    try:
+        wb.save(tmpPath)
+        os.replace(tmpPath, filePath)
+    except BaseException:
+        # Недописанный временный файл не остается рядом с выбранным файлом
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+    if progress:
+        progress(written)
+    return written
+
+
+def model_rows(model):
+    """Снимок строк модели: копируются только ссылки на значения, чтобы обновление таблицы не мешало экспорту"""
+    if hasattr(model, 'store'):
+        columns = [list(values) for values in model.store.values]
+        return zip(*columns)
+    return [[model.data(model.index(row, col)) for col in range(model.columnCount())]
+            for row in range(model.rowCount())]
 
-def exportToExcel(model):
-    if model is None:
-        return
 
+class ExcelExportJob(QObject):
+    """Экспорт в фоновом потоке с окном прогресса и отменой"""
+    progress = pyqtSignal(int)
+
+    def __init__(self, parent, filePath, headers, rows, total=0):
+        super().__init__(parent)
+        self.parentWidget = parent
+        self.filePath = filePath
+        self.headers = headers
+        self.rows = rows
+        self.cancelEvent = threading.Event()
+        self.serviceRunner = ServiceRunner(self)
+
+        # Без известного количества строк окно показывает индикатор занятости
+        self.progressDialog = QProgressDialog('Экспорт в Excel...', 'Отмена', 0, total, parent)
+        self.progressDialog.setWindowTitle('Экспорт')
+        self.progressDialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progressDialog.setAutoClose(False)
+        self.progressDialog.setAutoReset(False)
+        self.progressDialog.setMinimumDuration(300)
+        self.progressDialog.canceled.connect(self.cancelEvent.set)
+        self.progress.connect(self.on_progress)
+
+    def start(self):
+        activeJobs.add(self)
+        self.serviceRunner.run('export', write_xlsx, self.filePath, self.headers, self.rows,
+                               progress=self.progress.emit, isCancelled=self.cancelEvent.is_set,
+                               onResult=self.on_finished, onError=self.on_failed)
+
+    def on_progress(self, written):
+        if self.progressDialog.maximum():
+            self.progressDialog.setValue(written)
+        else:
+            self.progressDialog.setLabelText(f'Экспорт в Excel... Выгружено строк: {written}')
+
+    def on_finished(self, written):
+        self.progressDialog.close()
+        if written is not None:
+            QMessageBox.information(self.parentWidget, 'Экспорт', f'Сохранено строк: {written}')
+        self.finish()
+
+    def on_failed(self, message):
+        self.progressDialog.close()
+        QMessageBox.warning(self.parentWidget, 'Ошибка', f'Ошибка экспорта: {message}')
+        self.finish()
+
+    def finish(self):
+        activeJobs.discard(self)
+        self.progressDialog.deleteLater()
+        self.deleteLater()
+
+
+def ask_export_path(parent=None):
     filePath, _ = QFileDialog.getSaveFileName(
-        None,
+        parent,
         "Сохранить как",
         "",
         "Excel (*.xlsx)"
     )
+    return filePath
 
-    if not filePath:
+
+def exportToExcel(model, parent=None):
+    """Экспорт загруженных строк модели таблицы"""
+    if model is None:
         return
 
-    wb = Workbook()
-    ws = wb.active
+    headers = [model.headerData(col, Qt.Orientation.Horizontal) for col in range(model.columnCount())]
+    exportRowsToExcel(headers, lambda: model_rows(model), parent, model.rowCount())
 
-    # Заголовоки
-    for col in range(model.columnCount()):
-        header = model.headerData(col, Qt.Orientation.Horizontal)
-        ws.cell(row=1, column=col+1, value=header)
 
-    # Строки
-    for row in range(model.rowCount()):
-        for col in range(model.columnCount()):
-            index = model.index(row, col)
-            ws.cell(row=row + 2, column=col + 1, value=str(model.data(index)))
+def exportRowsToExcel(headers, rowsFactory, parent=None, total=0):
+    """Экспорт строк из rowsFactory() - например, генератора потоковой выборки из бд.
+
+    Фабрика вызывается после выбора файла; генератор выполняется уже в фоновом потоке.
+    """
+    filePath = ask_export_path(parent)
+    if not filePath:
+        return
 
-    wb.save(filePath)
\ No newline at end of file
+    job = ExcelExportJob(parent, filePath, headers, rowsFactory(), total)
+    job.start()
@@ -1,13 +1,24 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import bcrypt
 
-def hash_password(password: str) -> str:
+from utils.settings import config_private
+
+# Стоимость bcrypt (2^rounds итераций); подбирается benchmarks/bcrypt_calibration.py
+BCRYPT_ROUNDS = getattr(config_private, 'BCRYPT_ROUNDS', 12)
+
+# Начиная с этого количества паролей хэширование выполняется в пуле процессов
+BULK_HASH_MIN_SIZE = 4
+
+def hash_password(password: str, rounds: int = None) -> str:
     """Функция для шифровки пароля"""
 
     # Перевод пароля в байты
     password_bytes = password.encode('utf-8')
 
-    # Генерация соли
-    salt = bcrypt.gensalt()
+    # Генерация соли с настроенной стоимостью
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
 
     # Генерация хэша
     hashed = bcrypt.hashpw(password_bytes, salt)
@@ -18,4 +29,31 @@ def hash_password(password: str) -> str:
 
 def verify_password(password: str, hashed_password: str) -> bool:
     """Проверка пароля на соответствие"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
\ No newline at end of file
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def hash_rounds(hashed_password: str):
+    """Стоимость, с которой получен хэш ($2b$12$... -> 12); None для нераспознанного формата"""
+    parts = hashed_password.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Хэш получен с другой стоимостью, чем настроена сейчас"""
+    return hash_rounds(hashed_password) != BCRYPT_ROUNDS
+
+
+def hash_passwords(passwords: list, rounds: int = None, workers: int = None) -> list:
+    """Хэширование набора паролей (массовое создание учетных записей).
+
+    Большие наборы распределяются по процессам - по одному на ядро; порядок результатов совпадает с порядком паролей.
+    """
+    rounds = rounds or BCRYPT_ROUNDS
+    if len(passwords) < BULK_HASH_MIN_SIZE:
+        return [hash_password(password, rounds) for password in passwords]
+
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_password, passwords, [rounds] * len(passwords)))
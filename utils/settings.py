@@ -0,0 +1,17 @@
+import os
+
+"""Доступ к локальным настройкам приложения (config_private.py)"""
+
+try:
+    import config_private
+except ImportError:
+    # Без config_private (замеры, отладка на локальной бд) действуют значения по умолчанию,
+    # а адрес бд задается переменной окружения
+    config_private = None
+
+# Переменная окружения с адресом бд, имеющая приоритет над config_private.DATABASE_URL
+DATABASE_URL_ENV = 'WAREHOUSE_DATABASE_URL'
+
+
+def database_url():
+    return os.environ.get(DATABASE_URL_ENV) or getattr(config_private, 'DATABASE_URL', None)
@@ -0,0 +1,144 @@
+import itertools
+import threading
+import traceback
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+# Ссылки на задачи до завершения run(): задача должна пережить отмену и удаление окна-владельца
+activeTasks = set()
+
+
+class TaskSignals(QObject):
+    """Сигналы задачи: доставляются в GUI-поток через очередь событий"""
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+
+class ServiceTask(QRunnable):
+    """Вызов сервисной функции в потоке из пула"""
+    def __init__(self, requestId: int, func, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.requestId = requestId
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = threading.Event()
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            if self.cancelled.is_set():
+                return
+            try:
+                result = self.func(*self.args, **self.kwargs)
+            except Exception as e:
+                traceback.print_exc()
+                self.signals.failed.emit(self.requestId, str(e))
+                return
+            self.signals.finished.emit(self.requestId, result)
+        finally:
+            activeTasks.discard(self)
+
+
+class ServiceRunner(QObject):
+    """Исполнитель сервисных функций вне GUI-потока.
+
+    Запросы группируются по каналам: новый запрос в канале отменяет предыдущий,
+    а результаты устаревших запросов отбрасываются.
+    """
+
+    # Канал перешел в состояние загрузки или вышел из него
+    busyChanged = pyqtSignal(str, bool)
+
+    # Выполнение в вызывающем потоке (headless-бенчмарки и отладка)
+    runSynchronously = False
+
+    requestIds = itertools.count(1)
+
+    def __init__(self, parent=None, threadPool: QThreadPool = None):
+        super().__init__(parent)
+        self.threadPool = threadPool or QThreadPool.globalInstance()
+        self.tasks = {}
+        self.latest = {}
+        self.callbacks = {}
+        self.busyWidgets = {}
+
+    def bind_busy(self, channel: str, *widgets):
+        """Виджеты, блокируемые на время выполнения запроса канала"""
+        self.busyWidgets.setdefault(channel, []).extend(widgets)
+
+    def set_busy(self, channel: str, busy: bool):
+        for widget in self.busyWidgets.get(channel, []):
+            widget.setEnabled(not busy)
+        self.busyChanged.emit(channel, busy)
+
+    def run(self, channel: str, func, *args, onResult=None, onError=None, **kwargs) -> int:
+        """Запуск func(*args, **kwargs); onResult/onError вызываются в GUI-потоке"""
+        self.cancel(channel)
+        requestId = next(self.requestIds)
+        self.latest[channel] = requestId
+        self.callbacks[requestId] = (channel, onResult, onError)
+        self.set_busy(channel, True)
+
+        if self.runSynchronously:
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.on_failed(requestId, str(e))
+            else:
+                self.on_finished(requestId, result)
+            return requestId
+
+        task = ServiceTask(requestId, func, args, kwargs)
+        task.signals.finished.connect(self.on_finished)
+        task.signals.failed.connect(self.on_failed)
+        self.tasks[requestId] = task
+        activeTasks.add(task)
+        self.threadPool.start(task)
+        return requestId
+
+    def cancel(self, channel: str):
+        """Отмена текущего запроса канала: еще не начатый снимается с очереди, результат начатого отбрасывается"""
+        requestId = self.latest.pop(channel, None)
+        if requestId is None:
+            return
+        self.callbacks.pop(requestId, None)
+        task = self.tasks.pop(requestId, None)
+        if task is not None:
+            task.cancelled.set()
+            if self.threadPool.tryTake(task):
+                activeTasks.discard(task)
+        self.set_busy(channel, False)
+
+    def cancel_all(self):
+        for channel in list(self.latest):
+            self.cancel(channel)
+
+    def is_busy(self, channel: str) -> bool:
+        return channel in self.latest
+
+    def take_callbacks(self, requestId: int):
+        """Колбэки актуального запроса; для устаревших и отмененных - None"""
+        self.tasks.pop(requestId, None)
+        entry = self.callbacks.pop(requestId, None)
+        if entry is None:
+            return None
+        channel = entry[0]
+        if self.latest.get(channel) != requestId:
+            return None
+        del self.latest[channel]
+        self.set_busy(channel, False)
+        return entry
+
+    @pyqtSlot(int, object)
+    def on_finished(self, requestId: int, result):
+        entry = self.take_callbacks(requestId)
+        if entry and entry[1]:
+            entry[1](result)
+
+    @pyqtSlot(int, str)
+    def on_failed(self, requestId: int, message: str):
+        entry = self.take_callbacks(requestId)
+        if entry and entry[2]:
+            entry[2](message)